@@ -1,4 +1,4 @@
-from .connection import connect
+from .connection import (connect, connect_async)
 
 __version__ = '4.2.1'
 """
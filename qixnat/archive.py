@@ -0,0 +1,431 @@
+"""
+.. module:: archive
+    :synopsis: Streaming zip archive utilities.
+"""
+import os
+import time
+import errno
+import struct
+import zlib
+
+
+class ArchiveError(Exception):
+    pass
+
+
+CHUNK_SIZE = 64 * 1024
+"""The archive read buffer size in bytes."""
+
+LOCAL_HEADER_SIGNATURE = 'PK\x03\x04'
+"""The zip local file header signature."""
+
+DATA_DESCRIPTOR_SIGNATURE = 'PK\x07\x08'
+"""The optional zip data descriptor signature."""
+
+CENTRAL_HEADER_SIGNATURE = 'PK\x01\x02'
+"""The zip central directory file header signature."""
+
+END_SIGNATURE = 'PK\x05\x06'
+"""The zip end of central directory record signature."""
+
+LOCAL_HEADER_FMT = '<4sHHHHHIIIHH'
+"""
+The zip local file header struct format. The fields are as follows:
+signature, version, flags, compression method, modification time,
+modification date, CRC-32, compressed size, uncompressed size, file
+name length and extra field length.
+"""
+
+DATA_DESCRIPTOR_FMT = '<4sIII'
+"""
+The zip data descriptor struct format. The fields are as follows:
+signature, CRC-32, compressed size and uncompressed size.
+"""
+
+CENTRAL_HEADER_FMT = '<4sHHHHHHIIIHHHHHII'
+"""
+The zip central directory file header struct format. The fields are as
+follows: signature, creator version, version, flags, compression method,
+modification time, modification date, CRC-32, compressed size,
+uncompressed size, file name length, extra field length, comment length,
+disk number, internal attributes, external attributes and local header
+offset.
+"""
+
+END_FMT = '<4sHHHHIIH'
+"""
+The zip end of central directory record struct format. The fields are
+as follows: signature, disk number, central directory disk number,
+disk entry count, total entry count, central directory size, central
+directory offset and comment length.
+"""
+
+ZIP_VERSION = 20
+"""The zip specification version 2.0 required to extract an entry."""
+
+MAX_ENTRIES = 0xFFFF
+"""The maximum number of entries in a non-zip64 archive."""
+
+ZIP64_EXTRA_ID = 0x0001
+"""The zip64 extended information extra field tag."""
+
+ZIP64_LIMIT = 0xFFFFFFFF
+"""The 32-bit size value which signals a zip64 extra field size."""
+
+HAS_DATA_DESCRIPTOR = 0x08
+"""The local header flag bit which signals a trailing data descriptor."""
+
+STORED = 0
+"""The uncompressed zip entry method."""
+
+DEFLATED = 8
+"""The deflated zip entry method."""
+
+
+def extract(fp, target):
+    """
+    Extracts the zip archive read from the given stream. Unlike the
+    Python ``zipfile`` module, this function does not require a
+    seekable file. The archive content is read sequentially in
+    :const:`CHUNK_SIZE` chunks, e.g. from a HTTP response, and each
+    archive entry is written as it is read. Thus, the archive is never
+    saved to disk and memory usage is independent of the archive size.
+
+    The *target* function determines the extracted file location.
+    The function arguments are the archive entry name and the
+    uncompressed entry size, or None if the archive header does not
+    include the size. The function returns the target file path, or
+    None to skip the entry. Directory entries are skipped.
+
+    An extracted entry is written to a ``.part`` file which is renamed
+    to the target location when the entry is completely extracted.
+
+    :param fp: the archive stream, which need only support ``read``
+    :param target: the *target(name, size)* location function
+    :return: the extracted file paths
+    :raise ArchiveError: if the archive is malformed or truncated
+    """
+    reader = _Reader(fp)
+    locations = []
+    while True:
+        signature = reader.read(4)
+        # The local headers are followed by the central directory,
+        # which is empty if the archive has no entries.
+        if signature in (CENTRAL_HEADER_SIGNATURE, END_SIGNATURE):
+            break
+        if len(signature) < 4:
+            raise ArchiveError("The archive is truncated")
+        if signature != LOCAL_HEADER_SIGNATURE:
+            raise ArchiveError("The archive header signature %r is not"
+                               " recognized" % signature)
+        header = signature + _read_exactly(
+            reader, struct.calcsize(LOCAL_HEADER_FMT) - 4, 'local header')
+        (_, _, flags, method, _, _, crc, csize, usize, name_len,
+         extra_len) = struct.unpack(LOCAL_HEADER_FMT, header)
+        name = _read_exactly(reader, name_len, 'local header')
+        extra = _read_exactly(reader, extra_len, "entry %s header" % name)
+        zip64 = _zip64_sizes(extra)
+        if zip64 and ZIP64_LIMIT in (usize, csize):
+            usize, csize = zip64
+        has_descriptor = flags & HAS_DATA_DESCRIPTOR
+        if has_descriptor:
+            size = usize or None
+        else:
+            size = usize
+        # Skip directory entries and unselected files.
+        location = None if name.endswith('/') else target(name, size)
+        if location:
+            _make_parent_directory(location)
+            part_file = location + '.part'
+            with open(part_file, 'wb') as out:
+                actual_crc = _copy_entry(reader, out, name, method, csize,
+                                         has_descriptor)
+        else:
+            actual_crc = _copy_entry(reader, None, name, method, csize,
+                                     has_descriptor)
+        if has_descriptor:
+            crc = _read_data_descriptor(reader, zip64)
+        if location:
+            if actual_crc != crc:
+                os.remove(part_file)
+                raise ArchiveError("The archive entry %s CRC check failed" %
+                                   name)
+            os.rename(part_file, location)
+            locations.append(location)
+
+    return locations
+
+
+def generate(entries, method=DEFLATED):
+    """
+    Generates a zip archive of the given files. Unlike the Python
+    ``zipfile`` module, this function does not require a seekable
+    output file. Rather, the archive content is yielded in chunks
+    as it is built, e.g. for a streaming HTTP request body. The
+    entry sizes and CRC are written in a data descriptor following
+    each deflated entry content. Thus, a deflated input file is read
+    only once and memory usage is independent of the archive size.
+
+    :param entries: the (archive name, file path) items
+    :param method: the :const:`DEFLATED` or :const:`STORED`
+        compression method
+    :yield: the archive content chunks
+    :raise ArchiveError: if the archive requires zip64 extensions
+    """
+    if method not in (STORED, DEFLATED):
+        raise ArchiveError("The archive compression method %d is not"
+                           " supported" % method)
+    # The (name, flags, method, time, date, CRC, compressed size,
+    # uncompressed size, local header offset) central directory entries.
+    directory = []
+    offset = 0
+    for name, location in entries:
+        if len(directory) == MAX_ENTRIES:
+            raise ArchiveError("The archive exceeds the maximum number of"
+                               " entries %d" % MAX_ENTRIES)
+        dos_time, dos_date = _dos_timestamp(os.path.getmtime(location))
+        if method == STORED:
+            # A stored entry cannot be read sequentially unless the
+            # local header has the sizes. Therefore, the CRC is
+            # calculated in advance.
+            flags = 0
+            crc = _file_crc(location)
+            csize = usize = os.path.getsize(location)
+        else:
+            # The CRC and sizes are in the trailing data descriptor.
+            flags = HAS_DATA_DESCRIPTOR
+            crc = csize = usize = 0
+        if max(csize, offset) >= ZIP64_LIMIT:
+            raise ArchiveError("The archive entry %s exceeds the maximum"
+                               " size" % name)
+        yield struct.pack(LOCAL_HEADER_FMT, LOCAL_HEADER_SIGNATURE,
+                          ZIP_VERSION, flags, method, dos_time, dos_date,
+                          crc, csize, usize, len(name), 0) + name
+        if method == STORED:
+            with open(location, 'rb') as fp:
+                for chunk in iter(lambda: fp.read(CHUNK_SIZE), ''):
+                    yield chunk
+        else:
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION,
+                                          zlib.DEFLATED, -zlib.MAX_WBITS)
+            with open(location, 'rb') as fp:
+                for chunk in iter(lambda: fp.read(CHUNK_SIZE), ''):
+                    crc = zlib.crc32(chunk, crc)
+                    usize += len(chunk)
+                    chunk = compressor.compress(chunk)
+                    if chunk:
+                        csize += len(chunk)
+                        yield chunk
+            chunk = compressor.flush()
+            csize += len(chunk)
+            yield chunk
+            if max(csize, usize) >= ZIP64_LIMIT:
+                raise ArchiveError("The archive entry %s exceeds the maximum"
+                                   " size" % name)
+            crc &= 0xFFFFFFFF
+            yield struct.pack(DATA_DESCRIPTOR_FMT, DATA_DESCRIPTOR_SIGNATURE,
+                              crc, csize, usize)
+        directory.append((name, flags, method, dos_time, dos_date, crc,
+                          csize, usize, offset))
+        offset += struct.calcsize(LOCAL_HEADER_FMT) + len(name) + csize
+        if flags & HAS_DATA_DESCRIPTOR:
+            offset += struct.calcsize(DATA_DESCRIPTOR_FMT)
+
+    # The central directory.
+    cd_size = 0
+    for (name, flags, method, dos_time, dos_date, crc, csize, usize,
+         header_offset) in directory:
+        record = struct.pack(CENTRAL_HEADER_FMT, CENTRAL_HEADER_SIGNATURE,
+                             ZIP_VERSION, ZIP_VERSION, flags, method, dos_time, dos_date, crc, csize, usize,
+                             len(name), 0, 0, 0, 0, 0, header_offset)
+        cd_size += len(record) + len(name)
+        yield record + name
+    if offset >= ZIP64_LIMIT:
+        raise ArchiveError("The archive exceeds the maximum size")
+    yield struct.pack(END_FMT, END_SIGNATURE, 0, 0, len(directory),
+                      len(directory), cd_size, offset, 0)
+
+
+def _file_crc(location):
+    """
+    :param location: the file path
+    :return: the file content CRC-32
+    """
+    crc = 0
+    with open(location, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(CHUNK_SIZE), ''):
+            crc = zlib.crc32(chunk, crc)
+
+    return crc & 0xFFFFFFFF
+
+
+def _dos_timestamp(mtime):
+    """
+    :param mtime: the file modification time in seconds since the epoch
+    :return: the zip (DOS time, DOS date) tuple
+    """
+    tm = time.localtime(mtime)
+    # The DOS date starts in 1980.
+    year = max(tm.tm_year, 1980)
+    dos_time = (tm.tm_hour << 11) | (tm.tm_min << 5) | (tm.tm_sec // 2)
+    dos_date = ((year - 1980) << 9) | (tm.tm_mon << 5) | tm.tm_mday
+
+    return dos_time, dos_date
+
+
+def _copy_entry(reader, out, name, method, csize, has_descriptor):
+    """
+    Copies the archive entry content to the given output file.
+
+    :param reader: the archive :class:`_Reader`
+    :param out: the output file, or None to discard the content
+    :param name: the archive entry name
+    :param method: the entry compression method
+    :param csize: the entry compressed size
+    :param has_descriptor: whether the entry sizes are in a trailing
+        data descriptor rather than the local header
+    :return: the uncompressed content CRC-32
+    """
+    crc = 0
+    if method == DEFLATED:
+        # The raw deflate stream is self-terminating. The input which
+        # follows the end of the deflate stream is pushed back onto
+        # the reader.
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        remaining = None if has_descriptor else csize
+        while remaining is None or remaining > 0:
+            size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE,
+                                                            remaining)
+            chunk = reader.read(size)
+            if not chunk:
+                raise ArchiveError("The archive entry %s is truncated" % name)
+            if remaining is not None:
+                remaining -= len(chunk)
+            data = decompressor.decompress(chunk)
+            if data:
+                crc = zlib.crc32(data, crc)
+                if out:
+                    out.write(data)
+            if decompressor.unused_data:
+                reader.unread(decompressor.unused_data)
+                break
+        data = decompressor.flush()
+        if data:
+            crc = zlib.crc32(data, crc)
+            if out:
+                out.write(data)
+    elif method == STORED:
+        # An uncompressed entry size must be known in advance.
+        if has_descriptor and not csize:
+            raise ArchiveError("The archive entry %s is stored without a"
+                               " size" % name)
+        remaining = csize
+        while remaining > 0:
+            chunk = reader.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise ArchiveError("The archive entry %s is truncated" % name)
+            remaining -= len(chunk)
+            crc = zlib.crc32(chunk, crc)
+            if out:
+                out.write(chunk)
+    else:
+        raise ArchiveError("The archive entry %s compression method %d is"
+                           " not supported" % (name, method))
+
+    return crc & 0xFFFFFFFF
+
+
+def _read_data_descriptor(reader, zip64):
+    """
+    :param reader: the archive :class:`_Reader`
+    :param zip64: whether the sizes are 64-bit
+    :return: the data descriptor CRC-32
+    :raise ArchiveError: if the data descriptor is truncated
+    """
+    field = _read_exactly(reader, 4, 'data descriptor')
+    # The descriptor signature is optional.
+    if field == DATA_DESCRIPTOR_SIGNATURE:
+        field = _read_exactly(reader, 4, 'data descriptor')
+    _read_exactly(reader, 16 if zip64 else 8, 'data descriptor')
+
+    return struct.unpack('<I', field)[0]
+
+
+def _read_exactly(reader, size, part):
+    """
+    :param reader: the archive :class:`_Reader`
+    :param size: the number of bytes to read
+    :param part: the archive part name, for the error message
+    :return: the content
+    :raise ArchiveError: if the stream ends before *size* bytes are read
+    """
+    content = reader.read(size)
+    if len(content) < size:
+        raise ArchiveError("The archive %s is truncated" % part)
+
+    return content
+
+
+def _zip64_sizes(extra):
+    """
+    :param extra: the local header extra field content
+    :return: the zip64 (uncompressed size, compressed size), or None
+        if there is no zip64 extra field
+    """
+    while len(extra) >= 4:
+        tag, size = struct.unpack('<HH', extra[:4])
+        if tag == ZIP64_EXTRA_ID and size >= 16:
+            return struct.unpack('<QQ', extra[4:20])
+        extra = extra[4 + size:]
+
+
+def _make_parent_directory(location):
+    parent = os.path.dirname(location)
+    if parent and not os.path.exists(parent):
+        try:
+            os.makedirs(parent)
+        except OSError as e:
+            # A concurrent extraction might have created the directory.
+            if e.errno != errno.EEXIST or not os.path.isdir(parent):
+                raise
+
+
+class _Reader(object):
+    """A sequential stream reader which supports pushback."""
+
+    def __init__(self, fp):
+        """
+        :param fp: the input stream
+        """
+        self._fp = fp
+        self._buffer = ''
+
+    def read(self, size):
+        """
+        Reads up to the given number of bytes. Fewer bytes are
+        returned only at the end of the stream.
+
+        :param size: the number of bytes to read
+        :return: the content
+        """
+        chunks = []
+        if self._buffer:
+            chunks.append(self._buffer[:size])
+            self._buffer = self._buffer[size:]
+            size -= len(chunks[0])
+        while size > 0:
+            chunk = self._fp.read(size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size -= len(chunk)
+
+        return ''.join(chunks)
+
+    def unread(self, content):
+        """
+        Pushes the given content back onto the stream.
+
+        :param content: the content to read next
+        """
+        self._buffer = content + self._buffer
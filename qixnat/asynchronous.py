@@ -0,0 +1,128 @@
+"""
+.. module:: asynchronous
+    :synopsis: Non-blocking XNAT facade operations.
+"""
+from multiprocessing.pool import ThreadPool
+from qiutil.logging import logger
+
+
+class AsyncXNAT(object):
+    """
+    AsyncXNAT submits :class:`qixnat.facade.XNAT` operations to a
+    bounded worker pool and returns immediately. Each operation returns
+    a ``multiprocessing.pool.AsyncResult`` whose ``get`` method waits
+    for and returns the operation result, or raises the operation
+    exception.
+
+    The operations have the same hierarchy and wildcard semantics as
+    the corresponding :class:`qixnat.facade.XNAT` methods, since the
+    operations are delegated to the wrapped facade. The operations
+    share the facade :attr:`qixnat.facade.XNAT.cache` and HTTP
+    connection pool, which is enlarged to the number of workers if
+    necessary.
+
+    An AsyncXNAT instance is created in a :meth:`qixnat.connect_async`
+    context, e.g.:
+
+    >>> import qixnat
+    >>> with qixnat.connect_async() as xnat:
+    ...     pending = [xnat.download('QIN', sbj, 'Session01', scan=1,
+    ...                              resource='NIFTI', dest=sbj)
+    ...                for sbj in ['Breast001', 'Breast002']]
+    ...     files = [result.get() for result in pending]
+
+    :Note: Python 2 does not support ``asyncio``. The operations run
+        on a thread pool rather than an event loop.
+    """
+
+    WORKERS = 16
+    """The default maximum number of concurrent operations."""
+
+    def __init__(self, xnat, workers=None):
+        """
+        :param xnat: the :class:`qixnat.facade.XNAT` facade
+        :param workers: the maximum number of concurrent operations
+            (default :const:`WORKERS`)
+        """
+        self._logger = logger(__name__)
+        self.xnat = xnat
+        """The wrapped :class:`qixnat.facade.XNAT` facade."""
+
+        self.workers = int(workers or self.WORKERS)
+        """The maximum number of concurrent operations."""
+
+        # Enlarge the HTTP connection pool so that the workers do not
+        # contend for connections.
+        if self.workers > xnat.pool_size:
+            xnat.resize_pool(self.workers)
+        self._pool = ThreadPool(self.workers)
+
+    def close(self):
+        """Waits for the pending operations to complete."""
+        self._pool.close()
+        self._pool.join()
+        self._logger.debug("Closed the asynchronous XNAT client.")
+
+    def find(self, *args, **opts):
+        """
+        Submits a :meth:`qixnat.facade.XNAT.find` call.
+
+        :param args: the :meth:`qixnat.facade.XNAT.find` arguments
+        :param opts: the :meth:`qixnat.facade.XNAT.find` options
+        :return: the pending XNAT object list result
+        """
+        return self.submit(self.xnat.find, *args, **opts)
+
+    def find_path(self, path, **opts):
+        """
+        Submits a :meth:`qixnat.facade.XNAT.find_path` call.
+
+        :param path: the XNAT object path
+        :param opts: the :meth:`qixnat.facade.XNAT.find_path` options
+        :return: the pending XNAT object list result
+        """
+        return self.submit(self.xnat.find_path, path, **opts)
+
+    def download(self, *args, **opts):
+        """
+        Submits a :meth:`qixnat.facade.XNAT.download` call.
+
+        :param args: the :meth:`qixnat.facade.XNAT.download` arguments
+        :param opts: the :meth:`qixnat.facade.XNAT.download` options
+        :return: the pending downloaded file name list result
+        """
+        return self.submit(self.xnat.download, *args, **opts)
+
+    def upload(self, resource, *in_files, **opts):
+        """
+        Submits a :meth:`qixnat.facade.XNAT.upload` call.
+
+        :param resource: the existing XNAT resource object
+        :param in_files: the input files to upload
+        :param opts: the :meth:`qixnat.facade.XNAT.upload` options
+        :return: the pending XNAT file name list result
+        """
+        return self.submit(self.xnat.upload, resource, *in_files, **opts)
+
+    def delete_objects(self, objs, **opts):
+        """
+        Submits a :meth:`qixnat.facade.XNAT.delete_objects` call.
+
+        :param objs: the XNAT objects to delete
+        :param opts: the :meth:`qixnat.facade.XNAT.delete_objects`
+            options
+        :return: the pending deleted XNAT object list result
+        """
+        return self.submit(self.xnat.delete_objects, objs, **opts)
+
+    def submit(self, func, *args, **opts):
+        """
+        Submits the given function call to the worker pool.
+
+        :param func: the function to call, usually a
+            :class:`qixnat.facade.XNAT` method
+        :param args: the function arguments
+        :param opts: the function keyword arguments
+        :return: the pending function result
+        """
+        return self._pool.apply_async(func, args, opts)
@@ -0,0 +1,381 @@
+"""
+.. module:: bench
+    :synopsis: End-to-end XNAT facade benchmarks.
+
+The benchmarks drive the :class:`qixnat.facade.XNAT` operations against
+a synthetic project on a :class:`qixnat.testing.StandIn` server with
+injected latency. Run the benchmarks as follows::
+
+    python -m qixnat.bench --subjects 8 --latency 0.02 -o bench.json
+
+The JSON report can be compared across qixnat releases.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import resource
+import multiprocessing
+from Queue import Empty
+from datetime import datetime
+import qiutil
+from qiutil.logging import logger
+from . import __version__
+from .connection import connect
+from .testing import StandIn
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+PROJECT = 'QIN_Bench'
+"""The synthetic project name."""
+
+RESOURCE = 'NIFTI'
+"""The synthetic scan resource label."""
+
+BENCHMARKS = ['find', 'find_path', 'download', 'upload', 'find_or_create',
+              'delete']
+"""The benchmark names, in run order."""
+
+SHAPE = dict(subjects=4, sessions=2, scans=4, files=4, size=64 * 1024)
+"""The default synthetic project shape."""
+
+
+def run(benchmarks=None, repeat=1, latency=0.005, bandwidth=None, workers=1,
+        **shape):
+    """
+    Runs the given benchmarks.
+
+    Each benchmark run is isolated in a separate process with a new
+    stand-in server and XNAT connection. Thus, the runs do not share a
+    cache. The stand-in server runs in yet another process, so that
+    the result *peak_rss* is the peak resident set size of the XNAT
+    facade process alone, including the untimed benchmark setup.
+
+    :param benchmarks: the :const:`BENCHMARKS` to run (default all)
+    :param repeat: the number of runs of each benchmark
+    :param latency: the stand-in per-request delay in seconds
+    :param bandwidth: the stand-in throughput limit in bytes per second
+        (default unlimited)
+    :param workers: the facade operation *workers* option
+    :param shape: the :const:`SHAPE` overrides
+    :return: the report {field: value} dictionary
+    """
+    shape = dict(SHAPE, **shape)
+    settings = dict(latency=latency, bandwidth=bandwidth, workers=workers)
+    results = []
+    for name in benchmarks or BENCHMARKS:
+        for number in range(1, repeat + 1):
+            result = _run_isolated(name, shape, **settings)
+            result.update(benchmark=name, run=number)
+            results.append(result)
+            logger(__name__).debug("Benchmark %s run %d: %s" %
+                                   (name, number, result))
+
+    return dict(qixnat=__version__, python=platform.python_version(),
+                created=datetime.now().isoformat(), shape=shape,
+                results=results, **settings)
+
+
+def _run_isolated(name, shape, **settings):
+    """
+    Runs the given benchmark in a child process.
+
+    :param name: the benchmark name
+    :param shape: the synthetic project shape
+    :param settings: the :meth:`run` latency, bandwidth and workers
+    :return: the :meth:`_run_benchmark` result
+    :raise BenchmarkError: if the benchmark failed
+    """
+    queue = multiprocessing.Queue()
+
+    def target():
+        try:
+            queue.put((_run_benchmark(name, shape, **settings), None))
+        except Exception as e:
+            queue.put((None, "%s: %s" % (e.__class__.__name__, e)))
+
+    process = multiprocessing.Process(target=target)
+    process.start()
+    while True:
+        try:
+            result, error = queue.get(timeout=1)
+            break
+        except Empty:
+            if not process.is_alive():
+                raise BenchmarkError("The %s benchmark process exited with"
+                                     " status %s" % (name, process.exitcode))
+    process.join()
+    if error:
+        raise BenchmarkError("The %s benchmark failed: %s" % (name, error))
+
+    return result
+
+
+def _run_benchmark(name, shape, latency=0, bandwidth=None, workers=1):
+    """
+    Runs the given benchmark on a new stand-in server.
+
+    The stand-in server runs in a separate :meth:`_serve` process, so
+    that the synthetic project content held by the server does not
+    count toward the peak RSS of the benchmark process.
+
+    :param name: the benchmark name
+    :param shape: the synthetic project shape
+    :param latency: the stand-in per-request delay in seconds
+    :param bandwidth: the stand-in throughput limit in bytes per second
+    :param workers: the facade operation *workers* option
+    :return: the result {field: value} dictionary
+    """
+    work_dir = tempfile.mkdtemp()
+    conn, server_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_serve,
+                                     args=(server_conn, name, shape,
+                                           latency, bandwidth))
+    server.start()
+    # Only the server process writes to its end of the pipe, so that
+    # a server failure is detected as end of file.
+    server_conn.close()
+
+    def receive():
+        try:
+            return conn.recv()
+        except EOFError:
+            raise BenchmarkError("The %s benchmark stand-in server process"
+                                 " exited with status %s" %
+                                 (name, server.exitcode))
+
+    def call(command):
+        conn.send(command)
+        return receive()
+
+    try:
+        config = receive()
+        with connect(config) as xnat:
+            operation = globals()['_' + name]
+            prepared = operation(xnat, shape, work_dir, workers)
+            call('reset')
+            start = time.time()
+            count = prepared()
+            seconds = time.time() - start
+            requests, downloaded, uploaded = call('counters')
+    finally:
+        try:
+            conn.send('stop')
+        except IOError:
+            # The server process already exited.
+            pass
+        server.join()
+        shutil.rmtree(work_dir, True)
+
+    return dict(seconds=round(seconds, 3), requests=requests, objects=count,
+                bytes_downloaded=downloaded, bytes_uploaded=uploaded,
+                peak_rss=_peak_rss())
+
+
+def _serve(conn, name, shape, latency, bandwidth):
+    """
+    Runs the stand-in server for the given benchmark. The server
+    configuration file location is sent on the pipe connection when
+    the server is ready. The server then replies to the following
+    commands until the ``stop`` command is received:
+
+    * ``reset`` - clears the server counters
+
+    * ``counters`` - replies with the *(requests, bytes sent, bytes
+      received)* counters
+
+    :param conn: the pipe connection
+    :param name: the benchmark name
+    :param shape: the synthetic project shape
+    :param latency: the stand-in per-request delay in seconds
+    :param bandwidth: the stand-in throughput limit in bytes per second
+    """
+    with StandIn(projects=[PROJECT], latency=latency,
+                 bandwidth=bandwidth) as server:
+        # The create benchmark starts with an empty project, and
+        # the upload benchmark with empty resources.
+        if name == 'upload':
+            server.populate(PROJECT, files=0, resource=RESOURCE,
+                            **_populate_shape(shape))
+        elif name != 'find_or_create':
+            server.populate(PROJECT, files=shape['files'],
+                            size=shape['size'], resource=RESOURCE,
+                            **_populate_shape(shape))
+        conn.send(server.config())
+        while True:
+            command = conn.recv()
+            if command == 'reset':
+                server.reset_counters()
+                conn.send(None)
+            elif command == 'counters':
+                conn.send((server.request_count, server.bytes_sent,
+                           server.bytes_received))
+            else:
+                break
+
+
+def _populate_shape(shape):
+    """
+    :param shape: the synthetic project shape
+    :return: the :meth:`qixnat.testing.StandIn.populate` hierarchy
+        options
+    """
+    return dict((key, shape[key]) for key in ('subjects', 'sessions', 'scans'))
+
+
+def _scans(shape):
+    """
+    :param shape: the synthetic project shape
+    :return: the (subject, session, scan) names of the shape
+    """
+    return [("Subject%03d" % i, "Session%02d" % j, k)
+            for i in range(1, shape['subjects'] + 1)
+            for j in range(1, shape['sessions'] + 1)
+            for k in range(1, shape['scans'] + 1)]
+
+
+def _peak_rss():
+    """
+    :return: the current process peak resident set size in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, Mac OS X bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+# The benchmark operations. Each operation prepares the untimed
+# benchmark setup and returns the timed function, which in turn
+# returns the number of objects processed.
+
+def _find(xnat, shape, work_dir, workers):
+    return lambda: len(xnat.find(PROJECT, '*', '*', scan='*',
+                                 resource='*', file='*'))
+
+
+def _find_path(xnat, shape, work_dir, workers):
+    path = "/%s/*/*/scan/*/resource/*/files" % PROJECT
+
+    return lambda: len(xnat.find_path(path))
+
+
+def _download(xnat, shape, work_dir, workers):
+    def download():
+        count = 0
+        # The scan file names are the same in each scan, so each scan
+        # is downloaded to a separate directory.
+        for sbj, sess, scan in _scans(shape):
+            dest = os.path.join(work_dir, sbj, sess, str(scan))
+            count += len(xnat.download(PROJECT, sbj, sess, scan=scan,
+                                       resource=RESOURCE, dest=dest,
+                                       workers=workers))
+        return count
+
+    return download
+
+
+def _upload(xnat, shape, work_dir, workers):
+    in_files = []
+    content = os.urandom(shape['size'])
+    for number in range(1, shape['files'] + 1):
+        location = os.path.join(work_dir, "volume%03d.nii.gz" % number)
+        with open(location, 'wb') as fp:
+            fp.write(content)
+        in_files.append(location)
+    resources = xnat.find(PROJECT, '*', '*', scan='*', resource=RESOURCE)
+
+    def upload():
+        return sum(len(xnat.upload(rsc, *in_files, workers=workers))
+                   for rsc in resources)
+
+    return upload
+
+
+def _find_or_create(xnat, shape, work_dir, workers):
+    def create():
+        for sbj, sess, scan in _scans(shape):
+            xnat.find_or_create(PROJECT, sbj, sess, scan=scan,
+                                resource=RESOURCE, modality='MR')
+        return len(_scans(shape))
+
+    return create
+
+
+def _delete(xnat, shape, work_dir, workers):
+    def delete():
+        xnat.delete(PROJECT, '*', workers=workers)
+        return shape['subjects']
+
+    return delete
+
+
+def main(argv=sys.argv):
+    """
+    Runs the benchmarks and writes the JSON report.
+
+    :param argv: the command line arguments
+    :return: the exit status
+    """
+    opts = _parse_arguments(argv[1:])
+    output = opts.pop('output', None)
+    log_opts = dict((key, opts.pop(key)) for key in ('log', 'log_level')
+                    if key in opts)
+    qiutil.command.configure_log('qixnat', **log_opts)
+    report = run(**opts)
+    content = json.dumps(report, indent=2, separators=(',', ': '),
+                         sort_keys=True)
+    if output:
+        with open(output, 'w') as fp:
+            fp.write(content + '\n')
+    else:
+        print content
+
+    return 0
+
+
+def _parse_arguments(args):
+    """Parses the command line arguments."""
+    parser = argparse.ArgumentParser(prog='python -m qixnat.bench')
+    # The log options.
+    qiutil.command.add_options(parser)
+    # The benchmark selection.
+    parser.add_argument('-b', '--benchmark', dest='benchmarks',
+                        action='append', choices=BENCHMARKS,
+                        help='the benchmark to run (default all)')
+    parser.add_argument('--repeat', type=int, default=1, metavar='N',
+                        help='the number of runs of each benchmark'
+                             ' (default 1)')
+    # The synthetic project shape.
+    for key in ('subjects', 'sessions', 'scans', 'files'):
+        parser.add_argument('--' + key, type=int, metavar='N',
+                            help="the number of %s (default %d)" %
+                                 (key, SHAPE[key]))
+    parser.add_argument('--size', type=int, metavar='BYTES',
+                        help="the file size (default %d)" % SHAPE['size'])
+    # The stand-in server settings.
+    parser.add_argument('--latency', type=float, default=0.005,
+                        metavar='SECONDS',
+                        help='the per-request delay (default 0.005)')
+    parser.add_argument('--bandwidth', type=int, metavar='BYTES',
+                        help='the throughput limit per second'
+                             ' (default unlimited)')
+    # The concurrency option.
+    parser.add_argument('-j', '--workers', type=int, default=1, metavar='N',
+                        help='the facade operation workers (default 1)')
+    # The report location.
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help='the JSON report file (default standard'
+                             ' output)')
+    args = vars(parser.parse_args(args))
+
+    return dict((k, v) for k, v in args.iteritems() if v != None)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
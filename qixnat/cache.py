@@ -0,0 +1,148 @@
+"""
+.. module:: cache
+    :synopsis: Bounded least-recently-used cache with expiration.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+
+class Cache(object):
+    """
+    A thread-safe least-recently-used cache whose entries expire after
+    a fixed time to live.
+
+    Example:
+
+    >>> from qixnat.cache import Cache
+    >>> cache = Cache(size=2, ttl=60)
+    >>> cache.put('a', 1)
+    >>> cache.get('a')
+    1
+    >>> cache.get('b', 'missing')
+    'missing'
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+
+    def __init__(self, size, ttl):
+        """
+        :param size: the maximum number of entries, or zero to disable
+            caching
+        :param ttl: the entry time to live in seconds, or None for no
+            expiration
+        """
+        self.size = size
+        """The maximum number of entries."""
+
+        self.ttl = ttl
+        """The entry time to live in seconds."""
+
+        self.hits = 0
+        """The number of :meth:`get` calls which found a live entry."""
+
+        self.misses = 0
+        """
+        The number of :meth:`get` calls which did not find a live
+        entry.
+        """
+
+        self.evictions = 0
+        """
+        The number of entries which were dropped to make room for a new
+        entry.
+        """
+
+        self._entries = OrderedDict()
+        """The {key: (expiration time, value)} dictionary."""
+
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._live_entry(key) is not None
+
+    def get(self, key, default=None):
+        """
+        :param key: the cache key
+        :param default: the value to return if there is no live entry
+        :return: the cached value, or the default if there is no live
+            entry
+        """
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            # Mark the entry as most recently used.
+            del self._entries[key]
+            self._entries[key] = entry
+
+            return entry[1]
+
+    def put(self, key, value):
+        """
+        Caches the given value. If the cache is full, then the least
+        recently used entry is evicted.
+
+        :param key: the cache key
+        :param value: the value to cache
+        """
+        if not self.size:
+            return
+        expires = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._entries[key] = (expires, value)
+
+    def discard(self, predicate):
+        """
+        Removes the entries whose key satisfies the given predicate.
+
+        :param predicate: the key filter function
+        :return: the number of removed entries
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+
+        return len(keys)
+
+    def clear(self):
+        """Removes all entries. The counters are not reset."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        :return: the {counter: value} dictionary, including the current
+            entry count
+        """
+        return dict(entries=len(self._entries), hits=self.hits,
+                    misses=self.misses, evictions=self.evictions)
+
+    def _live_entry(self, key):
+        """
+        Returns the unexpired (expiration time, value) entry for the
+        given key. An expired entry is removed.
+
+        :param key: the cache key
+        :return: the live entry, or None if none
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires = entry[0]
+        if expires is not None and expires <= time.time():
+            del self._entries[key]
+            return None
+
+        return entry
@@ -2,8 +2,10 @@ import os
 import re
 import tempfile
 import shutil
+import threading
 from contextlib import contextmanager
 from .facade import XNAT
+from .asynchronous import AsyncXNAT
 from . import configuration 
 from qiutil.logging import logger
 
@@ -13,7 +15,7 @@ class ConnectError(Exception):
 
 
 @contextmanager
-def connect(config=None, **opts):
+def connect(config=None, shared=True, **opts):
     """
     Yields a :class:`qixnat.facade.XNAT` instance.
     
@@ -22,6 +24,15 @@ def connect(config=None, **opts):
     Otherwise, this method yields the existing XNAT instance.
     The XNAT connection is closed when the outermost connection
     block finishes.
+
+    By default, the XNAT instance is shared by all threads in the
+    process. The shared instance HTTP session keeps up to
+    :const:`qixnat.facade.XNAT.POOL_SIZE` connections alive for
+    reuse by the concurrent threads. If the *shared* flag is False,
+    then each thread has its own XNAT instance, HTTP session and
+    cache directory. In either case, the connection reference count
+    is synchronized, so a thread does not close the connection while
+    another thread is using it.
     
     The new XNAT connection is established as follows:
     
@@ -60,72 +71,137 @@ def connect(config=None, **opts):
 
     :param config: the XNAT configuration file, or None
         for the :meth:`qixnat.configuration.load` default
+    :param shared: flag indicating whether to share the XNAT
+        instance across threads (default True)
     :param opts: the :class:`qixnat.facade.XNAT`
         initialization options
     :yield: the XNAT instance
     """
-    # The *counter* function variable holds the active connection
-    # context reference count.
-    if not hasattr(connect, 'counter'):
-        # The connection count.
-        connect.counter = 0
-        # The connection cache directory.
-        connect.cachedir = None
-    # If there no active connections, then do a real XNAT connect.
-    if not connect.counter:
-        _connect(config, **opts)
-    # Increment the connect reference counter.
-    connect.counter += 1
+    # The shared or current thread connection.
+    connection = _shared if shared else _thread_connection()
+    with connection.lock:
+        # If there are no active connections, then do a real XNAT
+        # connect.
+        if not connection.counter:
+            connection.open(config, **opts)
+        # Increment the connect reference counter.
+        connection.counter += 1
     # Pass back the XNAT facade in an execution context with clean-up.
     try:
-        yield connect.xnat
+        yield connection.xnat
     finally:
-        # Decrement the connection counter.
-        connect.counter -= 1
-        # If there are no more active connections, then disconnect.
-        if not connect.counter:
-            _disconnect()
+        with connection.lock:
+            # Decrement the connection counter.
+            connection.counter -= 1
+            # If there are no more active connections, then disconnect.
+            if not connection.counter:
+                connection.close()
+
 
-def _connect(config=None, **opts):
+@contextmanager
+def connect_async(config=None, workers=None, **opts):
     """
-    Opens a XNAT connection.
+    Yields a :class:`qixnat.asynchronous.AsyncXNAT` instance which
+    wraps the :meth:`connect` XNAT instance. The pending operations
+    are completed when the connection block finishes.
+
+    Example:
+
+    >>> import qixnat
+    >>> with qixnat.connect_async() as xnat:
+    ...    pending = xnat.find('QIN', 'Breast*')
+    ...    subjects = pending.get()
 
     :param config: the XNAT configuration file, or None
         for the :meth:`qixnat.configuration.load` default
+    :param workers: the maximum number of concurrent operations
+        (default :const:`qixnat.asynchronous.AsyncXNAT.WORKERS`)
     :param opts: the :class:`qixnat.facade.XNAT`
         initialization options
+    :yield: the AsyncXNAT instance
     """
-    # Load the configuration file or default.
-    opts.update(configuration.load(config))
-
-    # If the pyxnat cachedir is not set, then make a new temp
-    # directory for the exclusive use of this execution process.
-    cachedir = opts.get('cachedir')
-    if not cachedir:
-        cachedir = tempfile.mkdtemp()
-        connect.cachedir = opts['cachedir'] = cachedir
-        logger(__name__).debug("The XNAT cache directory is %s" % cachedir)
-
-    logger(__name__).debug('Connecting to XNAT...')
-    connect.xnat = XNAT(**opts)
-    logger(__name__).debug('Connected to XNAT.')
+    with connect(config, **opts) as xnat:
+        client = AsyncXNAT(xnat, workers)
+        try:
+            yield client
+        finally:
+            client.close()
 
 
-def _disconnect():
+def _thread_connection():
     """
-    Closes the xnat connection and deletes the cache directory.
+    :return: the current thread :class:`_Connection`
     """
-    connect.xnat.close()
-    cachedir = connect.cachedir
-    # If this connection created a cache directory, then delete it.
-    if cachedir:
-        # Unset the cachedir first so that it can be safely deleted. 
-        connect.cachedir = None
-        # Delete the cache directory
-        try:
-            shutil.rmtree(cachedir)
-        except Exception:
-            # Issue a warning and move on.
-            logger(__name__).warn("Could not delete the XNAT cache"
-                                  " directory %s" % cachedir)
-    logger(__name__).debug('Closed the XNAT connection.')
+    if not hasattr(_local, 'connection'):
+        _local.connection = _Connection()
+
+    return _local.connection
+
+
+class _Connection(object):
+    """A reference-counted XNAT connection."""
+
+    def __init__(self):
+        self.xnat = None
+        """The connected XNAT facade."""
+
+        self.counter = 0
+        """The number of active :meth:`connect` contexts."""
+
+        self.cachedir = None
+        """The temp cache directory created by :meth:`open`, if any."""
+
+        self.lock = threading.RLock()
+        """The connection state lock."""
+
+    def open(self, config=None, **opts):
+        """
+        Opens a XNAT connection.
+
+        :param config: the XNAT configuration file, or None
+            for the :meth:`qixnat.configuration.load` default
+        :param opts: the :class:`qixnat.facade.XNAT`
+            initialization options
+        """
+        # Load the configuration file or default.
+        opts.update(configuration.load(config))
+
+        # If the pyxnat cachedir is not set, then make a new temp
+        # directory for the exclusive use of this connection.
+        cachedir = opts.get('cachedir')
+        if not cachedir:
+            cachedir = tempfile.mkdtemp()
+            self.cachedir = opts['cachedir'] = cachedir
+            logger(__name__).debug("The XNAT cache directory is %s" %
+                                   cachedir)
+
+        logger(__name__).debug('Connecting to XNAT...')
+        self.xnat = XNAT(**opts)
+        logger(__name__).debug('Connected to XNAT.')
+
+    def close(self):
+        """
+        Closes the xnat connection and deletes the cache directory.
+        """
+        self.xnat.close()
+        self.xnat = None
+        cachedir = self.cachedir
+        # If this connection created a cache directory, then delete it.
+        if cachedir:
+            # Unset the cachedir first so that it can be safely deleted.
+            self.cachedir = None
+            # Delete the cache directory
+            try:
+                shutil.rmtree(cachedir)
+            except Exception:
+                # Issue a warning and move on.
+                logger(__name__).warn("Could not delete the XNAT cache"
+                                      " directory %s" % cachedir)
+        logger(__name__).debug('Closed the XNAT connection.')
+
+
+_shared = _Connection()
+"""The process-wide connection."""
+
+_local = threading.local()
+"""The thread-local connection holder."""
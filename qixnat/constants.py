@@ -46,4 +46,13 @@ DATE_FMT = "%Y-%m-%d"
 """
 The XML schema xs:date string format which pyxnat uses to represent
 dates.
-"""
\ No newline at end of file
+"""
+SEARCH_KEY_COLUMNS = dict(
+    subject='label', experiment='label', scan='ID', assessor='label',
+    reconstruction='ID', resource='label', in_resource='label',
+    out_resource='label'
+)
+"""
+The listing column which holds the search key of the XNAT types whose
+listing can be filtered on that key by the XNAT server.
+"""
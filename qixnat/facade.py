@@ -1,17 +1,31 @@
 import os
 import re
+import errno
+import urllib
+import httplib
+import uuid
+import threading
+from collections import Counter
+from multiprocessing.pool import ThreadPool
 from qiutil.logging import logger
 from qiutil.collections import (concat, is_nonstring_iterable)
 from qiutil.file import splitexts
 from .constants import (CONTAINER_DESIGNATIONS, CONTAINER_TYPES,
                         ASSESSOR_SYNONYMS, MODALITY_TYPES,
-                        INOUT_CONTAINER_TYPES, HIERARCHICAL_LABEL_TYPES)
-from .helpers import (xnat_key, path_hierarchy, hierarchical_label,
-                      rest_type, rest_date, pluralize_type_designator)
+                        INOUT_CONTAINER_TYPES, HIERARCHICAL_LABEL_TYPES,
+                        UNLABELED_TYPES, SEARCH_KEY_COLUMNS)
+from . import archive
+from .cache import Cache
+from .index import Index
+from .lock import FileLock
+from .helpers import (path_hierarchy, hierarchy_path, hierarchical_label,
+                      key_matches, prune_descendants, rest_type, rest_date,
+                      pluralize_type_designator, file_digest)
 try:
     import pyxnat
     from pyxnat.core.resources import (Project, File)
     from  pyxnat.core.errors import DatabaseError
+    from requests.adapters import HTTPAdapter
 except ImportError:
     # Ignore pyxnat import failure to allow ReadTheDocs auto-builds.
     # See the installation instructions for why auto-build fails.
@@ -22,6 +36,22 @@ class XNATError(Exception):
     pass
 
 
+class XNATBatchError(XNATError):
+    """
+    Collects the failures of a multi-item XNAT operation, e.g. a
+    concurrent download.
+    """
+
+    def __init__(self, failures):
+        """
+        :param failures: the [(item, exception), ...] list
+        """
+        details = '\n'.join("%s: %s" % failure for failure in failures)
+        super(XNATBatchError, self).__init__("%d XNAT operations failed:\n%s" %
+                                             (len(failures), details))
+        self.failures = failures
+
+
 class XNAT(object):
     """
     XNAT is a pyxnat facade convenience class. An XNAT instance is
@@ -194,38 +224,202 @@ class XNAT(object):
     SUBJECT_QUERY_FMT = "/project/%s/subject/%s"
     """The subject query template."""
 
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
+    """The file download buffer size in bytes."""
+
+    VALIDATOR_SUFFIX = '.validator'
+    """
+    The file name suffix of the XNAT file version validator which is
+    saved beside a ``.part`` download checkpoint.
+    """
+
+    UPLOAD_ARCHIVE_NAME = 'files.zip'
+    """The :meth:`upload_archive` zip file name."""
+
+    VERIFY_MODES = ['size', 'md5']
+    """The file transfer *verify* options."""
+
+    SYNC_DIRECTIONS = ['up', 'down']
+    """The :meth:`sync` upload and download directions."""
+
+    FIND_WORKERS = 8
+    """The maximum number of concurrent :meth:`find` child listings."""
+
+    CACHE_SIZE = 0
+    """
+    The default maximum number of :attr:`cache` entries. The default
+    disables the cache, since a cached entry can be stale with respect
+    to changes made by other XNAT clients.
+    """
+
+    CACHE_TTL = 60
+    """The default :attr:`cache` entry time to live in seconds."""
+
+    POOL_SIZE = 16
+    """The default maximum number of kept-alive HTTP connections."""
+
     def __init__(self, **opts):
         """
-        :param opts: the XNAT configuration options
+        If the *cache_size* option is set, then the XNAT listings and
+        existence checks are cached in the :attr:`cache`. The cache
+        entries for an XNAT object are invalidated when this facade
+        creates, uploads to, updates or deletes the object. Changes
+        made by other XNAT clients are seen when the entry expires.
+        Thus, the cache should only be enabled if the XNAT objects
+        of interest are not concurrently changed by other clients,
+        or if the changes can be seen with a delay of up to the
+        *cache_ttl*.
+
+        In addition, the objects which this facade created, uploaded
+        or found to exist are remembered for the life of the facade,
+        and are not checked again unless this facade deletes them.
+
+        :param opts: the XNAT configuration options, as well as the
+            following cache options
+        :keyword cache_size: the maximum number of cache entries,
+            or zero to disable caching (default :const:`CACHE_SIZE`)
+        :keyword cache_ttl: the cache entry time to live in seconds
+            (default :const:`CACHE_TTL`)
+        :keyword index_location: the :attr:`index` database file
+            (default :const:`qixnat.index.DEFAULT_LOCATION`)
+        :keyword pool_size: the maximum number of kept-alive HTTP
+            connections (default :const:`POOL_SIZE`)
+        :keyword lock: the :attr:`lock` backend
+        :keyword lock_dir: the shared directory of a
+            :class:`qixnat.lock.FileLock` :attr:`lock`, if the *lock*
+            option is not set
+        :keyword lock_timeout: the :class:`qixnat.lock.FileLock`
+            lease timeout in seconds (default none)
         """
         self._logger = logger(__name__)
+        # The configuration file option values are strings.
+        size = int(opts.pop('cache_size', self.CACHE_SIZE))
+        ttl = float(opts.pop('cache_ttl', self.CACHE_TTL))
+        self.cache = Cache(size, ttl)
+        """The XNAT REST request :class:`qixnat.cache.Cache`."""
+        self._known = set()
+        """The REST URIs of the objects known to exist."""
+        self._known_lock = threading.Lock()
+        self._index_location = opts.pop('index_location', None)
+        lock_dir = opts.pop('lock_dir', None)
+        lock_timeout = opts.pop('lock_timeout', None)
+        self.lock = opts.pop('lock', None)
+        """
+        The optional :meth:`find_or_create` lease provider, e.g. a
+        :class:`qixnat.lock.FileLock`.
+        """
+        if not self.lock and lock_dir:
+            self.lock = FileLock(lock_dir, lock_timeout)
+        self._index = None
+        pool_size = int(opts.pop('pool_size', self.POOL_SIZE))
         self.interface = pyxnat.Interface(**opts)
+        self.resize_pool(pool_size)
+        # pyxnat determines the REST entry point on the first request.
+        # That check is unsynchronized, so concurrent first requests
+        # can use the wrong entry point. Serialize the check, which is
+        # still made lazily on first use.
+        self._entry_point_lock = threading.RLock()
+        self._pyxnat_entry_point = self.interface._get_entry_point
+        self.interface._get_entry_point = self._entry_point
+
+    @property
+    def index(self):
+        """The local :class:`qixnat.index.Index`, opened on demand."""
+        if not self._index:
+            self._index = Index(self._index_location)
+
+        return self._index
+
+    def _entry_point(self):
+        """
+        Determines the pyxnat REST entry point on the first call while
+        holding a lock. pyxnat sets a provisional entry point while the
+        check is in progress, so a concurrent request waits for the
+        check to complete. The lock is reentrant, since the check
+        itself makes a request.
+
+        :return: the REST entry point, e.g. ``/data``
+        """
+        with self._entry_point_lock:
+            try:
+                return self._pyxnat_entry_point()
+            except Exception:
+                # Retry the check on the next request rather than
+                # keeping the provisional entry point.
+                self.interface._entry = None
+                raise
+
+    def resize_pool(self, size):
+        """
+        Sets the maximum number of HTTP connections which the
+        :attr:`interface` session keeps alive for reuse by concurrent
+        threads.
+
+        :param size: the connection pool size
+        """
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+        for prefix in ('http://', 'https://'):
+            self.interface._http.mount(prefix, adapter)
+        self.pool_size = size
+        """The maximum number of kept-alive HTTP connections."""
 
     def close(self):
         """Drops the XNAT connection."""
+        if self._index:
+            self._index.close()
+            self._index = None
         self.interface.disconnect()
         self._logger.debug("Disconnected the XNAT client.")
 
-    def find_path(self, path):
+    def find_path(self, path, **opts):
         """
         Returns the XNAT object children in the given XNAT object path.
         The *path* string argument must conform to the
         :meth:`qixnat.helpers.path_hierarchy` requirements.
 
         :param path: the path string
+        :param opts: the additional :meth:`find` options
         :return: the XNAT child label list
         :raise: XNATError if there is no such child
         """
         # The hierarchy list.
         self._logger.debug("Expanding the path %s..." % path)
         hierarchy = path_hierarchy(path)
-        opts = dict(hierarchy)
+        opts.update(hierarchy)
         result = self.find(**opts)
         self._logger.debug("Path %s results in %d objects." %
                            (path, len(result)))
 
         return result
 
+    def find_path_iter(self, path, **opts):
+        """
+        Yields the XNAT objects in the given XNAT object path as they
+        are found. The path is described in :meth:`find_path`.
+
+        :param path: the path string
+        :param opts: the additional :meth:`find_iter` options
+        :yield: the matching XNAT objects
+        """
+        opts.update(path_hierarchy(path))
+
+        return self.find_iter(**opts)
+
+    def index_paths(self, path):
+        """
+        Returns the canonical :meth:`qixnat.helpers.xnat_path` of each
+        object in the local :attr:`index` which matches the given XNAT
+        object path, as described in :meth:`find_path`. This method
+        does not make an XNAT request.
+
+        :param path: the path string
+        :return: the matching XNAT paths
+        """
+        hierarchy = self._hierarchify(**dict(path_hierarchy(path)))
+        matches = self.index.find(self._rest_hierarchy(hierarchy))
+
+        return [hierarchy_path(match) for match in matches]
+
     def download(self, *args, **opts):
         """
         Downloads the files contained in XNAT resource or resources.
@@ -245,32 +439,134 @@ class XNAT(object):
         downloads the files for all ``QIN`` ``Breast001`` scan ``1``
         resources whose label begins with ``reg_``.
 
+        If the *archive* option is set, then each matching resource is
+        fetched in a single request as a zip archive, which is extracted
+        on the fly into the download location, as described in
+        :meth:`download_archive`. Otherwise, each matching file is
+        fetched in a separate :meth:`download_file` request.
+
         :param project: the XNAT project id
         :param subject: the XNAT subject name
         :param experiment: the XNAT experiment name
         :param opts: the :meth:`find` hierarchy and :meth:`download_file`
-            options, as well the following option:
+            options, as well the following options:
         :keyword dest: the optional download location
             (default current directory)
+        :keyword workers: the maximum number of concurrent file or
+            archive downloads (default 1)
+        :keyword archive: flag indicating whether to download each
+            resource as a zip archive (default False)
         :raise XNATError: if the options do not specify a resource
-        :return: the downloaded file names
+        :raise XNATError: if both the *skip_existing* *force* options are set
+        :raise XNATError: if the *verify* option is combined with the
+            *force* or *archive* option
+        :raise XNATError: if more than one XNAT file would be
+            downloaded to the same location, e.g. files with the same
+            name in different scans
+        :raise XNATBatchError: if one or more file downloads failed
+        :return: the downloaded file names, in :meth:`find` order
         """
+        # Can't both skip and overwrite.
+        if opts.get('skip_existing') and opts.get('force'):
+            raise XNATError('The XNAT download option --skip_existing is'
+                            ' incompatible with the --force option')
+        # The concurrent download count.
+        workers = opts.pop('workers', None) or 1
+        use_archive = opts.pop('archive', False)
+        verify = opts.get('verify')
+        if verify:
+            self._validate_verify_option(**opts)
+            if use_archive:
+                raise XNATError('The XNAT download option --verify is'
+                                ' incompatible with the --archive option')
         # The default is all resources.
         if not (opts.get('resource') or opts.get('resources')):
             opts['resource'] = '*'
-        # The default is all files.
-        if not (opts.get('file') or opts.get('files')):
-            opts['file'] = '*'
-        # The file objects.
-        files = self.find(*args, **opts)
-        if not files:
+        if use_archive:
+            # The archive entries are filtered by the file option.
+            file_opts = [opts.pop(key) for key in ('file', 'files')
+                         if key in opts]
+            pattern = file_opts[0] if file_opts else None
+            # The resource objects.
+            targets = self.find(*args, **opts)
+        else:
+            # The default is all files.
+            if not (opts.get('file') or opts.get('files')):
+                opts['file'] = '*'
+            # The file objects.
+            targets = self.find(*args, **opts)
+        if not targets:
             self._logger.debug("The query criterion does not contain any"
                                " files: %s %s" % (args, opts))
             return []
 
         # The download location.
-        if 'dest' in opts:
-            dest = opts.pop('dest')
+        dest = self._download_directory(opts.pop('dest', None))
+        self._logger.debug("Downloading %d %s %s %s to %s with %d"
+                           " workers..." %
+                           (len(targets), args, opts,
+                            'archives' if use_archive else 'files', dest,
+                            workers))
+
+        # Download the files. A failed download does not abort the
+        # other downloads. Rather, the failures are collected and
+        # reported together.
+        if use_archive:
+            # Only the transfer options apply to the archive, since the
+            # find options include the resource.
+            archive_opts = {k: opts[k] for k in ('skip_existing', 'force')
+                            if k in opts}
+            download_target = lambda rsc: self.download_archive(
+                rsc, dest, file=pattern, **archive_opts
+            )
+            return concat(*self._map_batch(download_target, targets, workers))
+        else:
+            if verify:
+                # Fetch each resource file catalog once.
+                catalogs = self._file_catalogs(targets, workers)
+                resolve = lambda file_obj: self._download_target(
+                    file_obj, dest, catalogs[file_obj.parent()._uri]
+                )
+            else:
+                resolve = lambda file_obj: self._download_target(file_obj,
+                                                                 dest)
+            # Resolve the target locations before any download, since
+            # concurrent downloads to the same location collide.
+            resolved = self._map(resolve, targets, workers)
+            counts = Counter(location for location, _ in resolved)
+            duplicates = sorted(location for location, count
+                                in counts.iteritems() if count > 1)
+            if duplicates:
+                raise XNATError("More than one XNAT file would be downloaded"
+                                " to the target location(s) %s" % duplicates)
+            download_target = lambda item: self._download_file(
+                item[0], item[1][0], item[1][1], **opts
+            )
+            return self._map_batch(download_target, zip(targets, resolved),
+                                   workers)
+
+    def _validate_verify_option(self, verify=None, **opts):
+        """
+        :param verify: the *verify* option value
+        :param opts: the other transfer options
+        :raise XNATError: if the *verify* option is not in
+            :const:`VERIFY_MODES` or is combined with the *force* option
+        """
+        if verify not in self.VERIFY_MODES:
+            raise XNATError("The XNAT verify option %s is not one of %s" %
+                            (verify, self.VERIFY_MODES))
+        if opts.get('force'):
+            raise XNATError('The XNAT verify option --verify is'
+                            ' incompatible with the --force option')
+
+    def _download_directory(self, dest=None):
+        """
+        :param dest: the download location, or None for the current
+            directory
+        :return: the download directory, which is created if necessary
+        :raise XNATError: if the location exists but is not a directory
+        """
+        if dest:
             if os.path.exists(dest):
                 # The target location must be a directory.
                 if not os.path.isdir(dest):
@@ -281,69 +577,509 @@ class XNAT(object):
                 os.makedirs(dest)
         else:
             dest = os.getcwd()
-        self._logger.debug("Downloading %d %s %s files to %s..." %
-                           (len(files), args, opts, dest))
 
-        # Download the files.
-        return [self.download_file(file_obj, dest, **opts)
-                for file_obj in files]
+        return dest
 
     def download_file(self, file_obj, dest, **opts):
         """
         Downloads the given XNAT file to the target directory.
 
+        The download is resumable. If a previous download of the file
+        was interrupted, then the partial ``.part`` file content is
+        retained and the download resumes from the end of the partial
+        content, as described in :meth:`_stream_file`.
+
+        If the *verify* option is set, then an existing target file is
+        compared to the XNAT file catalog entry. The XNAT file is
+        downloaded if and only if the existing file differs from the
+        catalog entry, as follows:
+
+        * ``size`` - the file size differs
+
+        * ``md5`` - the file size or MD5 digest differs
+
+        If the catalog does not include a digest, then the ``md5`` check
+        falls back to the ``size`` check. A file downloaded with the
+        ``md5`` option is verified against the catalog digest.
+
         :param file_obj: the XNAT File object
         :param dest: the required target directory
-        :param opts: the following option:
+        :param opts: the following options:
         :keyword skip_existing: ignore the source XNAT file if it a file of the same
-            name already exists at the target location (default False)
+            name and size already exists at the target location (default False)
         :keyword force: overwrite existing file (default False)
+        :keyword verify: the :const:`VERIFY_MODES` existing file check
+        :keyword catalog: the :meth:`_file_catalog` of the XNAT file
+            resource (default is a new catalog if the *verify* option
+            is set)
         :return: the downloaded file path
         :raise XNATError: if both the *skip_existing* *force* options are set
         :raise XNATError: if the XNAT file already exists and the *force* option
             is not set
+        :raise XNATError: if the ``md5`` verification fails
         """
-        # The target file name without directory is the XNAT file
-        # object label, which must exist.
-        fname = file_obj.label()
-        if not fname:
-            raise XNATError("The XNAT file object does not have a label: %s" %
-                            file_obj)
+        verify = opts.get('verify')
+        catalog = opts.pop('catalog', None)
+        if verify:
+            self._validate_verify_option(**opts)
+            if catalog is None:
+                catalog = self._file_catalog(file_obj.parent())
+        location, entry = self._download_target(file_obj, dest, catalog)
+
+        return self._download_file(file_obj, location, entry, **opts)
 
-        # The file location.
-        location = os.path.join(dest, fname)
+    def _download_target(self, file_obj, dest, catalog=None):
+        """
+        :param file_obj: the XNAT File object
+        :param dest: the target directory
+        :param catalog: the :meth:`_file_catalog` of the XNAT file
+            resource, if known
+        :return: the (target location, catalog entry) tuple, where
+            the entry is None if there is no catalog
+        :raise XNATError: if the XNAT file object does not have a label
+        :raise XNATError: if the XNAT file is not in the catalog
+        """
+        if catalog is None:
+            # The target file name without directory is the XNAT file
+            # object label, which must exist.
+            fname = file_obj.label()
+            if not fname:
+                raise XNATError("The XNAT file object does not have a label:"
+                                " %s" % file_obj)
+            entry = None
+        else:
+            # The catalog file name is the file path relative to the
+            # resource, which is the XNAT file object URI suffix.
+            fname = file_obj._urn
+            entry = catalog.get(fname)
+            if not entry:
+                raise XNATError("The XNAT file %s is not in the resource"
+                                " catalog" % fname)
+
+        return os.path.join(dest, fname), entry
+
+    def _download_file(self, file_obj, location, entry=None, **opts):
+        """
+        Downloads the given XNAT file to the given target location
+        as described in :meth:`download_file`.
+
+        :param file_obj: the XNAT File object
+        :param location: the :meth:`_download_target` location
+        :param entry: the :meth:`_download_target` catalog entry
+        :param opts: the :meth:`download_file` options
+        :return: the downloaded file path
+        """
+        verify = opts.get('verify')
+        # The XNAT file size is fetched on demand.
+        size = self._catalog_size(entry) if entry else None
         if os.path.exists(location):
-            # If we are directory to skip existing files, then ignore
-            # the file but capture its location.
+            # If we are directed to verify the existing file, then
+            # ignore the XNAT file if the existing file matches the
+            # catalog entry.
+            # Otherwise, if we are directory to skip existing files,
+            # then ignore the file but capture its location, unless
+            # the existing file is truncated.
             # Otherwise, if the force option is set, then overwrite the
             # existing file.
             # Otherwise, complain.
-            if opts.get('skip_existing'):
+            if verify:
+                if self._matches_catalog_entry(location, entry, verify):
+                    self._logger.debug("The existing file %s matches the"
+                                       " XNAT file." % location)
+                    return location
+                self._logger.debug("Replacing the changed existing file"
+                                   " %s..." % location)
+            elif opts.get('skip_existing'):
                 # Can't both skip and overwrite.
                 if opts.get('force'):
                     raise XNATError('The XNAT download option --skip_existing'
                                     ' is incompatible with the --force option')
-                return location
+                # An existing file is complete if and only if its size
+                # matches the XNAT file size.
+                if size is None:
+                    size = self._file_size(file_obj)
+                if size is None or os.path.getsize(location) == size:
+                    return location
+                self._logger.debug("Replacing the incomplete existing"
+                                   " file %s..." % location)
             elif not opts.get('force'):
                 raise XNATError("Download target file already exists: %s" %
                                 location)
 
         # Download the file.
         self._logger.debug("Downloading the XNAT file %s to %s..." %
-                           (fname, dest))
-        # pyxnat File.get(location) uses unreliable cache trickery to copy
-        # the file to the location. If the location is transitory, e.g. a
-        # temporary directory on a cluster node, then subsequent File.get()
-        # calls will raise an IOError. Work around this pyxnat defect by
-        # calling pyxnat File.get_copy(location), which inefficiently but
-        # safely copies the file to both the pyxnat cache and to the
-        # specified location.
-        file_obj.get_copy(location)
+                           (file_obj._urn, location))
+        # A catalog file name can include a resource subdirectory,
+        # which a concurrent download might also make.
+        parent_dir = os.path.dirname(location)
+        if not os.path.isdir(parent_dir):
+            try:
+                os.makedirs(parent_dir)
+            except OSError:
+                if not os.path.isdir(parent_dir):
+                    raise
+        self._stream_file(file_obj, location, size)
+        if verify == 'md5' and not self._matches_catalog_entry(location, entry,
+                                                                verify):
+            os.remove(location)
+            raise XNATError("The XNAT file %s download does not match the"
+                            " catalog digest" % file_obj._urn)
         self._logger.debug("Downloaded the XNAT file %s." % location)
 
         # Return the target location.
         return location
 
+    def _stream_file(self, file_obj, location, size=None):
+        """
+        Streams the given XNAT file content to the target location.
+
+        The pyxnat ``File.get_copy`` method copies the file to both
+        the pyxnat cache and to the target location. By contrast, this
+        method reads the HTTP response in :const:`DOWNLOAD_CHUNK_SIZE`
+        chunks directly into a partial file beside the target location.
+        Thus, the download does not touch the pyxnat cache and memory
+        usage is independent of the file size.
+
+        The partial file is unique to this transfer, so that concurrent
+        transfers do not write to the same file. If the download does
+        not complete, then the partial file is retained as the
+        ``.part`` checkpoint beside the target location, together with
+        the XNAT file version validator, i.e. the response ``ETag`` or
+        ``Last-Modified`` header. A subsequent transfer claims the
+        checkpoint, as described in :meth:`_claim_checkpoint`, requests
+        the remaining content with HTTP ``Range`` and ``If-Range``
+        headers and appends it to the partial content. If the XNAT file
+        has changed since the checkpoint, if the XNAT server does not
+        honor the range request or if the checkpoint does not have a
+        validator, then the download restarts from the beginning.
+
+        The partial file is renamed to the target location if and only
+        if its size matches the XNAT file size.
+
+        :param file_obj: the XNAT File object
+        :param location: the target file path
+        :param size: the XNAT file size, if known
+        :raise XNATError: if the XNAT server rejects the request
+        :raise XNATError: if the download is incomplete
+        """
+        fname = os.path.basename(location)
+        part_file = location + '.part'
+        transfer_file, validator = self._claim_checkpoint(part_file)
+        completed = False
+        try:
+            # Resume from the end of the partial content, if any,
+            # provided that the partial content version is known.
+            offset = os.path.getsize(transfer_file) if validator else 0
+            while True:
+                if offset:
+                    self._logger.debug("Resuming the XNAT file %s download"
+                                       " at byte %d..." % (fname, offset))
+                    headers = {'Range': "bytes=%d-" % offset,
+                               'If-Range': validator}
+                else:
+                    headers = {}
+                response = self.interface.get(file_obj._uri, headers=headers,
+                                              stream=True)
+                # A range beyond the end of the XNAT file signals a stale
+                # partial file. In that case, start over.
+                if offset and (response.status_code ==
+                               httplib.REQUESTED_RANGE_NOT_SATISFIABLE):
+                    self._logger.debug("Discarding the stale partial"
+                                       " download of %s." % fname)
+                    response.close()
+                    offset = 0
+                else:
+                    break
+            try:
+                if not response.ok:
+                    raise XNATError("The XNAT file %s download failed with"
+                                    " HTTP status %d" %
+                                    (fname, response.status_code))
+                # Append to the partial content if and only if the
+                # server honored the range request. Otherwise, the
+                # response is the full content of the current XNAT
+                # file version.
+                if response.status_code != httplib.PARTIAL_CONTENT:
+                    offset = 0
+                    validator = self._response_validator(response)
+                if size is None:
+                    size = self._response_size(response, offset)
+                with open(transfer_file, 'ab' if offset else 'wb') as fp:
+                    for chunk in response.iter_content(
+                            chunk_size=self.DOWNLOAD_CHUNK_SIZE):
+                        fp.write(chunk)
+            finally:
+                response.close()
+
+            # The download is complete if and only if the size matches.
+            if size is None:
+                size = self._file_size(file_obj)
+            actual = os.path.getsize(transfer_file)
+            if size is not None and actual != size:
+                if actual > size:
+                    # The partial content is corrupt.
+                    os.remove(transfer_file)
+                raise XNATError("The XNAT file %s download is incomplete -"
+                                " expected %d bytes, found %d bytes" %
+                                (fname, size, actual))
+            # Move the completed download into place.
+            os.rename(transfer_file, location)
+            completed = True
+        finally:
+            if not completed and os.path.exists(transfer_file):
+                # Retain the partial content as the checkpoint of a
+                # subsequent download.
+                if os.path.getsize(transfer_file):
+                    self._retain_checkpoint(transfer_file, part_file,
+                                            validator)
+                else:
+                    os.remove(transfer_file)
+
+    def _claim_checkpoint(self, part_file):
+        """
+        Makes a new partial download file which is unique to the
+        calling transfer. If there is a ``.part`` checkpoint of an
+        interrupted download, then the checkpoint is atomically renamed
+        to the new partial file. Thus, at most one transfer resumes from
+        a checkpoint.
+
+        :param part_file: the ``.part`` checkpoint location
+        :return: the (new partial file, checkpoint validator) tuple,
+            where the partial file holds the checkpoint content, if
+            any, and the validator is None if there is no checkpoint
+            or the checkpoint does not have a validator
+        """
+        # The unique partial file is created with the default
+        # permissions, since it becomes the downloaded file.
+        base = part_file[:-len('.part')]
+        transfer_file = "%s.%s.part" % (base, uuid.uuid4().hex)
+        os.close(os.open(transfer_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY,
+                         0666))
+        try:
+            os.rename(part_file, transfer_file)
+        except OSError as e:
+            # No checkpoint is not an error.
+            if e.errno != errno.ENOENT:
+                raise
+            return transfer_file, None
+        # The checkpoint validator, if any.
+        validator_file = part_file + self.VALIDATOR_SUFFIX
+        try:
+            with open(validator_file) as fp:
+                validator = fp.read().strip() or None
+            os.remove(validator_file)
+        except (IOError, OSError) as e:
+            if e.errno != errno.ENOENT:
+                raise
+            validator = None
+
+        return transfer_file, validator
+
+    def _retain_checkpoint(self, transfer_file, part_file, validator=None):
+        """
+        Saves the given partial download file as the ``.part``
+        checkpoint described in :meth:`_stream_file`.
+
+        :param transfer_file: the partial download file
+        :param part_file: the ``.part`` checkpoint location
+        :param validator: the :meth:`_response_validator` of the
+            partial content, if known
+        """
+        validator_file = part_file + self.VALIDATOR_SUFFIX
+        if validator:
+            with open(validator_file, 'w') as fp:
+                fp.write(validator)
+        elif os.path.exists(validator_file):
+            os.remove(validator_file)
+        os.rename(transfer_file, part_file)
+
+    def _response_validator(self, response):
+        """
+        :param response: the XNAT file download response
+        :return: the response ``ETag`` or ``Last-Modified`` header
+            which identifies the XNAT file version, or None if the
+            response does not have a usable validator
+        """
+        etag = response.headers.get('ETag')
+        # A weak entity tag cannot validate a range request.
+        if etag and not etag.startswith('W/'):
+            return etag
+
+        return response.headers.get('Last-Modified')
+
+    def download_archive(self, resource, dest, **opts):
+        """
+        Downloads the files in the given XNAT resource as a single zip
+        archive. The archive is streamed from the XNAT server and
+        extracted on the fly by :meth:`qixnat.archive.extract`. The
+        archive itself is not saved.
+
+        An archive entry is extracted to the download directory with
+        the same relative path as the corresponding :meth:`download_file`
+        target.
+
+        :param resource: the XNAT resource object
+        :param dest: the required target directory
+        :param opts: the :meth:`download_file` options, as well as the
+            following option:
+        :keyword file: the file name pattern to extract (default all files)
+        :return: the downloaded file paths
+        :raise XNATError: if both the *skip_existing* *force* options are set
+        :raise XNATError: if an extracted file already exists and neither
+            the *skip_existing* nor the *force* option is set
+        :raise XNATError: if an archive entry would be extracted outside
+            of the target directory
+        :raise XNATError: if the XNAT server rejects the request
+        """
+        skip = opts.get('skip_existing')
+        force = opts.get('force')
+        if skip and force:
+            raise XNATError('The XNAT download option --skip_existing is'
+                            ' incompatible with the --force option')
+        pattern = opts.get('file')
+        # The regex pattern to compare against the file name.
+        pat = pattern.replace('*', '.*') if pattern else None
+        # The selected file locations, including skipped files.
+        locations = []
+        # The extracted files must be in the target directory.
+        root = os.path.join(os.path.realpath(dest), '')
+
+        def target(name, size):
+            # The archive entry name is the resource path followed by
+            # the file path relative to the resource files.
+            _, sep, path = name.partition('/files/')
+            fname = path if sep else os.path.basename(name)
+            location = os.path.normpath(os.path.join(dest, fname))
+            # Reject an absolute or parent-relative entry path.
+            if not os.path.realpath(location).startswith(root):
+                raise XNATError("The XNAT %s archive entry %s is outside of"
+                                " the target directory %s" %
+                                (resource, name, dest))
+            if pat and not re.match(pat, os.path.basename(fname)):
+                return
+            locations.append(location)
+            if os.path.exists(location):
+                if skip:
+                    if size is None or os.path.getsize(location) == size:
+                        return
+                elif not force:
+                    raise XNATError("Download target file already exists: %s" %
+                                    location)
+            return location
+
+        uri = resource._uri + '/files'
+        self._logger.debug("Downloading the XNAT %s archive to %s..." %
+                           (resource, dest))
+        response = self.interface.get(uri, params=dict(format='zip'),
+                                      stream=True)
+        try:
+            if not response.ok:
+                raise XNATError("The XNAT %s archive download failed with"
+                                " HTTP status %d" %
+                                (resource, response.status_code))
+            # Let the HTTP client undo any transfer encoding.
+            response.raw.decode_content = True
+            extracted = archive.extract(response.raw, target)
+        finally:
+            response.close()
+        self._logger.debug("Extracted %d XNAT %s archive files to %s." %
+                           (len(extracted), resource, dest))
+
+        return locations
+
+    def _file_catalog(self, resource):
+        """
+        Lists the files in the given resource in a single request.
+
+        :param resource: the XNAT resource object
+        :return: the {file name: {attribute: value}} dictionary, where
+            the attributes are the XNAT file listing columns, e.g.
+            ``Size``
+        """
+        uri = resource._uri + '/files'
+        rows = self._cached((uri, 'catalog'),
+                            lambda: self.interface._get_json(uri))
+
+        return {row['path']: row for row in rows}
+
+    def _file_catalogs(self, file_objs, workers=1):
+        """
+        Fetches the :meth:`_file_catalog` of each resource which contains
+        the given files. Each resource is listed once.
+
+        :param file_objs: the XNAT File objects
+        :param workers: the maximum number of concurrent listings
+        :return: the {resource URI: catalog} dictionary
+        """
+        resources = {}
+        for file_obj in file_objs:
+            rsc = file_obj.parent()
+            resources.setdefault(rsc._uri, rsc)
+        uris = resources.keys()
+        catalogs = self._map(lambda uri: self._file_catalog(resources[uri]),
+                             uris, workers)
+
+        return dict(zip(uris, catalogs))
+
+    def _catalog_size(self, entry):
+        """
+        :param entry: the :meth:`_file_catalog` {attribute: value} entry
+        :return: the XNAT file size in bytes, or None if the catalog
+            does not include the size
+        """
+        size = entry.get('Size')
+
+        return int(size) if size else None
+
+    def _matches_catalog_entry(self, location, entry, verify):
+        """
+        :param location: the local file path
+        :param entry: the :meth:`_file_catalog` {attribute: value} entry
+        :param verify: the :const:`VERIFY_MODES` check
+        :return: whether the local file matches the catalog entry
+        """
+        size = self._catalog_size(entry)
+        if size is not None and os.path.getsize(location) != size:
+            return False
+        if verify == 'md5':
+            digest = entry.get('digest')
+            if digest:
+                return file_digest(location) == digest.lower()
+            self._logger.debug("The XNAT catalog does not have a %s digest;"
+                               " only the size is compared." % location)
+
+        return True
+
+    def _file_size(self, file_obj):
+        """
+        :param file_obj: the XNAT File object
+        :return: the XNAT file size in bytes, or None if the XNAT
+            server does not report the size
+        """
+        size = file_obj.size()
+
+        return int(size) if size else None
+
+    def _response_size(self, response, offset):
+        """
+        :param response: the download HTTP response
+        :param offset: the requested range start
+        :return: the full file size reported by the response headers,
+            or None if the headers do not report the size
+        """
+        # The partial content range header is "bytes start-end/total".
+        content_range = response.headers.get('Content-Range')
+        if content_range:
+            total = content_range.rsplit('/', 1)[-1]
+            return int(total) if total.isdigit() else None
+        # The content length is the transfer size rather than the file
+        # size if the content is encoded.
+        if response.headers.get('Content-Encoding'):
+            return None
+        length = response.headers.get('Content-Length')
+
+        return offset + int(length) if length else None
+
     def upload(self, resource, *in_files, **opts):
         """
         Imports the given files into XNAT. The parameters and options
@@ -364,35 +1100,399 @@ class XNAT(object):
                 )
                 xnat.upload(rsc, *in_files)
 
+        If the *verify* option is set, then an input file whose name
+        matches an existing XNAT file is compared to the resource file
+        catalog entry. The input file is skipped if its content is the
+        same as the XNAT file. Otherwise, the XNAT file is overwritten.
+        The content check is as follows:
+
+        * ``size`` - the file size
+
+        * ``md5`` - the file size and MD5 digest
+
+        If the catalog does not include a digest, then the ``md5`` check
+        falls back to the ``size`` check.
+
+        If the *archive* option is set, then the input files are packed
+        into a zip archive which is uploaded in a single request and
+        extracted by the XNAT server, as described in
+        :meth:`upload_archive`. Otherwise, each input file is uploaded
+        in a separate request.
+
         :param resource: the existing XNAT resource object
         :param in_files: the input files to upload
         :param opts: the following  keyword options:
         :keyword name: the XNAT file object name
             (default is the input file base name)
+        :keyword names: the XNAT file object names, in input file order,
+            e.g. file paths relative to a directory
+            (default is the input file base names)
         :keyword skip_existing: flag indicating whether to forego
             overwriting an existing file (default False)
         :keyword force: flag indicating whether to replace an existing
             file (default False)
-        :return: the new XNAT file names
+        :keyword workers: the maximum number of concurrent file uploads
+            (default 1)
+        :keyword archive: flag indicating whether to upload the files
+            as a single zip archive (default False)
+        :keyword verify: the :const:`VERIFY_MODES` existing XNAT file
+            content check
+        :return: the new XNAT file names, in input file order
         :raise XNATError: if there are no input files
-        :raise XNATError: if the input file does not exist
+        :raise XNATError: if the number of *names* differs from the
+            number of input files
         :raise XNATError: if both the *skip_existing* *force* options
             are set
-        :raise XNATError: if the XNAT file already exists and neither
-             the *skip_existing* nor the *force* option is set
+        :raise XNATBatchError: if one or more file uploads failed, e.g.
+            because the input file does not exist or the XNAT file
+            already exists and neither the *skip_existing* nor the
+            *force* option is set
         """
         # Upload the files.
         if not in_files:
             raise XNATError("Missing the file(s) to upload")
-        self._logger.debug("Uploading %d files to %s..." %
-                           (len(in_files), resource))
-        xnat_files = [self._upload_file(resource, location, **opts)
-                      for location in in_files]
+        # Can't both skip and overwrite.
+        if opts.get('skip_existing') and opts.get('force'):
+            raise XNATError("The XNAT upload option --skip_existing is"
+                            " incompatible with the --force option")
+        if opts.get('verify'):
+            self._validate_verify_option(**opts)
+        names = opts.pop('names', None)
+        if names is not None and len(names) != len(in_files):
+            raise XNATError("The %d XNAT upload file names do not match the"
+                            " %d input files" % (len(names), len(in_files)))
+        # The concurrent upload count.
+        workers = opts.pop('workers', None) or 1
+        self._logger.debug("Uploading %d files to %s with %d workers..." %
+                           (len(in_files), resource, workers))
+        # Fetch the existing resource file names once rather than
+        # checking each file separately.
+        catalog = self._file_catalog(resource)
+        if opts.pop('archive', False):
+            return self.upload_archive(resource, *in_files, catalog=catalog,
+                                       names=names, **opts)
+        # The {input file: XNAT file name} overrides.
+        file_names = dict(zip(in_files, names or []))
+
+        def upload_file(location):
+            file_opts = dict(opts, catalog=catalog)
+            if location in file_names:
+                file_opts['name'] = file_names[location]
+            return self._upload_file(resource, location, **file_opts)
+
+        # Upload the files. A failed upload does not abort the other
+        # uploads. Rather, the failures are collected and reported
+        # together. The resource cache entries are invalidated once
+        # after the batch rather than for each file.
+        try:
+            xnat_files = self._map_batch(upload_file, in_files, workers)
+        finally:
+            self._invalidate(resource)
         self._logger.debug("%d files uploaded to %s." %
                            (len(in_files), resource))
 
         return xnat_files
 
+    def upload_archive(self, resource, *in_files, **opts):
+        """
+        Uploads the given files into the given resource as a single zip
+        archive with the XNAT ``extract`` option. The archive is built
+        on the fly by :meth:`qixnat.archive.generate` as it is sent in
+        the request body. Thus, the archive is never saved to disk.
+
+        An existing XNAT file is excluded from the archive if the
+        *skip_existing* option is set, or replaced if the *force*
+        option is set. If the *verify* option is set, then an existing
+        XNAT file is excluded if its content matches the input file,
+        or replaced otherwise.
+
+        :param resource: the existing XNAT resource object
+        :param in_files: the input files to upload
+        :param opts: the :meth:`upload` options, as well as the following
+            option:
+        :keyword catalog: the :meth:`_file_catalog` of the resource
+        :return: the XNAT file names, in input file order
+        :raise XNATError: if there are no input files
+        :raise XNATError: if an input file does not exist
+        :raise XNATError: if an input file name is not unique
+        :raise XNATError: if both the *skip_existing* *force* options
+            are set
+        :raise XNATError: if the XNAT file already exists and neither
+             the *skip_existing* nor the *force* option is set
+        :raise XNATError: if the XNAT server rejects the request
+        """
+        if not in_files:
+            raise XNATError("Missing the file(s) to upload")
+        skip = opts.get('skip_existing', False)
+        force = opts.get('force', False)
+        if skip and force:
+            raise XNATError("The XNAT upload option --skip_existing is"
+                            " incompatible with the --force option")
+        catalog = opts.get('catalog')
+        if catalog is None:
+            catalog = self._file_catalog(resource)
+        # The XNAT file names.
+        fnames = opts.get('names') or [os.path.basename(location)
+                                       for location in in_files]
+        if len(set(fnames)) < len(fnames):
+            raise XNATError("The XNAT upload archive file names are not"
+                            " unique: %s" % fnames)
+        verify = opts.get('verify')
+        if verify:
+            self._validate_verify_option(**opts)
+        # Whether to overwrite existing XNAT files.
+        overwrite = force
+        # The (archive name, location) entries.
+        entries = []
+        for fname, location in zip(fnames, in_files):
+            if not os.path.exists(location):
+                raise XNATError("Input file does not exist: %s" % location)
+            if fname in catalog:
+                if verify:
+                    if self._matches_catalog_entry(location, catalog[fname],
+                                                   verify):
+                        continue
+                    overwrite = True
+                elif skip:
+                    continue
+                elif not force:
+                    raise XNATError("The XNAT file object %s already exists"
+                                    " in the %s resource" % (fname, resource))
+            entries.append((fname, location))
+        if not entries:
+            self._logger.debug("All of the files to upload already exist in"
+                               " %s." % resource)
+            return fnames
+
+        self._logger.debug("Uploading %d files to %s as an archive..." %
+                           (len(entries), resource))
+        uri = resource._uri + '/files/' + self.UPLOAD_ARCHIVE_NAME
+        params = dict(extract='true', inbody='true',
+                      overwrite='true' if overwrite else 'false')
+        response = self.interface.put(uri, params=params,
+                                      data=archive.generate(entries))
+        self._invalidate(resource)
+        if not response.ok:
+            raise XNATError("The XNAT %s archive upload failed with HTTP"
+                            " status %d: %s" %
+                            (resource, response.status_code,
+                             response.content))
+        self._remember(*[resource.file(fname) for fname, _ in entries])
+        self._logger.debug("%d files uploaded to %s." %
+                           (len(entries), resource))
+
+        return fnames
+
+    def upload_directory(self, resource, directory, **opts):
+        """
+        Uploads the files in the given directory tree into the given
+        resource. The XNAT file name is the file path relative to the
+        directory, e.g. ``dce/volume001.nii.gz``. The files are
+        uploaded by :meth:`upload`, and are therefore uploaded on a
+        worker pool if the *workers* option is set.
+
+        Example::
+
+            with qixnat.connect() as xnat:
+                rsc = xnat.find_or_create(
+                    'QIN', 'Sarcoma003', 'Session01', scan=4,
+                    resource='NIFTI', modality='MR'
+                )
+                xnat.upload_directory(rsc, '/path/to/images', workers=8)
+
+        :param resource: the existing XNAT resource object
+        :param directory: the input directory
+        :param opts: the :meth:`upload` options other than *name* and
+            *names*
+        :return: the XNAT file names, in sorted directory walk order
+        :raise XNATError: if the directory does not exist
+        :raise XNATError: if the directory tree does not contain a file
+        """
+        if not os.path.isdir(directory):
+            raise XNATError("Input directory does not exist: %s" % directory)
+        names = self._directory_files(directory)
+        if not names:
+            raise XNATError("The input directory does not contain a file: %s" %
+                            directory)
+        in_files = [os.path.join(directory, name) for name in names]
+
+        return self.upload(resource, *in_files, names=names, **opts)
+
+    def sync(self, local_dir, path, direction='up', **opts):
+        """
+        Synchronizes a local directory with a XNAT resource in the
+        manner of ``rsync``. The local file paths relative to the
+        directory are compared to the resource file catalog names. A
+        source file is transferred if and only if the target file is
+        missing or differs from the source file by the *verify* check,
+        as described in :meth:`upload`. Target files which are not in
+        the source are extraneous, and are deleted if the *delete*
+        option is set.
+
+        Example::
+
+            with qixnat.connect() as xnat:
+                xnat.sync('/path/to/images',
+                          '/QIN/Sarcoma003/Session01/scan/4/resource/NIFTI',
+                          modality='MR', workers=8)
+
+        :param local_dir: the local directory
+        :param path: the XNAT resource path
+        :param direction: the :const:`SYNC_DIRECTIONS` transfer direction
+            (default ``up``)
+        :param opts: the following keyword options:
+        :keyword verify: the :const:`VERIFY_MODES` file comparison
+            (default ``md5``)
+        :keyword delete: flag indicating whether to delete the
+            extraneous target files (default False)
+        :keyword dry_run: flag indicating whether to only determine the
+            files to transfer and delete (default False)
+        :keyword workers: the maximum number of concurrent file
+            comparisons and transfers (default 1)
+        :keyword modality: the modality of an uploaded experiment or
+            scan which does not yet exist
+        :return: the (transferred, deleted) XNAT file name lists
+        :raise XNATError: if the direction is not in
+            :const:`SYNC_DIRECTIONS`
+        :raise XNATError: if the path is not a resource path
+        :raise XNATError: if the local upload directory or the XNAT
+            download resource does not exist
+        :raise XNATBatchError: if one or more file transfers failed
+        """
+        if direction not in self.SYNC_DIRECTIONS:
+            raise XNATError("The XNAT sync direction %s is not one of %s" %
+                            (direction, self.SYNC_DIRECTIONS))
+        verify = opts.get('verify') or 'md5'
+        self._validate_verify_option(verify=verify)
+        workers = opts.get('workers') or 1
+        dry_run = opts.get('dry_run', False)
+        hierarchy = path_hierarchy(path)
+        if not hierarchy[-1][0].endswith('resource'):
+            raise XNATError("The XNAT sync path is not a resource: %s" % path)
+        find_opts = dict(hierarchy)
+
+        # The resource and the local files.
+        if direction == 'up':
+            if not os.path.isdir(local_dir):
+                raise XNATError("The local sync directory does not exist: %s" %
+                                local_dir)
+            local_names = self._directory_files(local_dir)
+            if dry_run:
+                resource = self.find_one(**find_opts)
+            else:
+                if opts.get('modality'):
+                    find_opts['modality'] = opts['modality']
+                resource = self.find_or_create(**find_opts)
+        else:
+            resource = self.find_one(**find_opts)
+            if not resource:
+                raise XNATError("The XNAT sync resource does not exist: %s" %
+                                path)
+            if os.path.isdir(local_dir):
+                local_names = self._directory_files(local_dir)
+            else:
+                local_names = []
+        catalog = self._file_catalog(resource) if resource else {}
+
+        # Compare the files which are in both the directory and the
+        # resource.
+        common = [name for name in local_names if name in catalog]
+        matches = lambda name: self._matches_catalog_entry(
+            os.path.join(local_dir, name), catalog[name], verify
+        )
+        unchanged = set(name for name, same in
+                        zip(common, self._map(matches, common, workers))
+                        if same)
+        if direction == 'up':
+            sources, targets = local_names, catalog.keys()
+        else:
+            sources, targets = sorted(catalog.keys()), local_names
+        transfers = [name for name in sources if name not in unchanged]
+        source_names = set(sources)
+        extraneous = [name for name in targets if name not in source_names]
+        deletes = sorted(extraneous) if opts.get('delete') else []
+        self._logger.debug("The %s %s sync transfers %d files and deletes"
+                           " %d files." % (local_dir, path, len(transfers),
+                                           len(deletes)))
+        if dry_run:
+            return transfers, deletes
+
+        # Transfer the missing or changed files.
+        if direction == 'up':
+            if transfers:
+                in_files = [os.path.join(local_dir, name) for name in transfers]
+                self.upload(resource, *in_files, names=transfers,
+                            verify=verify, workers=workers)
+            if deletes:
+                self._delete_files(resource, deletes, workers)
+        else:
+            download = lambda name: self.download_file(
+                resource.file(name), local_dir, verify=verify, catalog=catalog
+            )
+            self._map_batch(download, transfers, workers)
+            for name in deletes:
+                self._remove_local_file(local_dir, name)
+
+        return transfers, deletes
+
+    def _directory_files(self, directory):
+        """
+        :param directory: the local directory
+        :return: the paths of the files in the directory tree relative
+            to the directory, in sorted directory walk order
+        """
+        names = []
+        for parent, subdirs, fnames in os.walk(directory):
+            # Walk the subdirectories in sorted order.
+            subdirs.sort()
+            rel_dir = os.path.relpath(parent, directory)
+            for fname in sorted(fnames):
+                if rel_dir != os.curdir:
+                    fname = os.path.join(rel_dir, fname)
+                names.append(fname)
+
+        return names
+
+    def _delete_files(self, resource, names, workers=1):
+        """
+        Deletes the given files from the given resource.
+
+        :param resource: the XNAT resource object
+        :param names: the XNAT file names
+        :param workers: the maximum number of concurrent deletes
+        :raise XNATError: if XNAT ignores the file delete
+        :raise XNATBatchError: if one or more deletes failed
+        """
+        file_objs = [resource.file(name) for name in names]
+        self._map_batch(lambda file_obj: file_obj.delete(), file_objs,
+                        workers)
+        self._invalidate(*file_objs)
+        self._forget(*file_objs)
+        # XNAT 1.6 pyxnat ignores file delete.
+        remaining = [name for name in names
+                     if name in self._file_catalog(resource)]
+        if remaining:
+            raise XNATError("XNAT ignored the %s file delete: %s" %
+                            (resource, remaining))
+        self._logger.debug("Deleted %d files from %s." %
+                           (len(names), resource))
+
+    def _remove_local_file(self, directory, name):
+        """
+        Removes the given local file, as well as the subdirectories
+        which it leaves empty.
+
+        :param directory: the local directory
+        :param name: the file path relative to the directory
+        """
+        os.remove(os.path.join(directory, name))
+        parent = os.path.dirname(name)
+        while parent and not os.listdir(os.path.join(directory, parent)):
+            os.rmdir(os.path.join(directory, parent))
+            parent = os.path.dirname(parent)
+        self._logger.debug("Removed the extraneous file %s from %s." %
+                           (name, directory))
+
     def object(self, project, subject=None, experiment=None, **opts):
         """
         Return the XNAT object with the given search specification.
@@ -494,14 +1594,27 @@ class XNAT(object):
         ...     subjects = xnat.find('QIN', 'Sarcoma*')
         ...     scan = xnat.find('QIN', 'Sarcoma003', '*', scan=1)
 
+        If the *index* option is set, then the objects are found in the
+        local :attr:`index` rather than in XNAT. The index search does
+        not make an XNAT request. The result is as current as the last
+        :meth:`qixnat.index.Index.sync` of the project.
+
         :param args: the :meth:`object` positional search keys
         :param opts: the :meth:`object` keyword hierarchy options
-            search key
+            search key, as well as the following option
+        :keyword index: flag indicating whether to search the local
+            :attr:`index` (default False)
         :return: the XNAT objects
         """
+        use_index = opts.pop('index', False)
         hierarchy = self._hierarchify(*args, **opts)
         # Qualify the search keys, if necessary.
         rest_hierarchy = self._rest_hierarchy(hierarchy)
+        if use_index:
+            matches = self.index.find(rest_hierarchy)
+            self._logger.debug("Found %d indexed objects for the hierarchy"
+                               " %s." % (len(matches), rest_hierarchy))
+            return [self._hierarchy_xnat_object(match) for match in matches]
         # The length of a queryable prefix.
         qlen = next((i for i, spec in enumerate(rest_hierarchy)
                      if '*' in str(spec[1])),
@@ -522,6 +1635,52 @@ class XNAT(object):
 
         return result
 
+    def find_iter(self, *args, **opts):
+        """
+        Yields the XNAT objects which match the given :meth:`find`
+        search criteria as they are found.
+
+        Unlike :meth:`find`, which resolves the whole search one
+        hierarchy level at a time, this method resolves the branches
+        below the first wildcard level separately, e.g. one experiment
+        at a time for a scan search. The branches are resolved
+        concurrently, and the matches of a branch are yielded as soon
+        as it and the preceding branches are resolved. Thus, the
+        matches are yielded in the same order as the :meth:`find`
+        result.
+
+        Example:
+
+        >>> from qiutil import qixnat
+        >>> with qixnat.connect() as xnat:
+        ...     for scan in xnat.find_iter('QIN', '*', '*', scan='*'):
+        ...         print scan
+
+        :param args: the :meth:`find` positional search keys
+        :param opts: the :meth:`find` keyword hierarchy options
+        :yield: the matching XNAT objects
+        """
+        if opts.pop('index', False):
+            for obj in self.find(*args, index=True, **opts):
+                yield obj
+            return
+        hierarchy = self._hierarchify(*args, **opts)
+        rest_hierarchy = self._rest_hierarchy(hierarchy)
+        # The queryable starting object, as in find.
+        qlen = next((i for i, spec in enumerate(rest_hierarchy)
+                     if '*' in str(spec[1])),
+                    len(rest_hierarchy))
+        parent = self._hierarchy_xnat_object(rest_hierarchy[:qlen])
+        level, down = self._find_start(parent, rest_hierarchy[qlen:])
+        # Descend to the first level with more than one branch.
+        while len(level) == 1 and down:
+            (child_type, child_key), down = down[0], down[1:]
+            level = self._find_children(level[0], child_type, child_key)
+        expand = lambda obj: self._expand_hierarchy([obj], down)
+        for branch in self._imap(expand, level, self.FIND_WORKERS):
+            for obj in branch:
+                yield obj
+
     def find_one(self, *args, **opts):
         """
         Finds the XNAT object which match the given search criteria.
@@ -553,12 +1712,73 @@ class XNAT(object):
         obj = self._hierarchy_xnat_object(rest_hierarchy)
         # If the object exists, then return it.
         # Otherwise, the default return value is None.
-        if obj.exists():
+        if self._exists(obj):
             self._logger.debug("The XNAT object %s was found." % obj)
             return obj
         else:
             self._logger.debug("The XNAT object %s was not found." % obj)
 
+    def attributes(self, objs, fields):
+        """
+        Fetches the given attributes of the given existing XNAT objects.
+
+        The attributes are read from the listing rows of the objects'
+        parent collections, e.g. ``/data/experiments/E1/scans``, with
+        one column-selected listing request per collection rather
+        than one request per object attribute. The experiments are
+        read from the project experiments listing, e.g.
+        ``/data/projects/QIN/experiments``. The listings are fetched
+        concurrently and cached.
+
+        Example::
+
+            with qixnat.connect() as xnat:
+                scans = xnat.find('QIN', 'Breast*', 'Session01', scan='*')
+                attrs = xnat.attributes(scans, ['series_description'])
+
+        :param objs: the existing XNAT objects
+        :param fields: the listing column names, e.g. ``date`` or
+            ``file_count``
+        :return: the {field: value} dictionary for each object in the
+            *objs* order, where the value is None if the column is not
+            in the object's listing
+        """
+        objs = list(objs)
+        # Group the objects by listing.
+        groups = {}
+        for obj in objs:
+            uri, column, key = self._listing_key(obj)
+            groups.setdefault((uri, column), []).append((obj, key))
+
+        def fetch(group):
+            uri, column = group
+            # XNAT does not select file listing columns.
+            if uri.endswith('/files'):
+                query = ''
+            else:
+                columns = [column, 'ID'] + [f for f in fields
+                                            if f not in (column, 'ID')]
+                query = 'columns=' + ','.join(columns)
+            request = uri + '?' + query if query else uri
+            return self._cached((uri, query),
+                                lambda: self.interface._get_json(request))
+
+        # Fetch the listings concurrently.
+        rows = {}
+        listings = self._map(fetch, groups.keys(), self.FIND_WORKERS)
+        for group, listing in zip(groups.keys(), listings):
+            # The object key is either the label or the ID.
+            keyed = dict((row.get(name), row) for row in listing
+                         for name in ('ID', group[1]))
+            for obj, key in groups[group]:
+                rows[obj._uri] = keyed.get(key, {})
+        self._logger.debug("Fetched the %s attributes of %d XNAT objects"
+                           " from %d listings." %
+                           (fields, len(objs), len(groups)))
+
+        return [dict((field, rows[obj._uri].get(field)) for field in fields)
+                for obj in objs]
+
     def find_or_create(self, *args, **opts):
         """
         Extends :meth:`find_one` to create the object if it doesn't
@@ -632,8 +1852,17 @@ class XNAT(object):
         It is an error to use this method to create a *file* object. The
         :meth:`upload` method is used for this purpose instead.
 
-        :Note: Concurrent XNAT object find-or-create fails unpredictably,
-            possibly arising from one of the following causes:
+        :Note: If the :attr:`lock` is set, then a missing object is
+            created while holding the lease on its subject-level
+            ancestor. Concurrent jobs which share a lock directory
+            therefore serialize creation in the same subject, but
+            create objects in different subjects in parallel. An object which another job
+            created while this job waited for the lease is not created
+            again.
+
+        :Note: Concurrent XNAT object find-or-create without a
+            :attr:`lock` fails unpredictably, possibly arising from one
+            of the following causes:
             * the pyxnat config in $HOME/.xnat/xnat.cfg specifies a temp
               directory that *is not* shared by all concurrent jobs,
               resulting in inconsistent cache content
@@ -676,32 +1905,96 @@ class XNAT(object):
 
         .. _XNAT schema: https://central.xnat.org/schemas/xnat/xnat.xsd
         """
-        modality = opts.pop('modality', None)
-        # The  [(type name, value), ...] hierarchy list.
-        hierarchy = self._hierarchify(*args, **opts)
-        # The [(type name, search key), ...] hierarchy list.
-        search_hierarchy = [(type_name, self._extract_search_key(value))
-                            for type_name, value in hierarchy]
-        # Qualify the search keys, if necessary.
-        rest_hierarchy = self._rest_hierarchy(search_hierarchy)
+        rest_hierarchy, path, create_opts = self._create_target(*args,
+                                                               **opts)
         # The target XNAT object.
         obj = self._hierarchy_xnat_object(rest_hierarchy)
         # If the object exists, then return it.
         # Otherwise, create the object and its non-existing ancestors.
-        if obj.exists():
+        if self._exists(obj):
             return obj
-        # The create {type name: {attribute: value}} keyword options.
-        create_opts = {type_name: value[1]
-                       for type_name, value in hierarchy
-                       if isinstance(value, tuple)}
-        if modality:
-            create_opts['modality'] = modality
-        # The type name hierarchy.
-        path = [type_name for type_name, _ in hierarchy]
-        self._create(obj, path, **create_opts)
+        if self.lock:
+            self._leased_create(obj, path, **create_opts)
+        else:
+            self._create(obj, path, **create_opts)
 
         return obj
 
+    def find_or_create_many(self, specs, workers=1):
+        """
+        Finds or creates the XNAT object specified by each of the given
+        :meth:`find_or_create` option dictionaries.
+
+        Unlike repeated :meth:`find_or_create` calls, the object
+        lineages are checked together from the top down. The children
+        of each distinct existing parent are listed once, and the
+        descendants of a missing object are known to be missing without
+        a check. The missing objects are then created once apiece, one
+        hierarchy level at a time, so that an object shared by several
+        specifications is created before its children.
+
+        Example::
+
+            import qixnat
+            with qixnat.connect() as xnat:
+                specs = [dict(project='QIN', subject='Breast003',
+                              experiment='Session01', scan=number,
+                              resource='NIFTI', modality='MR')
+                         for number in range(1, 41)]
+                resources = xnat.find_or_create_many(specs, workers=4)
+
+        :param specs: the :meth:`find_or_create` {option: value}
+            dictionaries, including the *project*, *subject* and
+            *experiment* options which would otherwise be positional
+        :param workers: the maximum number of concurrent listings or
+            creates within a hierarchy level
+        :return: the XNAT objects, in specification order
+        """
+        # The (REST hierarchy, type name path, create options) targets.
+        targets = [self._create_target(**dict(spec)) for spec in specs]
+        # The {REST URI: (object, parent, type name path, create
+        # options)} lineage objects by hierarchy level. The options are
+        # those of the first specification which includes the object.
+        levels = []
+        for rest_hierarchy, path, create_opts in targets:
+            parent = None
+            for i in range(len(rest_hierarchy)):
+                if len(levels) == i:
+                    levels.append({})
+                obj = self._hierarchy_xnat_object(rest_hierarchy[:i + 1])
+                if obj._uri not in levels[i]:
+                    levels[i][obj._uri] = (obj, parent, path[:i + 1],
+                                           create_opts)
+                parent = obj
+        # The {REST URI: existence} dictionary.
+        existing = {}
+        for level in levels:
+            self._resolve_existence(level, existing, workers)
+        self._logger.debug("Creating %d of %d XNAT objects..." %
+                           (existing.values().count(False), len(existing)))
+
+        def create(item):
+            obj, parent, path, create_opts = item
+            # Prime the cache with the known lineage state. The parent
+            # is known to exist whether or not the cache is enabled.
+            self.cache.put((obj._uri, 'exists'), False)
+            if parent:
+                self._remember(parent)
+            if self.lock:
+                self._leased_create(obj, path, **create_opts)
+            else:
+                self._create(obj, path, **create_opts)
+
+        for level in levels:
+            missing = [item for uri, item in level.iteritems()
+                       if not existing[uri]]
+            self._map(create, missing, workers)
+            for uri in level:
+                existing[uri] = True
+
+        return [self._hierarchy_xnat_object(rest_hierarchy)
+                for rest_hierarchy, _, _ in targets]
+
     def delete(self, *args, **opts):
         """
         Deletes the XNAT objects which match the given search criteria.
@@ -725,20 +2018,128 @@ class XNAT(object):
 
         :param args: the :meth:`find` positional search key
         :param opts: the :meth:`find` keyword hierarchy options
-            search key
+            search key, as well as the following option:
+        :keyword workers: the maximum number of concurrent deletes
+            (default 1)
         :raise XNATError: if a project or file object is specified
+        :raise XNATBatchError: if one or more deletes failed
         """
+        workers = opts.pop('workers', 1)
         matching = self.find(*args, **opts)
+        self.delete_objects(matching, workers=workers)
+
+    def delete_objects(self, objs, workers=1):
+        """
+        Deletes the given XNAT objects. Since XNAT delete is recursive,
+        an object whose ancestor is also in the list is not deleted
+        separately.
+
+        :param objs: the XNAT objects to delete
+        :param workers: the maximum number of concurrent deletes
+            (default 1)
+        :return: the deleted objects, pruned as described in
+            :meth:`qixnat.helpers.prune_descendants`
+        :raise XNATError: if a project or file object is specified
+        :raise XNATBatchError: if one or more deletes failed
+        """
         is_project_object = lambda obj: isinstance(obj, Project)
-        if any(is_project_object(obj) for obj in matching):
+        if any(is_project_object(obj) for obj in objs):
             raise XNATError("XNAT does not support project object deletion")
         is_file_object = lambda obj: isinstance(obj, File)
-        if any(is_file_object(obj) for obj in matching):
+        if any(is_file_object(obj) for obj in objs):
             raise XNATError("XNAT does not support file object deletion")
-        for obj in matching:
+        targets = prune_descendants(objs)
+
+        def delete(obj):
             obj.delete()
+            self._invalidate(obj)
+            self._forget(obj)
             self._logger.debug("Deleted XNAT object %s." % obj)
 
+        self._map_batch(delete, targets, workers)
+
+        return targets
+
+    def _map(self, func, items, workers=1):
+        """
+        Applies the given function to each item on a bounded thread
+        pool. The first function exception is raised to the caller.
+
+        :param func: the function to apply
+        :param items: the function arguments
+        :param workers: the maximum number of concurrent applications
+        :return: the function results, in item order
+        """
+        items = list(items)
+        workers = min(workers, len(items))
+        if workers < 2:
+            return [func(item) for item in items]
+        pool = ThreadPool(workers)
+        try:
+            return pool.map(func, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _imap(self, func, items, workers=1):
+        """
+        Applies the given function to each item on a bounded thread
+        pool as described in :meth:`_map`. Unlike :meth:`_map`, the
+        results are yielded in item order as they become available.
+        If the caller stops iterating, then the pending applications
+        are abandoned.
+
+        :param func: the function to apply
+        :param items: the function arguments
+        :param workers: the maximum number of concurrent applications
+        :yield: the function results, in item order
+        """
+        items = list(items)
+        workers = min(workers, len(items))
+        if workers < 2:
+            for item in items:
+                yield func(item)
+            return
+        pool = ThreadPool(workers)
+        try:
+            for result in pool.imap(func, items):
+                yield result
+        finally:
+            pool.terminate()
+
+    def _map_batch(self, func, items, workers=1):
+        """
+        Applies the given function to each item as described in
+        :meth:`_map`. Unlike :meth:`_map`, an application failure
+        does not abort the other applications. Rather, the failures
+        are collected and raised together when all applications
+        complete.
+
+        :param func: the function to apply
+        :param items: the function arguments
+        :param workers: the maximum number of concurrent applications
+        :return: the function results, in item order
+        :raise XNATBatchError: if one or more applications failed
+        """
+        items = list(items)
+
+        def apply(item):
+            try:
+                return func(item), None
+            except Exception as e:
+                self._logger.error("XNAT operation on %s failed: %s" %
+                                   (item, e))
+                return None, e
+
+        outcomes = self._map(apply, items, workers)
+        failures = [(item, error)
+                    for item, (_, error) in zip(items, outcomes)
+                    if error]
+        if failures:
+            raise XNATBatchError(failures)
+
+        return [result for result, _ in outcomes]
+
     def _positional_hierarchy_arguments(self, project, subject, experiment):
         args = [project]
         if subject:
@@ -805,14 +2206,135 @@ class XNAT(object):
             self._logger.error("XNAT object create database error - object: %s"
                                " options: %s " % (obj, create_opts))
             raise e
+        finally:
+            self._invalidate(*nonexisting)
+        self._remember(obj)
         self._logger.debug("Created the XNAT objects %s." % nonexisting)
 
+    def _create_target(self, *args, **opts):
+        """
+        :param args: the :meth:`find_or_create` positional arguments
+        :param opts: the :meth:`find_or_create` options
+        :return: the target object (REST hierarchy, type name path,
+            create options) tuple, where the create options are the
+            :meth:`_create` options
+        """
+        modality = opts.pop('modality', None)
+        # The  [(type name, value), ...] hierarchy list.
+        hierarchy = self._hierarchify(*args, **opts)
+        # The [(type name, search key), ...] hierarchy list.
+        search_hierarchy = [(type_name, self._extract_search_key(value))
+                            for type_name, value in hierarchy]
+        # Qualify the search keys, if necessary.
+        rest_hierarchy = self._rest_hierarchy(search_hierarchy)
+        # The create {type name: {attribute: value}} keyword options.
+        create_opts = {type_name: value[1]
+                       for type_name, value in hierarchy
+                       if isinstance(value, tuple)}
+        if modality:
+            create_opts['modality'] = modality
+        # The type name hierarchy.
+        path = [type_name for type_name, _ in hierarchy]
+
+        return rest_hierarchy, path, create_opts
+
+    def _resolve_existence(self, level, existing, workers=1):
+        """
+        Determines whether the given hierarchy level objects exist.
+        An object whose parent is missing is missing as well. The
+        other objects are checked against one child listing per
+        distinct parent.
+
+        :param level: the {REST URI: (object, parent, type name path,
+            create options)} objects
+        :param existing: the {REST URI: existence} dictionary of the
+            ancestor levels, which is updated with the level objects
+        :param workers: the maximum number of concurrent listings
+        """
+        # The {(parent URI, child type): (parent, [object, ...])}
+        # objects to check.
+        checks = {}
+        for uri, (obj, parent, path, _) in level.iteritems():
+            if parent is None:
+                existing[uri] = self._exists(obj)
+            elif not existing[parent._uri]:
+                existing[uri] = False
+            else:
+                check = checks.setdefault((parent._uri, path[-1]),
+                                          (parent, []))
+                check[1].append(obj)
+
+        def child_keys(key):
+            parent_uri, child_type = key
+            parent = checks[key][0]
+            attr = pluralize_type_designator(child_type)
+            uri = parent_uri + '/' + attr.replace('_', '/')
+            return self._cached((uri, 'keys'),
+                                lambda: self._child_keys(parent, child_type))
+
+        keys = checks.keys()
+        listings = self._map(child_keys, keys, workers)
+        for key, children in zip(keys, listings):
+            for obj in checks[key][1]:
+                existing[obj._uri] = obj._urn in children
+
+    def _leased_create(self, obj, path, **opts):
+        """
+        Creates the given object as described in :meth:`_create` while
+        holding the :attr:`lock` lease on the object lineage root, i.e.
+        the subject-level ancestor of the object. The lease key does
+        not depend on which ancestors currently exist, so concurrent
+        jobs which create objects in the same lineage always contend
+        for the same lease. The lineage is checked again after the
+        lease is acquired, since another job might have created some or
+        all of it in the meantime.
+
+        :param obj: the object to create
+        :param path: the type name path to the object
+        :param opts: the :meth:`_create` options
+        """
+        key = self._lineage_root(obj)._uri
+        with self.lock.lease(key):
+            # Bypass the cache, which can be stale.
+            self._forget_lineage(obj)
+            if not self._nonexisting_lineage(obj):
+                self._logger.debug("The XNAT object %s was created by"
+                                   " another client." % obj)
+                return
+            self._create(obj, path, **opts)
+
+    def _lineage_root(self, obj):
+        """
+        :param obj: the XNAT object
+        :return: the object ancestor directly below the project, or the
+            object itself if it is a project or a subject
+        """
+        parent = obj.parent()
+        while parent and parent.parent():
+            obj = parent
+            parent = obj.parent()
+
+        return obj
+
+    def _forget_lineage(self, obj):
+        """
+        Removes the :attr:`cache` existence entries of the given
+        object and its ancestors.
+
+        :param obj: the XNAT object
+        """
+        uris = set()
+        while obj:
+            uris.add(obj._uri)
+            obj = obj.parent()
+        self.cache.discard(lambda key: key[1] == 'exists' and key[0] in uris)
+
     def _nonexisting_lineage(self, obj):
         """
         :param obj: the target object to check
         :return: the list of nonexisting objects leading to the target
         """
-        if obj.exists():
+        if self._exists(obj):
             return []
         parent = obj.parent()
         if not parent:
@@ -895,6 +2417,7 @@ class XNAT(object):
         # attrs.mset is the odd pyxnat idiom for setting and saving
         # attribute modifications.
         obj.attrs.mset(mods)
+        self._invalidate(obj)
 
     def _hierarchify(self, *args, **opts):
         """
@@ -989,34 +2512,291 @@ class XNAT(object):
 
     def _find_descendant_hierarchy(self, parent, hierarchy):
         """
+        Expands the descendant hierarchy one level at a time. The
+        children of every object in a level are fetched concurrently
+        on a pool of at most :const:`FIND_WORKERS` threads before
+        descending to the next level.
+
+        The leading project subject and experiment levels are resolved
+        in one flat listing request, if possible, as described in
+        :meth:`_find_project_experiments`.
+
         :param parent: the starting object
         :param hierarchy: the descendant [(type name, key)] list
         :return: the XNAT objects specified by the hierarchy
         """
-        # The easy cases.
-        if not parent.exists():
-            return []
-        if not hierarchy:
-            return [parent]
-        # Recurse on the children.
-        child_type, child_key = hierarchy[0]
-        child_hierarchy = hierarchy[1:]
-        # Recurse on the matching children.
+        level, hierarchy = self._find_start(parent, hierarchy)
+
+        return self._expand_hierarchy(level, hierarchy)
+
+    def _expand_hierarchy(self, level, hierarchy):
+        """
+        :param level: the starting objects
+        :param hierarchy: the descendant [(type name, key)] list
+        :return: the XNAT objects specified by the hierarchy, expanded
+            as described in :meth:`_find_descendant_hierarchy`
+        """
+        for child_type, child_key in hierarchy:
+            if not level:
+                break
+            expand = lambda obj: self._find_children(obj, child_type,
+                                                     child_key)
+            level = concat(*self._map(expand, level, self.FIND_WORKERS))
+
+        return level
+
+    def _find_start(self, parent, hierarchy):
+        """
+        :param parent: the starting object
+        :param hierarchy: the descendant [(type name, key)] list
+        :return: the (objects, remaining hierarchy) from which to
+            expand the search, which resolves the leading project
+            levels as described in :meth:`_find_project_experiments`
+        """
+        # The easy case.
+        if not self._exists(parent):
+            return [], []
+        level = self._find_project_experiments(parent, hierarchy)
+        if level is None:
+            return [parent], hierarchy
+
+        return level, hierarchy[2:]
+
+    def _find_project_experiments(self, project, hierarchy):
+        """
+        Resolves a project (subject, experiment) search hierarchy prefix
+        with a single ``experiments`` listing request of the form::
+
+            /data/projects/QIN/experiments?label=...&subject_label=...
+
+        The subject and experiment key filters are applied by the XNAT
+        server.
+
+        :param project: the existing starting object
+        :param hierarchy: the descendant [(type name, key)] list
+        :return: the matching experiment objects, or None if the
+            starting object is not a project, the hierarchy does not
+            begin with the subject and experiment levels or a key
+            can't be pushed down to the server
+        """
+        if project.__class__.__name__.lower() != 'project':
+            return None
+        if [spec[0] for spec in hierarchy[:2]] != ['subject', 'experiment']:
+            return None
+        (_, sbj_key), (_, exp_key) = hierarchy[:2]
+        if not (self._can_push_down(sbj_key) and
+                self._can_push_down(exp_key)):
+            return None
+        filters = dict(subject_label=sbj_key, label=exp_key)
+        rows = self._list(project, 'experiments',
+                          ['ID', 'label', 'subject_label'], filters)
+        self._logger.debug("The %s experiments listing matched %d"
+                           " experiments." % (project, len(rows)))
+
+        return [project.subject(row['subject_label']).experiment(row['label'])
+                for row in rows]
+
+    def _find_children(self, parent, child_type, child_key):
+        """
+        Returns the existing children which match the given key.
+
+        A wildcard key is matched against the parent's child listing.
+        If the child type has a :const:`qixnat.constants.SEARCH_KEY_COLUMNS`
+        column, then the listing is filtered by the XNAT server.
+        Otherwise, the listing is keyed by the
+        :meth:`qixnat.helpers.xnat_key` column. In either case, the
+        listed children are neither fetched again for their key nor
+        checked for existence. Only a child built from a literal key
+        is checked for existence.
+
+        :param parent: the existing parent object
+        :param child_type: the child type name
+        :param child_key: the child search key, which can contain
+            wildcards
+        :return: the existing matching child objects
+        """
         if '*' in child_key:
             attr = pluralize_type_designator(child_type)
-            children = getattr(parent, attr)()
-            # The regex pattern to compare against the fetched
-            # child key value.
-            pat = child_key.replace('*', '.*')
-            descendants = (
-                self._find_descendant_hierarchy(child, child_hierarchy)
-                for child in children
-                if re.match(pat, xnat_key(child))
-            )
-            return concat(*descendants)
+            column = SEARCH_KEY_COLUMNS.get(child_type)
+            if column and self._can_push_down(child_key):
+                rows = self._list(parent, attr, [column],
+                                  {column: child_key})
+                factory = getattr(parent, child_type)
+                return [factory(row[column]) for row in rows]
+            uri = parent._uri + '/' + attr.replace('_', '/')
+            keys = self._cached((uri, 'keys'),
+                                lambda: self._child_keys(parent, child_type))
+            factory = getattr(parent, child_type)
+            return [factory(key) for key in keys
+                    if key_matches(child_key, key)]
         else:
             child = getattr(parent, child_type)(child_key)
-            return self._find_descendant_hierarchy(child, hierarchy[1:])
+            return [child] if self._exists(child) else []
+
+    def _exists(self, obj):
+        """
+        :param obj: the XNAT object
+        :return: whether the object exists, fetched from the
+            :attr:`cache` if possible
+        """
+        if obj._uri in self._known:
+            return True
+        exists = self._cached((obj._uri, 'exists'), obj.exists)
+        if exists:
+            self._remember(obj)
+
+        return exists
+
+    def _remember(self, *objs):
+        """
+        Records that the given objects and their ancestors exist.
+
+        :param objs: the existing XNAT objects
+        """
+        uris = set()
+        for obj in objs:
+            while obj and obj._uri not in self._known:
+                uris.add(obj._uri)
+                obj = obj.parent()
+        with self._known_lock:
+            self._known.update(uris)
+
+    def _forget(self, *objs):
+        """
+        Removes the given objects and their descendants from the known
+        existing objects.
+
+        :param objs: the deleted XNAT objects
+        """
+        prefixes = tuple(obj._uri + '/' for obj in objs)
+        with self._known_lock:
+            for obj in objs:
+                self._known.discard(obj._uri)
+            gone = [uri for uri in self._known if uri.startswith(prefixes)]
+            self._known.difference_update(gone)
+
+    def _cached(self, key, fetch):
+        """
+        :param key: the (REST URI, qualifier) :attr:`cache` key
+        :param fetch: the function which fetches the value from XNAT
+        :return: the cached or fetched value
+        """
+        value = self.cache.get(key)
+        if value is None:
+            value = fetch()
+            self.cache.put(key, value)
+
+        return value
+
+    def _invalidate(self, *objs):
+        """
+        Removes the :attr:`cache` entries which can be affected by a
+        change to the given XNAT objects. The affected entries are
+        those of the objects' subtrees as well as the listings which
+        can include the objects.
+
+        :param objs: the created, changed or deleted XNAT objects
+        """
+        uris = [obj._uri for obj in objs]
+        is_affected = lambda key: any(self._is_affected(uri, key[0])
+                                      for uri in uris)
+        count = self.cache.discard(is_affected)
+        if count:
+            self._logger.debug("Invalidated %d cache entries for the XNAT"
+                               " objects %s." % (count, list(objs)))
+
+    def _is_affected(self, uri, cached_uri):
+        """
+        :param uri: the changed XNAT object REST URI
+        :param cached_uri: the cache entry REST URI
+        :return: whether the cache entry can be affected by the change
+        """
+        # An entry in the object subtree.
+        if cached_uri == uri or cached_uri.startswith(uri + '/'):
+            return True
+        # A listing of the object collection, either by the object
+        # parent or by an ancestor which lists all of its descendants
+        # in that collection, e.g. /data/projects/QIN/experiments.
+        collection = uri.rsplit('/', 2)[-2]
+        owner, _, cached_collection = cached_uri.rpartition('/')
+
+        return cached_collection == collection and uri.startswith(owner + '/')
+
+    def _child_keys(self, parent, child_type):
+        """
+        :param parent: the parent XNAT object
+        :param child_type: the child type name
+        :return: the :meth:`qixnat.helpers.xnat_key` values of the
+            parent's children of the given type
+        """
+        attr = pluralize_type_designator(child_type)
+        children = getattr(parent, attr)()
+        # Key the listing by the search key column.
+        if child_type not in UNLABELED_TYPES:
+            children._id_header = 'label'
+
+        return [child._urn for child in children]
+
+    def _list(self, parent, collection, columns, filters):
+        """
+        Lists the parent collection rows which match the given
+        wildcard filters.
+
+        The filters are pushed down to the XNAT server. The server
+        filters are widened to a prefix match, if necessary, and the
+        rows are then matched again in the same manner as a client-side
+        :meth:`find` key match. Thus, the result is the same whether or
+        not the XNAT server applies the filter.
+
+        :param parent: the parent XNAT object
+        :param collection: the child collection name, e.g. ``subjects``
+        :param columns: the listing columns
+        :param filters: the {column: key} wildcard filters
+        :return: the matching listing {column: value} rows
+        """
+        params = [('columns', ','.join(columns))]
+        for column, key in filters.iteritems():
+            # The client wildcard match is a prefix match.
+            if '*' in key and not key.endswith('*'):
+                key += '*'
+            params.append((column, key))
+        query = '&'.join("%s=%s" % (name, urllib.quote(value, safe='*,'))
+                         for name, value in params)
+        uri = "%s/%s" % (parent._uri, collection.replace('_', '/'))
+        rows = self._cached((uri, query),
+                            lambda: self.interface._get_json(uri + '?' + query))
+
+        return [row for row in rows
+                if all(key_matches(key, row.get(column) or '')
+                       for column, key in filters.iteritems())]
+
+    def _listing_key(self, obj):
+        """
+        :param obj: the XNAT object
+        :return: the (listing REST URI, key column, key) tuple which
+            locates the object row in a listing
+        """
+        type_name = obj.__class__.__name__.lower()
+        if type_name == 'file':
+            owner, _, path = obj._uri.partition('/files/')
+            return owner + '/files', 'path', urllib.unquote(path)
+        owner, collection, key = obj._uri.rsplit('/', 2)
+        # The project experiments listing includes all of the project
+        # subject experiments.
+        if type_name == 'experiment':
+            owner = owner.rsplit('/', 2)[0]
+        uri = "%s/%s" % (owner, collection)
+        column = SEARCH_KEY_COLUMNS.get(type_name, 'ID')
+
+        return uri, column, urllib.unquote(key)
+
+    def _can_push_down(self, key):
+        """
+        :param key: the search key
+        :return: whether the XNAT server can filter on the key
+        """
+        # XNAT interprets a comma as a filter value separator.
+        return ',' not in key
 
     def _rest_hierarchy(self, hierarchy):
         """
@@ -1078,7 +2858,8 @@ class XNAT(object):
 
     def _upload_file(self, resource, in_file, **opts):
         """
-        Uploads the given file to XNAT.
+        Uploads the given file to XNAT. The caller is responsible for
+        invalidating the resource :attr:`cache` entries.
 
         :param resource: the existing XNAT resource object that will
             contain the file
@@ -1090,12 +2871,16 @@ class XNAT(object):
         :keyword skip_existing: forego the upload if the target XNAT
              file already exists (default False)
         :keyword force: replace an existing XNAT file (default False)
+        :keyword verify: the :const:`VERIFY_MODES` content check of an
+            existing XNAT file, as described in :meth:`upload`
+        :keyword catalog: the :meth:`_file_catalog` of the resource,
+            used instead of checking whether the XNAT file exists
         :return: the XNAT file name
         :raise XNATError: if the input file does not exist
         :raise XNATError: if both the *skip_existing* *force* options
             are set
         :raise XNATError: if the XNAT file already exists and neither
-             the *skip_existing* nor the *force* option is set
+             the *skip_existing*, *force* nor *verify* option is set
         """
         # The input file must exist.
         if not os.path.exists(in_file):
@@ -1114,8 +2899,27 @@ class XNAT(object):
         # Check for an existing file.
         skip = opts.pop('skip_existing', False)
         force = opts.pop('force', False)
-        if file_obj and file_obj.exists():
-            if skip:
+        verify = opts.pop('verify', None)
+        catalog = opts.pop('catalog', None)
+        if verify and catalog is None:
+            catalog = self._file_catalog(resource)
+        if catalog is None:
+            exists = file_obj and self._exists(file_obj)
+        else:
+            exists = fname in catalog
+        if exists:
+            if verify:
+                # Skip identical content. Otherwise, overwrite the
+                # changed XNAT file in place.
+                if self._matches_catalog_entry(in_file, catalog[fname],
+                                               verify):
+                    self._logger.debug("The XNAT file %s content is"
+                                       " unchanged." % fname)
+                    return fname
+                self._logger.debug("Replacing the changed XNAT file %s..." %
+                                   fname)
+                opts['overwrite'] = True
+            elif skip:
                 if force:
                     raise XNATError("The XNAT upload option --skip_existing is"
                                     " incompatible with the --force option")
@@ -1123,6 +2927,7 @@ class XNAT(object):
             elif force:
                 # Delete the existing file before upload.
                 file_obj.delete()
+                self._forget(file_obj)
                 # XNAT 1.6 pyxnat ignores file delete.
                 if file_obj.exists():
                     raise XNATError("XNAT upload force option is not supported,"
@@ -1139,6 +2944,7 @@ class XNAT(object):
                                              resource.label()))
         try:
             file_obj.put(in_file, **opts)
+            self._remember(file_obj)
         except pyxnat.core.errors.DatabaseError:
             # One of the obscure XNAT errors occurs if uploading an empty file.
             # Print a useful error message in this case.
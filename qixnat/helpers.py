@@ -4,6 +4,8 @@
 """
 import os
 import re
+import urllib
+import hashlib
 import itertools
 from datetime import datetime
 from pyxnat.core.resources import Scan
@@ -48,6 +50,80 @@ def xnat_path(obj):
         return '/' + subpath
 
 
+def hierarchy_path(hierarchy):
+    """
+    Returns the canonical :meth:`xnat_path` of the object specified by
+    the given REST hierarchy. Unlike :meth:`xnat_path`, this function
+    does not fetch the object keys from XNAT.
+
+    Example:
+
+    >>> from qixnat.helpers import hierarchy_path
+    >>> hierarchy_path([('project', 'QIN'), ('subject', 'Breast003'),
+    ...                 ('experiment', 'Breast003_Session02'),
+    ...                 ('scan', '1')])
+    '/QIN/Breast003/Session02/scan/1'
+
+    :param hierarchy: the [(type name, XNAT key), ...] list
+    :return: the XNAT path
+    """
+    items = []
+    # The parent key prefix is removed from the name.
+    prefix = None
+    for type_name, key in hierarchy:
+        key = str(key)
+        name = key
+        if prefix and name.startswith(prefix):
+            name = name[len(prefix):]
+        if type_name in EXPERIMENT_PATH_TYPES:
+            items.append(name)
+        else:
+            items.append("%s/%s" % (type_name, name))
+        prefix = key + '_'
+
+    return '/' + '/'.join(items)
+
+
+def uri_hierarchy(uri):
+    """
+    Parses the given XNAT REST URI into a hierarchy.
+
+    Example:
+
+    >>> from qixnat.helpers import uri_hierarchy
+    >>> uri_hierarchy('/data/projects/QIN/subjects/Breast003/experiments/'
+    ...               'Breast003_Session02/scans/1')
+    [('project', 'QIN'), ('subject', 'Breast003'),
+     ('experiment', 'Breast003_Session02'), ('scan', '1')]
+
+    :Note: The :meth:`hierarchy_path` of the result is the canonical
+        :meth:`xnat_path` if and only if the URI keys are the
+        :meth:`xnat_key` values, as is the case for a
+        :class:`qixnat.facade.XNAT` ``find`` result.
+
+    :param uri: the REST URI
+    :return: the [(type name, key), ...] list
+    """
+    # Skip the entry point, e.g. /data.
+    segments = uri.strip('/').split('/')[1:]
+    hierarchy = []
+    while segments:
+        # An assessor in or out resource has a two-segment collection.
+        if segments[0] in ('in', 'out'):
+            type_name = segments.pop(0) + '_resource'
+            segments.pop(0)
+        else:
+            type_name = segments.pop(0)[:-1]
+        # A file key is the file path relative to the resource, which
+        # can include a subdirectory.
+        if type_name == 'file' and segments:
+            segments = ['/'.join(segments)]
+        key = urllib.unquote(segments.pop(0)) if segments else None
+        hierarchy.append((type_name, key))
+
+    return hierarchy
+
+
 def xnat_name(obj):
     """
     Returns the canonical XNAT object name determined as the :meth:`xnat_key`
@@ -90,6 +166,33 @@ def xnat_key(obj):
     return obj.id() if type_name in UNLABELED_TYPES else obj.label()
 
 
+def key_matches(key, value):
+    """
+    Returns whether the given :meth:`xnat_key` value matches the
+    search key. A search key without a wildcard (``*``) matches only
+    the identical value. A search key with a wildcard matches a value
+    which begins with the wildcard expression.
+
+    Example:
+
+    >>> from qixnat.helpers import key_matches
+    >>> key_matches('Breast*', 'Breast003')
+    True
+    >>> key_matches('Breast', 'Breast003')
+    False
+
+    :param key: the search key
+    :param value: the XNAT key value
+    :return: whether the value matches the key
+    """
+    if '*' not in key:
+        return value == key
+    # The regex pattern to compare against the value.
+    pat = key.replace('*', '.*')
+
+    return re.match(pat, value) is not None
+
+
 def xnat_children(obj):
     """
     Returns the XNAT objects contained in the given parent object.
@@ -108,6 +211,28 @@ def xnat_children(obj):
     return list(flattened)
 
 
+def prune_descendants(objs):
+    """
+    Removes the objects which are duplicates or descendants of another
+    object in the given list, e.g. for a recursive delete.
+
+    :param objs: the XNAT objects
+    :return: the remaining XNAT objects, in list order
+    """
+    uris = set(obj._uri for obj in objs)
+    # An ancestor URI is a proper prefix ending before a slash.
+    has_ancestor = lambda uri: any(uri[:i] in uris
+                                   for i, c in enumerate(uri) if c == '/')
+    pruned = []
+    seen = set()
+    for obj in objs:
+        if obj._uri not in seen and not has_ancestor(obj._uri):
+            pruned.append(obj)
+            seen.add(obj._uri)
+
+    return pruned
+
+
 def pluralize_type_designator(designator):
     """
     :param designator: the XNAT type name or synonym
@@ -192,6 +317,24 @@ def rest_type(type_name, modality=None):
         return "xnat:%sData" % rest_name
 
 
+def xsi_modality(xsi_type):
+    """
+    Returns the modality of the given :meth:`rest_type` designation,
+    e.g.:
+
+    >>> from qixnat.helpers import xsi_modality
+    >>> xsi_modality('xnat:mrSessionData')
+    'MR'
+
+    :param xsi_type: the XNAT ``xsiType`` value
+    :return: the upper-case modality, or None if the type does not
+        have a modality
+    """
+    match = re.match('xnat:([a-z]+)(Session|Scan)Data$', xsi_type or '')
+    if match:
+        return match.group(1).upper()
+
+
 def rest_date(value):
     """
     :param value: the input ``datetime`` object or None
@@ -217,6 +360,22 @@ def parse_xnat_date(value):
     return datetime.strptime(value, DATE_FMT) if value else None
 
 
+def file_digest(location):
+    """
+    Returns the MD5 hex digest of the given file, as reported in the
+    XNAT resource file catalog ``digest`` column.
+
+    :param location: the file path
+    :return: the lower-case hex digest string
+    """
+    md5 = hashlib.md5()
+    with open(location, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(64 * 1024), ''):
+            md5.update(chunk)
+
+    return md5.hexdigest()
+
+
 def path_hierarchy(path):
     """
     Transforms the given XNAT path into a list of *(type, value)*
@@ -0,0 +1,360 @@
+"""
+.. module:: index
+    :synopsis: Local SQLite index of the XNAT object hierarchy.
+"""
+import os
+import time
+import urllib
+import sqlite3
+import threading
+from collections import OrderedDict
+from qiutil.logging import logger
+from .helpers import key_matches
+
+
+class XNATIndexError(Exception):
+    pass
+
+
+DEFAULT_LOCATION = os.path.join(os.path.expanduser('~'), '.xnat', 'index.db')
+"""The default index database file location."""
+
+CONTAINER_COLLECTIONS = [('scan', 'scans', 'ID'),
+                         ('assessor', 'assessors', 'label'),
+                         ('reconstruction', 'reconstructions', 'ID')]
+"""The experiment (type, REST collection, key column) containers."""
+
+RESOURCE_COLLECTIONS = {
+    'experiment': [('resource', 'resources')],
+    'scan': [('resource', 'resources')],
+    'assessor': [('resource', 'resources'), ('in_resource', 'in/resources'),
+                 ('out_resource', 'out/resources')],
+    'reconstruction': [('resource', 'resources'),
+                       ('in_resource', 'in/resources'),
+                       ('out_resource', 'out/resources')]
+}
+"""The {parent type: [(resource type, REST collection), ...]} resources."""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    id INTEGER PRIMARY KEY,
+    parent INTEGER REFERENCES objects (id) ON DELETE CASCADE,
+    type TEXT NOT NULL,
+    key TEXT NOT NULL,
+    modified TEXT,
+    size INTEGER,
+    digest TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS objects_child
+    ON objects (parent, type, key);
+"""
+"""
+The index database schema. Each XNAT object is a row whose *key* is the
+:meth:`qixnat.helpers.xnat_key` value. The experiment *modified* column
+holds the XNAT modification time stamp as of the last sync. The file
+*size* and *digest* columns hold the XNAT file catalog values.
+"""
+
+MAX_QUERY_PARAMETERS = 900
+"""The maximum number of SQL query parameters."""
+
+
+class Index(object):
+    """
+    A local SQLite mirror of the XNAT project, subject, experiment,
+    container, resource and file hierarchy.
+
+    The index is populated by :meth:`sync` and queried by :meth:`find`.
+    A :meth:`sync` is incremental, in that only experiments which are
+    new or whose XNAT modification time stamp changed since the last
+    sync are fetched from XNAT.
+
+    Example:
+
+    >>> import qixnat
+    >>> from qixnat.index import Index
+    >>> index = Index()
+    >>> with qixnat.connect() as xnat:
+    ...     index.sync(xnat, 'QIN')
+    >>> index.find([('project', 'QIN'), ('subject', 'Breast*')])
+    [[('project', 'QIN'), ('subject', 'Breast001')], ...]
+
+    :Note: The index holds only the experiment lineage and the
+        experiment descendants. Project and subject resources are not
+        indexed.
+    """
+
+    def __init__(self, location=None):
+        """
+        :param location: the index database file location
+            (default :const:`DEFAULT_LOCATION`)
+        """
+        self.location = location or DEFAULT_LOCATION
+        """The index database file location."""
+
+        parent = os.path.dirname(os.path.abspath(self.location))
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        self._db = sqlite3.connect(self.location, check_same_thread=False)
+        self._db.create_function('matches', 2, key_matches)
+        self._db.execute('PRAGMA foreign_keys = ON')
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._logger = logger(__name__)
+
+    def close(self):
+        """Closes the index database."""
+        self._db.close()
+
+    def find(self, hierarchy):
+        """
+        Finds the indexed objects which match the given search
+        hierarchy. The wildcard semantics are the same as those of
+        :meth:`qixnat.facade.XNAT.find`.
+
+        :param hierarchy: the REST [(type name, search key), ...] list,
+            beginning with the project
+        :return: the [(type name, key), ...] hierarchy of each matching
+            object
+        """
+        # The (row id, hierarchy) matches of the current level.
+        level = [(None, [])]
+        with self._lock:
+            for child_type, child_key in hierarchy:
+                if not level:
+                    break
+                level = self._find_children(level, child_type,
+                                            str(child_key))
+
+        return [path for _, path in level]
+
+    def _find_children(self, level, child_type, child_key):
+        """
+        :param level: the parent (row id, hierarchy) list
+        :param child_type: the child type name
+        :param child_key: the child search key
+        :return: the matching child (row id, hierarchy) list
+        """
+        paths = {row_id: path for row_id, path in level}
+        if '*' in child_key:
+            condition = 'matches(?, key)'
+        else:
+            condition = 'key = ?'
+        parent_ids = [row_id for row_id, _ in level]
+        if parent_ids == [None]:
+            sql = ("SELECT id, parent, key FROM objects WHERE parent IS NULL"
+                   " AND type = ? AND %s ORDER BY id" % condition)
+            rows = self._db.execute(sql, (child_type, child_key)).fetchall()
+        else:
+            rows = []
+            for i in range(0, len(parent_ids), MAX_QUERY_PARAMETERS):
+                chunk = parent_ids[i:i + MAX_QUERY_PARAMETERS]
+                sql = ("SELECT id, parent, key FROM objects WHERE parent IN"
+                       " (%s) AND type = ? AND %s ORDER BY id" %
+                       (','.join('?' * len(chunk)), condition))
+                rows.extend(self._db.execute(sql, chunk + [child_type,
+                                                           child_key]))
+        # Preserve the parent order.
+        order = {row_id: i for i, row_id in enumerate(parent_ids)}
+        rows.sort(key=lambda row: (order[row[1]], row[0]))
+
+        return [(row_id, paths[parent] + [(child_type, key)])
+                for row_id, parent, key in rows]
+
+    def sync(self, xnat, project, workers=1):
+        """
+        Brings the index of the given project up to date with XNAT.
+
+        The subjects and experiments are listed in one request each.
+        An experiment which is new, or whose XNAT ``last_modified`` or,
+        lacking that, ``insert_date`` time stamp differs from the
+        indexed value, is refetched. An indexed subject or experiment
+        which no longer exists in XNAT is removed.
+
+        :param xnat: the :class:`qixnat.facade.XNAT` facade
+        :param project: the XNAT project name
+        :param workers: the maximum number of concurrent experiment
+            fetches (default 1)
+        :return: the {subjects, experiments, changed, removed} counts
+        :raise XNATIndexError: if the project does not exist
+        """
+        prj_uri = '/data/projects/' + urllib.quote(project)
+        self._logger.debug("Syncing the %s index with XNAT..." % project)
+        start = time.time()
+        if not xnat.interface.select(prj_uri).exists():
+            raise XNATIndexError("The XNAT project does not exist: %s" %
+                                 project)
+        subjects = xnat.interface._get_json(prj_uri + '/subjects?columns=ID,'
+                                            'label')
+        exp_cols = 'ID,label,subject_label,insert_date,last_modified'
+        experiments = xnat.interface._get_json(prj_uri + '/experiments?'
+                                               'columns=' + exp_cols)
+        # The {subject label: {experiment label: modified}} XNAT
+        # experiment time stamps.
+        stamps = OrderedDict((row['label'], {}) for row in subjects)
+        for row in experiments:
+            modified = row.get('last_modified') or row.get('insert_date')
+            stamps.setdefault(row['subject_label'], {})[row['label']] = \
+                modified or None
+        with self._lock, self._db:
+            prj_id = self._child_id(None, 'project', project, create=True)
+            # Remove the deleted subjects and experiments.
+            removed = self._remove_missing(prj_id, 'subject', stamps)
+            # The {subject label: row id} dictionary.
+            sbj_ids = {}
+            # The {(subject label, experiment label): modified} indexed
+            # experiment time stamps.
+            indexed = {}
+            for sbj_label, exp_stamps in stamps.iteritems():
+                sbj_id = self._child_id(prj_id, 'subject', sbj_label,
+                                        create=True)
+                sbj_ids[sbj_label] = sbj_id
+                removed += self._remove_missing(sbj_id, 'experiment',
+                                                exp_stamps)
+                for key, modified in self._db.execute(
+                        "SELECT key, modified FROM objects WHERE parent = ?"
+                        " AND type = 'experiment'", (sbj_id,)):
+                    indexed[(sbj_label, key)] = modified
+        # The new or modified experiments.
+        changed = []
+        for row in experiments:
+            key = (row['subject_label'], row['label'])
+            modified = stamps[key[0]][key[1]]
+            if modified is None or indexed.get(key) != modified:
+                changed.append(row)
+        self._logger.debug("Fetching %d new or modified %s experiments..." %
+                           (len(changed), project))
+        # Fetch the experiment content concurrently, but write serially.
+        fetch = lambda row: self._fetch_experiment(
+            xnat, "%s/subjects/%s/experiments/%s" %
+            (prj_uri, urllib.quote(row['subject_label']),
+             urllib.quote(row['label']))
+        )
+        contents = xnat._map(fetch, changed, workers)
+        with self._lock, self._db:
+            for row, content in zip(changed, contents):
+                sbj_label, label = row['subject_label'], row['label']
+                self._replace_experiment(sbj_ids[sbj_label], label,
+                                         stamps[sbj_label][label], content)
+            self._db.execute("UPDATE objects SET modified = ? WHERE id = ?",
+                             (time.strftime('%Y-%m-%d %H:%M:%S'), prj_id))
+        self._logger.debug("Synced the %s index in %.1f seconds." %
+                           (project, time.time() - start))
+
+        return dict(subjects=len(subjects), experiments=len(experiments),
+                    changed=len(changed), removed=removed)
+
+    def _fetch_experiment(self, xnat, exp_uri):
+        """
+        Lists the content of the given experiment.
+
+        :param xnat: the :class:`qixnat.facade.XNAT` facade
+        :param exp_uri: the experiment REST URI
+        :return: the experiment :meth:`_fetch_resources` result, extended
+            with the container {(type, key): resources} dictionary
+        """
+        content = self._fetch_resources(xnat, 'experiment', exp_uri)
+        containers = content['containers'] = []
+        for ctr_type, collection, column in CONTAINER_COLLECTIONS:
+            ctr_uri = exp_uri + '/' + collection
+            rows = xnat.interface._get_json(ctr_uri + '?columns=ID,label')
+            for row in rows:
+                key = row[column]
+                uri = ctr_uri + '/' + urllib.quote(key)
+                containers.append(
+                    (ctr_type, key,
+                     self._fetch_resources(xnat, ctr_type, uri))
+                )
+
+        return content
+
+    def _fetch_resources(self, xnat, parent_type, uri):
+        """
+        :param xnat: the :class:`qixnat.facade.XNAT` facade
+        :param parent_type: the resource parent type name
+        :param uri: the resource parent REST URI
+        :return: the {'resources': [(type, label, files), ...]}
+            dictionary, where *files* is the resource file listing
+        """
+        resources = []
+        for rsc_type, collection in RESOURCE_COLLECTIONS[parent_type]:
+            rsc_uri = uri + '/' + collection
+            rows = xnat.interface._get_json(rsc_uri + '?columns=ID,label')
+            for row in rows:
+                label = row['label']
+                files = xnat.interface._get_json(
+                    rsc_uri + '/' + urllib.quote(label) + '/files'
+                )
+                resources.append((rsc_type, label, files))
+
+        return dict(resources=resources)
+
+    def _replace_experiment(self, sbj_id, label, modified, content):
+        """
+        Replaces the indexed experiment with the given fetched content.
+
+        :param sbj_id: the parent subject row id
+        :param label: the experiment label
+        :param modified: the XNAT experiment modification time stamp
+        :param content: the :meth:`_fetch_experiment` content
+        """
+        self._db.execute("DELETE FROM objects WHERE parent = ? AND"
+                         " type = 'experiment' AND key = ?", (sbj_id, label))
+        exp_id = self._insert(sbj_id, 'experiment', label, modified=modified)
+        self._insert_resources(exp_id, content['resources'])
+        for ctr_type, key, ctr_content in content['containers']:
+            ctr_id = self._insert(exp_id, ctr_type, key)
+            self._insert_resources(ctr_id, ctr_content['resources'])
+
+    def _insert_resources(self, parent_id, resources):
+        for rsc_type, label, files in resources:
+            rsc_id = self._insert(parent_id, rsc_type, label)
+            for row in files:
+                size = row.get('Size')
+                self._insert(rsc_id, 'file', row['path'],
+                             size=int(size) if size else None,
+                             digest=row.get('digest') or None)
+
+    def _insert(self, parent_id, obj_type, key, **values):
+        """
+        :return: the new row id
+        """
+        cols = ['parent', 'type', 'key'] + values.keys()
+        sql = ("INSERT INTO objects (%s) VALUES (%s)" %
+               (', '.join(cols), ', '.join('?' * len(cols))))
+        cursor = self._db.execute(sql, [parent_id, obj_type, key] +
+                                  values.values())
+
+        return cursor.lastrowid
+
+    def _child_id(self, parent_id, obj_type, key, create=False):
+        """
+        :param parent_id: the parent row id, or None for a project
+        :param obj_type: the child type name
+        :param key: the child key
+        :param create: flag indicating whether to insert a missing child
+        :return: the child row id, or None if not found and not created
+        """
+        row = self._db.execute("SELECT id FROM objects WHERE parent IS ? AND"
+                               " type = ? AND key = ?",
+                               (parent_id, obj_type, key)).fetchone()
+        if row:
+            return row[0]
+        if create:
+            return self._insert(parent_id, obj_type, key)
+
+    def _remove_missing(self, parent_id, obj_type, keys):
+        """
+        Removes the children of the given type whose key is not in the
+        given keys.
+
+        :return: the number of removed children
+        """
+        rows = self._db.execute("SELECT id, key FROM objects WHERE parent = ?"
+                                " AND type = ?", (parent_id, obj_type))
+        missing = [row_id for row_id, key in rows if key not in keys]
+        for row_id in missing:
+            self._db.execute("DELETE FROM objects WHERE id = ?", (row_id,))
+
+        return len(missing)
+
@@ -0,0 +1,114 @@
+"""
+.. module:: lock
+    :synopsis: Cross-process leases on XNAT objects.
+"""
+import os
+import time
+import errno
+import fcntl
+import hashlib
+from contextlib import contextmanager
+from qiutil.logging import logger
+
+
+class XNATLockError(Exception):
+    pass
+
+
+class FileLock(object):
+    """
+    FileLock grants exclusive leases keyed by an arbitrary string,
+    e.g. a XNAT object REST URI. The lease is an advisory ``flock`` on
+    a lock file in a directory shared by the cooperating processes.
+    The lease is released when the :meth:`lease` block finishes or the
+    holding process dies, whichever comes first.
+
+    A lock backend other than FileLock, e.g. one based on a database or
+    a distributed lock service, is an object with a :meth:`lease`
+    context manager method with the same signature.
+
+    Example:
+
+    >>> from qixnat.lock import FileLock
+    >>> lock = FileLock('/shared/xnat/locks')
+    >>> with lock.lease('/data/projects/QIN/subjects/Breast003'):
+    ...     # Create the subject.
+
+    :Note: the lock directory must be on a file system which supports
+        ``flock`` across the cooperating hosts, e.g. a local file
+        system for processes on one host or a NFS v4 mount for cluster
+        jobs.
+
+    :Note: the lock files are not removed, since removing a lock file
+        which another process has opened but not yet locked defeats
+        the lock.
+    """
+
+    POLL_INTERVAL = 0.1
+    """The lease acquisition retry interval in seconds."""
+
+    def __init__(self, directory, timeout=None):
+        """
+        :param directory: the shared lock file directory
+        :param timeout: the maximum number of seconds to wait for a
+            lease, or None to wait indefinitely
+        """
+        self._logger = logger(__name__)
+        self.directory = directory
+        """The shared lock file directory."""
+
+        self.timeout = float(timeout) if timeout else None
+        """The maximum number of seconds to wait for a lease."""
+
+        if not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as e:
+                # Another process might have made the directory.
+                if e.errno != errno.EEXIST:
+                    raise
+
+    @contextmanager
+    def lease(self, key):
+        """
+        Holds the exclusive lease for the given key in the execution
+        context.
+
+        :param key: the lease key
+        :raise XNATLockError: if the lease was not acquired within the
+            :attr:`timeout`
+        """
+        location = os.path.join(self.directory,
+                                hashlib.md5(key).hexdigest() + '.lock')
+        with open(location, 'a') as fd:
+            self._acquire(fd, key)
+            self._logger.debug("Acquired the lease on %s." % key)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                self._logger.debug("Released the lease on %s." % key)
+
+    def _acquire(self, fd, key):
+        """
+        :param fd: the open lock file
+        :param key: the lease key
+        :raise XNATLockError: if the lease was not acquired within the
+            :attr:`timeout`
+        """
+        if self.timeout is None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return
+        deadline = time.time() + self.timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except IOError as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    raise
+            if time.time() >= deadline:
+                raise XNATLockError("Timed out after %.1f seconds waiting"
+                                    " for the lease on %s" %
+                                    (self.timeout, key))
+            time.sleep(self.POLL_INTERVAL)
@@ -0,0 +1,721 @@
+"""
+.. module:: testing
+    :synopsis: In-process XNAT REST stand-in server.
+"""
+import os
+import io
+import re
+import csv
+import json
+import time
+import zipfile
+import hashlib
+import tempfile
+import threading
+import urllib
+import urlparse
+from fnmatch import fnmatch
+from datetime import datetime
+from collections import OrderedDict
+from contextlib import contextmanager
+from BaseHTTPServer import (HTTPServer, BaseHTTPRequestHandler)
+from SocketServer import ThreadingMixIn
+from qiutil.logging import logger
+
+
+class StandInError(Exception):
+    pass
+
+
+ENTRY_POINT = '/data'
+"""The REST entry point."""
+
+CHILD_COLLECTIONS = {
+    None: ['projects', 'subjects', 'experiments'],
+    'projects': ['subjects', 'experiments', 'resources'],
+    'subjects': ['experiments', 'resources'],
+    'experiments': ['scans', 'assessors', 'reconstructions', 'resources'],
+    'scans': ['resources'],
+    'assessors': ['resources', 'in_resources', 'out_resources'],
+    'reconstructions': ['resources', 'in_resources', 'out_resources']
+}
+"""The {parent collection: child collections} REST hierarchy."""
+
+RESOURCE_COLLECTIONS = ['resources', 'in_resources', 'out_resources']
+"""The collections whose elements contain files."""
+
+FLAT_COLLECTIONS = {
+    (None, 'subjects'): ['projects'],
+    (None, 'experiments'): ['projects', 'subjects'],
+    ('projects', 'experiments'): ['subjects']
+}
+"""
+The {(parent collection, child collection): intermediate collections}
+shortcut listings, e.g. ``/data/projects/QIN/experiments``.
+"""
+
+ID_PREFIXES = dict(subjects='S', experiments='E', assessors='E')
+"""The generated element ID prefixes."""
+
+DEFAULT_XSI_TYPES = dict(
+    projects='xnat:projectData', subjects='xnat:subjectData',
+    experiments='xnat:mrSessionData', scans='xnat:mrScanData',
+    assessors='xnat:qcAssessmentData',
+    reconstructions='xnat:reconstructedImageData',
+    resources='xnat:resourceCatalog', in_resources='xnat:resourceCatalog',
+    out_resources='xnat:resourceCatalog'
+)
+"""The element xsiType defaults."""
+
+FILE_COLUMNS = ['Name', 'Size', 'URI', 'collection', 'file_tags',
+                'file_format', 'file_content', 'cat_ID', 'digest']
+"""The file listing columns."""
+
+RESERVED_PARAMS = ['format', 'columns', 'xsiType', 'removeFiles',
+                   'allowDataDeletion', 'inbody', 'overwrite', 'extract',
+                   'content', 'tags', 'event_reason']
+"""The query parameters which are not attributes or listing filters."""
+
+
+class Element(object):
+    """A stand-in XNAT element."""
+
+    def __init__(self, collection, ident, label, xsi_type=None):
+        """
+        :param collection: the REST collection name, e.g. ``subjects``
+        :param ident: the XNAT ID
+        :param label: the XNAT label
+        :param xsi_type: the XNAT xsiType
+        """
+        self.collection = collection
+        self.id = ident
+        self.label = label
+        self.xsi_type = xsi_type or DEFAULT_XSI_TYPES.get(collection)
+        self.attrs = {}
+        """The {attribute: value} dictionary."""
+        self.parent = None
+        self.children = {}
+        """The {collection: {ID: element}} dictionary."""
+        self.files = OrderedDict()
+        """The resource {path: content} dictionary."""
+        self.insert_date = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.last_modified = _timestamp()
+        """The time of the last change to this element subtree."""
+
+    def child(self, collection, key):
+        """
+        :param collection: the child collection name
+        :param key: the child ID or label
+        :return: the matching child element, or None if none
+        """
+        children = self.children.get(collection, {})
+        if key in children:
+            return children[key]
+        return next((c for c in children.itervalues() if c.label == key),
+                    None)
+
+    def add(self, element):
+        """
+        Adds the given child element.
+
+        :param element: the child element
+        """
+        element.parent = self
+        self.children.setdefault(element.collection, OrderedDict())
+        self.children[element.collection][element.id] = element
+        self.touch()
+
+    def remove(self):
+        """Removes this element from its parent."""
+        del self.parent.children[self.collection][self.id]
+        self.parent.touch()
+        self.parent = None
+
+    def touch(self):
+        """Marks this element and its ancestors as modified."""
+        stamp = _timestamp()
+        element = self
+        while element:
+            element.last_modified = stamp
+            element = element.parent
+
+    def uri(self):
+        """
+        :return: the ID-based REST URI
+        """
+        path = self.collection.replace('_', '/') + '/' + self.id
+        if self.parent and self.parent.collection:
+            return self.parent.uri() + '/' + path
+        return ENTRY_POINT + '/' + path
+
+    def ancestor(self, collection):
+        """
+        :param collection: the ancestor collection name
+        :return: the closest ancestor element in that collection, or
+            None if none
+        """
+        parent = self.parent
+        while parent and parent.collection != collection:
+            parent = parent.parent
+        return parent
+
+    def row(self):
+        """
+        :return: the {column: value} listing row
+        """
+        row = dict(ID=self.id, label=self.label, URI=self.uri(),
+                   xsiType=self.xsi_type, insert_date=self.insert_date,
+                   last_modified=self.last_modified)
+        if self.collection in RESOURCE_COLLECTIONS:
+            row['xnat_abstractresource_id'] = self.id
+            row['file_count'] = str(len(self.files))
+            row['file_size'] = str(sum(len(c) for c in self.files.values()))
+        for collection, key in (('projects', 'project'),
+                                ('subjects', 'subject')):
+            ancestor = self.ancestor(collection)
+            if ancestor:
+                row[key] = row[key + '_ID'] = ancestor.id
+                row[key + '_label'] = ancestor.label
+        row.update(self.attrs)
+
+        return row
+
+
+class StandIn(object):
+    """
+    An in-process XNAT REST stand-in server. The server implements the
+    subset of the XNAT REST API which is used by the
+    :class:`qixnat.facade.XNAT` facade:
+
+    * element and file listings, with column and wildcard label
+      filters
+
+    * element create, attribute update and delete
+
+    * file upload, streaming download with ``Range`` and
+      ``If-Range`` support and extracted zip upload
+
+    * resource zip archive download
+
+    The XNAT content is held in memory. Each request can be delayed by
+    a fixed *latency*, and the request and response content can be
+    throttled to a *bandwidth*, in order to mimic a remote server.
+
+    The ``test`` package runs the live XNAT unit tests against a
+    stand-in server if the ``QIXNAT_STANDIN`` environment variable
+    is set.
+
+    Example:
+
+    >>> from qixnat.testing import StandIn
+    >>> with StandIn(latency=0.01) as server:
+    ...     with server.connect() as xnat:
+    ...         sbj = xnat.find_or_create('QIN_Test', 'Breast001')
+    ...     print server.request_count
+    """
+
+    def __init__(self, projects=None, latency=0, bandwidth=None, port=0):
+        """
+        :param projects: the projects to create (default ``QIN_Test``)
+        :param latency: the per-request delay in seconds (default 0)
+        :param bandwidth: the request and response content throughput
+            limit in bytes per second (default unlimited)
+        :param port: the server port (default any open port)
+        """
+        self.latency = latency
+        """The per-request delay in seconds."""
+
+        self.bandwidth = bandwidth
+        """The content throughput limit in bytes per second."""
+
+        self.root = Element(None, None, None)
+        """The root of the stand-in XNAT content tree."""
+
+        self.requests = []
+        """The (method, path) request log."""
+
+        self.bytes_sent = 0
+        """The response content byte count."""
+
+        self.bytes_received = 0
+        """The request content byte count."""
+
+        self._lock = threading.RLock()
+        self._counter = 0
+        self._port = port
+        self._server = None
+        self._thread = None
+        self._cfg_dir = None
+        for project in (projects or ['QIN_Test']):
+            self.root.add(Element('projects', project, project))
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def url(self):
+        """The server URL."""
+        host, port = self._server.server_address[:2]
+        return "http://%s:%d" % (host, port)
+
+    @property
+    def request_count(self):
+        """The number of requests served."""
+        return len(self.requests)
+
+    def reset_counters(self):
+        """Clears the request log and byte counters."""
+        with self._lock:
+            self.requests = []
+            self.bytes_sent = self.bytes_received = 0
+
+    def start(self):
+        """Starts serving requests on a background thread."""
+        if self._server:
+            raise StandInError("The XNAT stand-in server is already started")
+        self._server = _HTTPServer(('127.0.0.1', self._port), _Handler)
+        self._server.standin = self
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        logger(__name__).debug("Started the XNAT stand-in server at %s." %
+                               self.url)
+
+    def stop(self):
+        """Stops the server."""
+        if not self._server:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = self._thread = None
+        if self._cfg_dir:
+            for fname in os.listdir(self._cfg_dir):
+                os.remove(os.path.join(self._cfg_dir, fname))
+            os.rmdir(self._cfg_dir)
+            self._cfg_dir = None
+        logger(__name__).debug("Stopped the XNAT stand-in server.")
+
+    def config(self):
+        """
+        Writes a :meth:`qixnat.configuration.load` file which connects
+        to this server.
+
+        :return: the configuration file location
+        """
+        if not self._cfg_dir:
+            self._cfg_dir = tempfile.mkdtemp()
+        location = os.path.join(self._cfg_dir, 'xnat.cfg')
+        with open(location, 'w') as fp:
+            json.dump(dict(server=self.url, user='test', password='test'), fp)
+
+        return location
+
+    @contextmanager
+    def connect(self, **opts):
+        """
+        Yields a :meth:`qixnat.connect` XNAT facade connected to this
+        server.
+
+        :param opts: the additional :class:`qixnat.facade.XNAT` options
+        :yield: the XNAT facade
+        """
+        from .connection import connect
+        with connect(self.config(), **opts) as xnat:
+            yield xnat
+
+    def populate(self, project, subjects=1, sessions=1, scans=1, files=1,
+                 resource='NIFTI', size=1024):
+        """
+        Adds a synthetic project tree in a single step.
+
+        :param project: the project name
+        :param subjects: the number of subjects
+        :param sessions: the number of sessions per subject
+        :param scans: the number of scans per session
+        :param files: the number of files per scan resource
+        :param resource: the scan resource label
+        :param size: the file size in bytes
+        :return: the project element
+        """
+        with self._lock:
+            prj = self.root.child('projects', project)
+            if not prj:
+                prj = Element('projects', project, project)
+                self.root.add(prj)
+            content = os.urandom(size)
+            for i in range(1, subjects + 1):
+                sbj_lbl = "Subject%03d" % i
+                sbj = self._add(prj, 'subjects', sbj_lbl)
+                for j in range(1, sessions + 1):
+                    exp = self._add(sbj, 'experiments',
+                                    "%s_Session%02d" % (sbj_lbl, j))
+                    for k in range(1, scans + 1):
+                        scan = self._add(exp, 'scans', str(k))
+                        rsc = self._add(scan, 'resources', resource)
+                        for n in range(1, files + 1):
+                            rsc.files["image%03d.nii.gz" % n] = content
+
+        return prj
+
+    def _add(self, parent, collection, key):
+        """
+        Creates a child element.
+
+        :param parent: the parent element
+        :param collection: the child collection name
+        :param key: the child key
+        :return: the new child element
+        """
+        if collection in ('projects', 'scans', 'reconstructions'):
+            ident = key
+        else:
+            self._counter += 1
+            prefix = ID_PREFIXES.get(collection)
+            if prefix:
+                ident = "XNAT_%s%05d" % (prefix, self._counter)
+            else:
+                ident = str(self._counter)
+        child = Element(collection, ident, key)
+        parent.add(child)
+
+        return child
+
+    def handle(self, method, path, params, headers, body):
+        """
+        Serves a REST request.
+
+        :param method: the HTTP method
+        :param path: the unquoted URI path
+        :param params: the {name: value} query parameters
+        :param headers: the request headers
+        :param body: the request content
+        :return: the (status, {header: value}, content) response
+        """
+        with self._lock:
+            self.requests.append((method, path))
+            self.bytes_received += len(body)
+        if self.latency:
+            time.sleep(self.latency)
+        if self.bandwidth and body:
+            time.sleep(float(len(body)) / self.bandwidth)
+        if path.rstrip('/') == ENTRY_POINT + '/JSESSION':
+            return 200, {}, 'StandInSession'
+        if not path.startswith(ENTRY_POINT + '/'):
+            return _error(404)
+        segments = [s for s in path[len(ENTRY_POINT) + 1:].split('/') if s]
+        # Merge the in and out resource prefixes.
+        for inout in ('in', 'out'):
+            while inout in segments:
+                i = segments.index(inout)
+                segments[i:i + 2] = ['_'.join(segments[i:i + 2])]
+        with self._lock:
+            return self._dispatch(method, segments, params, headers, body)
+
+    def _dispatch(self, method, segments, params, headers, body):
+        parent = self.root
+        i = 0
+        while i < len(segments):
+            collection = segments[i]
+            if collection == 'files':
+                if parent.collection not in RESOURCE_COLLECTIONS:
+                    return _error(404)
+                fpath = '/'.join(segments[i + 1:])
+                return self._files(method, parent, fpath, params, headers,
+                                   body)
+            allowed = CHILD_COLLECTIONS.get(parent.collection, [])
+            if collection not in allowed:
+                return _error(404)
+            if i == len(segments) - 1:
+                if method != 'GET':
+                    return _error(405)
+                return self._list(parent, collection, params)
+            key = segments[i + 1]
+            child = self._find(parent, collection, key)
+            if i == len(segments) - 2:
+                return self._element(method, parent, collection, key, child,
+                                     params)
+            if not child:
+                return _error(404)
+            parent = child
+            i += 2
+
+    def _find(self, parent, collection, key):
+        flat = FLAT_COLLECTIONS.get((parent.collection, collection))
+        if flat:
+            return next((e for e in self._members(parent, collection)
+                         if key in (e.id, e.label)), None)
+        return parent.child(collection, key)
+
+    def _members(self, parent, collection):
+        """
+        :return: the parent collection elements, including the flat
+            shortcut listing members
+        """
+        levels = FLAT_COLLECTIONS.get((parent.collection, collection), [])
+        parents = [parent]
+        for level in levels:
+            parents = [c for p in parents
+                       for c in p.children.get(level, {}).values()]
+
+        return [c for p in parents
+                for c in p.children.get(collection, {}).values()]
+
+    def _list(self, parent, collection, params):
+        requested = [c for c in params.get('columns', '').split(',') if c]
+        # The column headers are the last path segment of the requested
+        # columns, as in XNAT.
+        headers = []
+        for col in requested + ['ID', 'label', 'URI', 'xsiType']:
+            header = col.split('/')[-1]
+            if header not in headers:
+                headers.append(header)
+        if collection in RESOURCE_COLLECTIONS:
+            headers += ['xnat_abstractresource_id', 'file_count']
+        rows = [e.row() for e in self._members(parent, collection)]
+        xsi_types = params.get('xsiType')
+        if xsi_types:
+            allowed = xsi_types.split(',')
+            rows = [r for r in rows if r['xsiType'] in allowed]
+        for name, value in params.iteritems():
+            if name in RESERVED_PARAMS:
+                continue
+            col = name.split('/')[-1]
+            if col not in headers:
+                headers.append(col)
+            rows = [r for r in rows
+                    if fnmatch(r.get(col, '').lower(), value.lower())]
+
+        return 200, {'Content-Type': 'text/csv'}, _csv(headers, rows)
+
+    def _element(self, method, parent, collection, key, element, params):
+        if method == 'GET':
+            if not element:
+                return _error(404)
+            if params.get('format') == 'json':
+                content = json.dumps(dict(items=[element.row()]))
+                return 200, {'Content-Type': 'application/json'}, content
+            content = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                       '<%s ID="%s" label="%s"/>' %
+                       (element.xsi_type, element.id, element.label))
+            return 200, {'Content-Type': 'text/xml'}, content
+        elif method == 'DELETE':
+            if not element:
+                return _error(404)
+            element.remove()
+            return 200, {}, ''
+        elif method == 'PUT':
+            if (parent.collection, collection) in FLAT_COLLECTIONS:
+                return _error(405)
+            if not element:
+                element = self._add(parent, collection, key)
+            if 'xsiType' in params:
+                element.xsi_type = params['xsiType']
+            for name, value in params.iteritems():
+                if name not in RESERVED_PARAMS:
+                    element.attrs[name.split('/')[-1]] = _xnat_value(value)
+            element.touch()
+            return 200, {}, element.id
+        else:
+            return _error(405)
+
+    def _files(self, method, resource, fpath, params, headers, body):
+        if not fpath:
+            if method != 'GET':
+                return _error(405)
+            if params.get('format') == 'zip':
+                return self._zip(resource)
+            rows = []
+            for name, content in resource.files.iteritems():
+                rows.append(dict(
+                    Name=name.split('/')[-1], Size=str(len(content)),
+                    URI=resource.uri() + '/files/' + name,
+                    collection=resource.label, file_tags='',
+                    file_format='', file_content='', cat_ID=resource.id,
+                    digest=hashlib.md5(content).hexdigest()
+                ))
+            return 200, {'Content-Type': 'text/csv'}, _csv(FILE_COLUMNS, rows)
+        if method == 'GET':
+            if fpath not in resource.files:
+                return _error(404)
+            return _ranged(resource.files[fpath], headers.get('Range'),
+                           headers.get('If-Range'))
+        elif method == 'DELETE':
+            if fpath not in resource.files:
+                return _error(404)
+            del resource.files[fpath]
+            resource.touch()
+            return 200, {}, ''
+        elif method in ('PUT', 'POST'):
+            overwrite = params.get('overwrite') == 'true'
+            if params.get('extract') == 'true':
+                archive = zipfile.ZipFile(io.BytesIO(body))
+                contents = OrderedDict((info.filename, archive.read(info))
+                                       for info in archive.infolist()
+                                       if not info.filename.endswith('/'))
+            else:
+                contents = {fpath: body}
+            if not overwrite:
+                existing = [p for p in contents if p in resource.files]
+                if existing:
+                    return _error(409)
+            resource.files.update(contents)
+            resource.touch()
+            return 200, {}, ''
+        else:
+            return _error(405)
+
+    def _zip(self, resource):
+        content = io.BytesIO()
+        prefix = resource.uri()[len(ENTRY_POINT) + 1:]
+        with zipfile.ZipFile(content, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for path, data in resource.files.iteritems():
+                archive.writestr(prefix + '/files/' + path, data)
+
+        return 200, {'Content-Type': 'application/zip'}, content.getvalue()
+
+    def _send(self, wfile, content):
+        """Writes the response content at the configured bandwidth."""
+        chunk_size = 64 * 1024
+        for offset in range(0, len(content), chunk_size):
+            chunk = content[offset:offset + chunk_size]
+            if self.bandwidth:
+                time.sleep(float(len(chunk)) / self.bandwidth)
+            wfile.write(chunk)
+        with self._lock:
+            self.bytes_sent += len(content)
+
+
+def _error(status):
+    """
+    :param status: the HTTP error status
+    :return: the XNAT-style HTML error response
+    """
+    content = "<html><body><h3>Status %d</h3></body></html>" % status
+
+    return status, {'Content-Type': 'text/html'}, content
+
+
+def _timestamp():
+    """
+    :return: the current time in the XNAT ``last_modified`` format
+    """
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _xnat_value(value):
+    """
+    :param value: the REST attribute value
+    :return: the stored value, with ``mm/dd/yy`` dates converted to
+        the XNAT ``yyyy-mm-dd`` format
+    """
+    match = re.match(r'(\d\d)/(\d\d)/(\d\d)$', value)
+    if match:
+        month, day, year = match.groups()
+        return "20%s-%s-%s" % (year, month, day)
+
+    return value
+
+
+def _csv(headers, rows):
+    content = io.BytesIO()
+    writer = csv.writer(content)
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow([row.get(header, '') for header in headers])
+
+    return content.getvalue()
+
+
+def _ranged(content, range_header, if_range=None):
+    """
+    :return: the full or ``bytes=N-`` partial file response, where
+        the range applies only if the *if_range* validator, if any,
+        matches the content ``ETag``
+    """
+    etag = '"%s"' % hashlib.md5(content).hexdigest()
+    match = re.match(r'bytes=(\d+)-$', range_header or '')
+    if not match or (if_range and if_range != etag):
+        headers = {'Content-Type': 'application/octet-stream', 'ETag': etag}
+        return 200, headers, content
+    start = int(match.group(1))
+    if start >= len(content):
+        return 416, {'Content-Range': "bytes */%d" % len(content)}, ''
+    headers = {'Content-Type': 'application/octet-stream', 'ETag': etag,
+               'Content-Range': "bytes %d-%d/%d" %
+                                (start, len(content) - 1, len(content))}
+
+    return 206, headers, content[start:]
+
+
+class _HTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # Accept bursts of concurrent client connections.
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self._serve('GET')
+
+    def do_PUT(self):
+        self._serve('PUT')
+
+    def do_POST(self):
+        self._serve('POST')
+
+    def do_DELETE(self):
+        self._serve('DELETE')
+
+    def do_HEAD(self):
+        self._serve('HEAD')
+
+    def _serve(self, method):
+        standin = self.server.standin
+        parsed = urlparse.urlsplit(self.path)
+        path = urllib.unquote(parsed.path)
+        params = dict(urlparse.parse_qsl(parsed.query, keep_blank_values=True))
+        try:
+            status, headers, content = standin.handle(
+                'GET' if method == 'HEAD' else method, path, params,
+                self.headers, self._body()
+            )
+        except Exception as e:
+            logger(__name__).error("XNAT stand-in %s %s error: %s" %
+                                   (method, self.path, e))
+            status, headers, content = _error(500)
+        self.send_response(status)
+        for name, value in headers.iteritems():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if method != 'HEAD':
+            standin._send(self.wfile, content)
+
+    def _body(self):
+        """
+        :return: the request content, including chunked content
+        """
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(';')[0], 16)
+                if not size:
+                    # Skip the trailer.
+                    while self.rfile.readline().strip():
+                        pass
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return ''.join(chunks)
+        length = int(self.headers.get('Content-Length') or 0)
+
+        return self.rfile.read(length) if length else ''
+
+    def log_message(self, fmt, *args):
+        logger(__name__).debug("XNAT stand-in " + fmt % args)
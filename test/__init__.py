@@ -5,3 +5,31 @@ ROOT = os.path.normpath(os.path.dirname(__file__))
 
 PROJECT = 'QIN_Test'
 """The test project name."""
+
+STANDIN_VAR = 'QIXNAT_STANDIN'
+"""
+The environment variable which directs the tests to run against an
+in-process :class:`qixnat.testing.StandIn` server rather than the
+configured XNAT server.
+"""
+
+_standin = None
+"""The stand-in XNAT server, if any."""
+
+
+def setup_package():
+    """Starts the stand-in XNAT server, if so directed."""
+    global _standin
+    if os.getenv(STANDIN_VAR):
+        from qixnat.testing import StandIn
+        _standin = StandIn(projects=[PROJECT])
+        _standin.start()
+        os.environ['XNAT_CFG'] = _standin.config()
+
+
+def teardown_package():
+    """Stops the stand-in XNAT server, if any."""
+    global _standin
+    if _standin:
+        _standin.stop()
+        _standin = None
@@ -0,0 +1,139 @@
+import os
+import shutil
+import zipfile
+from StringIO import StringIO
+from nose.tools import (assert_equal, assert_true, assert_raises)
+from qixnat import archive
+from .. import ROOT
+
+FIXTURE = os.path.join(ROOT, 'fixtures', 'xnat', 'dummy.nii.gz')
+"""The test fixture file."""
+
+RESULTS = os.path.join(ROOT, 'results', 'archive')
+"""The test results directory."""
+
+
+class Stream(object):
+    """A read-only non-seekable stream which returns short reads."""
+
+    def __init__(self, content, size=7):
+        self._fp = StringIO(content)
+        self._size = size
+
+    def read(self, size=-1):
+        return self._fp.read(min(size, self._size))
+
+
+class TestArchive(object):
+    """The streaming archive unit tests."""
+
+    def setUp(self):
+        shutil.rmtree(RESULTS, True)
+        os.makedirs(RESULTS)
+
+    def tearDown(self):
+        shutil.rmtree(RESULTS, True)
+
+    def test_extract(self):
+        with open(FIXTURE, 'rb') as fp:
+            content = fp.read()
+        entries = {'Session01/resources/NIFTI/files/volume1.nii.gz': content,
+                   'Session01/resources/NIFTI/files/sub/notes.txt': 'notes'}
+        for compression in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            buf = StringIO()
+            with zipfile.ZipFile(buf, 'w', compression) as zf:
+                zf.writestr('Session01/', '')
+                for name, data in entries.iteritems():
+                    zf.writestr(name, data)
+            target = lambda name, size: os.path.join(RESULTS, name)
+            stream = Stream(buf.getvalue())
+            locations = archive.extract(stream, target)
+            assert_equal(len(locations), len(entries),
+                         "The extracted file count is incorrect: %s" %
+                         locations)
+            for name, data in entries.iteritems():
+                location = os.path.join(RESULTS, name)
+                assert_true(os.path.exists(location),
+                            "The entry was not extracted: %s" % name)
+                with open(location, 'rb') as fp:
+                    assert_equal(fp.read(), data, "The extracted %s content"
+                                                  " is incorrect" % name)
+
+    def test_skip(self):
+        buf = StringIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('a.txt', 'a' * 1000)
+            zf.writestr('b.txt', 'b' * 1000)
+        target = lambda name, size: (os.path.join(RESULTS, name)
+                                     if name == 'b.txt' else None)
+        locations = archive.extract(Stream(buf.getvalue()), target)
+        expected = [os.path.join(RESULTS, 'b.txt')]
+        assert_equal(locations, expected, "The extracted files are incorrect:"
+                                          " %s" % locations)
+
+    def test_generate(self):
+        notes = os.path.join(RESULTS, 'notes.txt')
+        with open(notes, 'w') as fp:
+            fp.write('notes' * 1000)
+        entries = [('volume1.nii.gz', FIXTURE), ('notes.txt', notes)]
+        for method in (archive.STORED, archive.DEFLATED):
+            content = ''.join(archive.generate(entries, method))
+            # The standard zipfile module can read the archive.
+            with zipfile.ZipFile(StringIO(content)) as zf:
+                assert_equal(zf.namelist(), [name for name, _ in entries],
+                             "The archive entries are incorrect: %s" %
+                             zf.namelist())
+                assert_equal(zf.testzip(), None, "The archive is corrupt")
+            # The archive round-trips through the streaming extract.
+            out_dir = os.path.join(RESULTS, 'out')
+            target = lambda name, size: os.path.join(out_dir, name)
+            locations = archive.extract(Stream(content), target)
+            assert_equal(len(locations), len(entries),
+                         "The extracted file count is incorrect: %s" %
+                         locations)
+            for name, location in entries:
+                with open(location, 'rb') as expected:
+                    with open(os.path.join(out_dir, name), 'rb') as actual:
+                        assert_equal(actual.read(), expected.read(),
+                                     "The extracted %s content is"
+                                     " incorrect" % name)
+            shutil.rmtree(out_dir)
+
+    def test_truncated(self):
+        buf = StringIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('a.txt', os.urandom(5000))
+        content = buf.getvalue()[:1000]
+        target = lambda name, size: os.path.join(RESULTS, name)
+        with assert_raises(archive.ArchiveError):
+            archive.extract(Stream(content), target)
+
+    def test_truncated_entry_boundary(self):
+        buf = StringIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as zf:
+            zf.writestr('a.txt', 'a' * 1000)
+            zf.writestr('b.txt', 'b' * 1000)
+        # Cut the stream after the first entry content.
+        offset = zipfile.ZipFile(buf).getinfo('b.txt').header_offset
+        content = buf.getvalue()[:offset]
+        target = lambda name, size: os.path.join(RESULTS, name)
+        with assert_raises(archive.ArchiveError):
+            archive.extract(Stream(content), target)
+
+    def test_truncated_header(self):
+        buf = StringIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_STORED) as zf:
+            zf.writestr('a.txt', 'a' * 1000)
+            zf.writestr('b.txt', 'b' * 1000)
+        # Cut the stream in the middle of the second entry header.
+        offset = zipfile.ZipFile(buf).getinfo('b.txt').header_offset
+        content = buf.getvalue()[:offset + 10]
+        target = lambda name, size: os.path.join(RESULTS, name)
+        with assert_raises(archive.ArchiveError):
+            archive.extract(Stream(content), target)
+
+
+if __name__ == "__main__":
+    import nose
+
+    nose.main(defaultTest=__name__)
@@ -0,0 +1,35 @@
+from nose.tools import (assert_equal, assert_true)
+from qixnat import bench
+
+
+class TestBench(object):
+    """The benchmark suite unit tests."""
+
+    def test_run(self):
+        report = bench.run(['find', 'upload'], latency=0, subjects=1,
+                           sessions=1, scans=2, files=2, size=100)
+        actual = [(result['benchmark'], result['objects'])
+                  for result in report['results']]
+        assert_equal(actual, [('find', 4), ('upload', 4)],
+                     "The benchmark results are incorrect: %s" % actual)
+        upload = report['results'][1]
+        assert_equal(upload['bytes_uploaded'], 400,
+                     "The upload byte count is incorrect: %d" %
+                     upload['bytes_uploaded'])
+        for result in report['results']:
+            assert_true(result['requests'] > 0, "The %s request count is"
+                                                " missing" %
+                                                result['benchmark'])
+            assert_true(result['peak_rss'] > 0, "The %s peak RSS is"
+                                                " missing" %
+                                                result['benchmark'])
+
+    def test_peak_rss(self):
+        # The stand-in file content, which is shared by the files, is
+        # larger than the facade process.
+        size = 64 * 1024 * 1024
+        report = bench.run(['find'], latency=0, subjects=1, sessions=1,
+                           scans=1, files=1, size=size)
+        peak_rss = report['results'][0]['peak_rss']
+        assert_true(peak_rss < size, "The peak RSS includes the stand-in"
+                                     " content: %d" % peak_rss)
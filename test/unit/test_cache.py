@@ -0,0 +1,61 @@
+import time
+from nose.tools import (assert_equal, assert_true, assert_false,
+                        assert_is_none)
+from qixnat.cache import Cache
+
+
+class TestCache(object):
+    """The cache unit tests."""
+
+    def test_get(self):
+        cache = Cache(size=10, ttl=None)
+        cache.put('a', 1)
+        assert_equal(cache.get('a'), 1, "The cached value is incorrect")
+        assert_is_none(cache.get('b'), "A missing value was found")
+        assert_equal(cache.hits, 1, "The hit count is incorrect: %d" %
+                                    cache.hits)
+        assert_equal(cache.misses, 1, "The miss count is incorrect: %d" %
+                                      cache.misses)
+
+    def test_eviction(self):
+        cache = Cache(size=2, ttl=None)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        # Touch the first entry, so that the second entry is the
+        # least recently used.
+        cache.get('a')
+        cache.put('c', 3)
+        assert_true('a' in cache, "The recently used entry was evicted")
+        assert_false('b' in cache, "The least recently used entry was not"
+                                   " evicted")
+        assert_equal(cache.evictions, 1, "The eviction count is incorrect:"
+                                         " %d" % cache.evictions)
+        assert_equal(len(cache), 2, "The cache size is incorrect: %d" %
+                                    len(cache))
+
+    def test_expiration(self):
+        cache = Cache(size=10, ttl=0.01)
+        cache.put('a', 1)
+        time.sleep(0.02)
+        assert_is_none(cache.get('a'), "An expired value was found")
+        assert_equal(len(cache), 0, "The expired entry was not removed")
+
+    def test_discard(self):
+        cache = Cache(size=10, ttl=None)
+        for key in ('/a', '/a/b', '/c'):
+            cache.put(key, key)
+        count = cache.discard(lambda key: key.startswith('/a'))
+        assert_equal(count, 2, "The discard count is incorrect: %d" % count)
+        assert_equal(cache.stats()['entries'], 1,
+                     "The remaining entry count is incorrect")
+
+    def test_disabled(self):
+        cache = Cache(size=0, ttl=None)
+        cache.put('a', 1)
+        assert_is_none(cache.get('a'), "A disabled cache value was found")
+
+
+if __name__ == "__main__":
+    import nose
+
+    nose.main(defaultTest=__name__)
@@ -0,0 +1,62 @@
+import threading
+from nose.tools import (assert_equal, assert_is_none)
+import qixnat
+from qixnat import connection
+from qixnat.facade import XNAT
+from qixnat.testing import StandIn
+from .. import PROJECT
+
+
+class TestConnection(object):
+    """The XNAT connection unit tests."""
+
+    def test_concurrent_connect(self):
+        # The {thread name: XNAT facade} dictionary.
+        facades = {}
+        # The start barrier.
+        ready = threading.Event()
+
+        def work(name, shared):
+            ready.wait()
+            for _ in range(5):
+                with qixnat.connect(shared=shared) as xnat:
+                    with qixnat.connect(shared=shared) as nested:
+                        assert_equal(nested, xnat,
+                                     "The nested connection facade differs")
+                    xnat.find_one(PROJECT)
+                    facades.setdefault(name, set()).add(id(xnat))
+
+        threads = [threading.Thread(target=work, args=(str(i), i % 2 == 0))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        ready.set()
+        for thread in threads:
+            thread.join()
+        assert_equal(len(facades), 8, "Some threads failed: %s" %
+                                      facades.keys())
+        assert_equal(connection._shared.counter, 0,
+                     "The shared connection reference count is incorrect:"
+                     " %d" % connection._shared.counter)
+        assert_is_none(connection._shared.xnat,
+                       "The shared connection was not closed")
+
+    def test_lazy_entry_point(self):
+        with StandIn(projects=[PROJECT]) as server:
+            # The facade is created without a server request.
+            xnat = XNAT(server=server.url, user='test', password='test')
+            assert_equal(server.request_count, 0, "The facade made a server"
+                                                  " request on creation: %s" %
+                                                  server.requests)
+            # The entry point is determined on first use.
+            xnat.find_one(PROJECT)
+            assert_equal(server.requests[0], ('GET', '/data/JSESSION'),
+                         "The entry point was not determined on first use:"
+                         " %s" % server.requests)
+            xnat.close()
+
+
+if __name__ == "__main__":
+    import nose
+
+    nose.main(defaultTest=__name__)
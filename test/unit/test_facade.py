@@ -1,12 +1,14 @@
 import os
 import shutil
+import threading
 from datetime import datetime
 from nose.tools import (assert_equal, assert_true, assert_false,
-                        assert_is_none, assert_is_not_none)
+                        assert_is_none, assert_is_not_none, assert_raises)
 from pyxnat.core.resources import (Experiment, Scan, Reconstruction,
                                    Resource, Assessor)
 from qiutil.file import splitexts
 import qixnat
+from qixnat.facade import XNATError
 from qixnat.helpers import parse_xnat_date
 from .. import (PROJECT, ROOT)
 from ..helpers.logging import logger
@@ -135,6 +137,333 @@ class TestFacade(object):
                                       " incorrect: %s" % dl_dir)
         assert_equal(dl_fname, fname, "File name is incorrect: %s" % dl_fname)
 
+    def test_concurrent_download(self):
+        # The uploaded XNAT file names.
+        fnames = ["volume%03d.nii.gz" % i for i in range(1, 5)]
+        with qixnat.connect() as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+            for fname in fnames:
+                xnat.upload(rsc, FIXTURE, name=fname)
+            # Download the files on a thread pool.
+            files = xnat.download(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                  resource=RESOURCE, dest=RESULTS, workers=3)
+        # Verify the download.
+        expected = [os.path.join(RESULTS, fname) for fname in fnames]
+        assert_equal(sorted(files), expected,
+                     "The downloaded files are incorrect: %s" % files)
+        for location in files:
+            assert_true(os.path.exists(location), "File not downloaded: %s" %
+                                                  location)
+
+    def test_same_name_download(self):
+        _, fname = os.path.split(FIXTURE)
+        # The distinct scan file contents.
+        contents = ['a' * 1000, 'b' * 2000]
+        in_dir = os.path.join(RESULTS, 'in')
+        dest = os.path.join(RESULTS, 'out')
+        os.makedirs(in_dir)
+        with qixnat.connect() as xnat:
+            file_objs = []
+            for number, content in enumerate(contents, start=1):
+                in_file = os.path.join(in_dir, "scan%d.nii.gz" % number)
+                with open(in_file, 'wb') as fp:
+                    fp.write(content)
+                rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                          scan=number, resource=RESOURCE,
+                                          modality='MR')
+                xnat.upload(rsc, in_file, name=fname)
+                file_objs.append(rsc.file(fname))
+            # The same-named scan files cannot be downloaded together.
+            with assert_raises(XNATError):
+                xnat.download(PROJECT, SUBJECT, SESSION, scan='*',
+                              resource=RESOURCE, dest=dest, workers=2)
+            assert_equal(os.listdir(dest), [], "A file was downloaded"
+                                               " despite the name clash")
+            # Concurrent forced downloads to the same location do not
+            # share a partial file.
+            threads = [threading.Thread(target=xnat.download_file,
+                                        args=(file_obj, dest),
+                                        kwargs=dict(force=True))
+                       for file_obj in file_objs]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert_equal(os.listdir(dest), [fname], "The download directory"
+                                                " content is incorrect: %s" %
+                                                os.listdir(dest))
+        with open(os.path.join(dest, fname), 'rb') as fp:
+            content = fp.read()
+        assert_true(content in contents, "The downloaded content is corrupt")
+
+    def test_resume_download(self):
+        _, fname = os.path.split(FIXTURE)
+        with open(FIXTURE, 'rb') as fp:
+            content = fp.read()
+        os.makedirs(RESULTS)
+        location = os.path.join(RESULTS, fname)
+        with qixnat.connect() as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+            xnat.upload(rsc, FIXTURE)
+            # Simulate an interrupted download of the current XNAT
+            # file version.
+            response = xnat.interface.get(rsc.file(fname)._uri)
+            validator = xnat._response_validator(response)
+            with open(location + '.part', 'wb') as fp:
+                fp.write(content[:len(content) / 2])
+            if validator:
+                with open(location + '.part.validator', 'w') as fp:
+                    fp.write(validator)
+            # Resume the download.
+            files = xnat.download(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                  resource=RESOURCE, dest=RESULTS)
+            assert_equal(files, [location],
+                         "The downloaded files are incorrect: %s" % files)
+            assert_false(os.path.exists(location + '.part'),
+                         "The partial download was not removed")
+            assert_false(os.path.exists(location + '.part.validator'),
+                         "The partial download validator was not removed")
+            with open(location, 'rb') as fp:
+                assert_equal(fp.read(), content,
+                             "The resumed download content is incorrect")
+            # A truncated existing file is not skipped.
+            with open(location, 'r+b') as fp:
+                fp.truncate(len(content) / 2)
+            xnat.download(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                          resource=RESOURCE, dest=RESULTS, skip_existing=True)
+        assert_equal(os.path.getsize(location), len(content),
+                     "The truncated existing file was skipped")
+
+    def test_stale_resume_download(self):
+        _, fname = os.path.split(FIXTURE)
+        with open(FIXTURE, 'rb') as fp:
+            content = fp.read()
+        # Simulate an interrupted download of a different XNAT file
+        # version.
+        os.makedirs(RESULTS)
+        location = os.path.join(RESULTS, fname)
+        with open(location + '.part', 'wb') as fp:
+            fp.write('\0' * (len(content) / 2))
+        with open(location + '.part.validator', 'w') as fp:
+            fp.write('"stale"')
+        with qixnat.connect() as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+            xnat.upload(rsc, FIXTURE)
+            # The download restarts from the beginning.
+            xnat.download(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                          resource=RESOURCE, dest=RESULTS)
+        with open(location, 'rb') as fp:
+            assert_equal(fp.read(), content,
+                         "The restarted download content is incorrect")
+        assert_equal(os.listdir(RESULTS), [fname],
+                     "The partial download was not removed: %s" %
+                     os.listdir(RESULTS))
+
+    def test_concurrent_upload(self):
+        # The input files.
+        os.makedirs(RESULTS)
+        in_files = []
+        for i in range(1, 5):
+            location = os.path.join(RESULTS, "volume%03d.nii.gz" % i)
+            shutil.copy(FIXTURE, location)
+            in_files.append(location)
+        with qixnat.connect() as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+            # Upload the files on a thread pool.
+            xnat_files = xnat.upload(rsc, *in_files, workers=3)
+            expected = [os.path.basename(location) for location in in_files]
+            assert_equal(xnat_files, expected,
+                         "The uploaded files are incorrect: %s" % xnat_files)
+            for fname in expected:
+                file_obj = rsc.file(fname)
+                assert_true(file_obj.exists(),
+                            "The XNAT file was not uploaded: %s" % fname)
+            # Uploading again skips the existing files.
+            xnat_files = xnat.upload(rsc, *in_files, workers=3,
+                                     skip_existing=True)
+            assert_equal(xnat_files, expected,
+                         "The skipped files are incorrect: %s" % xnat_files)
+
+    def test_upload_directory(self):
+        # The input directory tree.
+        in_dir = os.path.join(RESULTS, 'in')
+        expected = ['volume001.nii.gz', 'dce/volume002.nii.gz',
+                    'dce/volume003.nii.gz']
+        for fname in expected:
+            location = os.path.join(in_dir, fname)
+            if not os.path.exists(os.path.dirname(location)):
+                os.makedirs(os.path.dirname(location))
+            shutil.copy(FIXTURE, location)
+        with qixnat.connect() as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+            xnat_files = xnat.upload_directory(rsc, in_dir, workers=3)
+            assert_equal(xnat_files, expected,
+                         "The uploaded files are incorrect: %s" % xnat_files)
+            # The download recreates the directory tree.
+            out_dir = os.path.join(RESULTS, 'out')
+            files = xnat.download(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                  resource=RESOURCE, dest=out_dir, workers=3)
+        assert_equal(sorted(files),
+                     sorted(os.path.join(out_dir, fname) for fname in expected),
+                     "The downloaded files are incorrect: %s" % files)
+
+    def test_sync(self):
+        path = "/%s/%s/%s/scan/%d/resource/%s" % (PROJECT, SUBJECT, SESSION,
+                                                   SCAN, RESOURCE)
+        # The local directory tree.
+        up_dir = os.path.join(RESULTS, 'up')
+        fnames = ['volume001.nii.gz', 'dce/volume002.nii.gz']
+        for fname in fnames:
+            location = os.path.join(up_dir, fname)
+            if not os.path.exists(os.path.dirname(location)):
+                os.makedirs(os.path.dirname(location))
+            shutil.copy(FIXTURE, location)
+        with qixnat.connect() as xnat:
+            actual = xnat.sync(up_dir, path, modality='MR', workers=2)
+            assert_equal(actual, (fnames, []),
+                         "The initial upload sync is incorrect: %s" % (actual,))
+            # Only the changed file is uploaded, and the extraneous
+            # XNAT file is deleted.
+            with open(os.path.join(up_dir, fnames[1]), 'ab') as fp:
+                fp.write('changed')
+            rsc = xnat.find_one(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                resource=RESOURCE)
+            xnat.upload(rsc, FIXTURE, name='extra.nii.gz')
+            actual = xnat.sync(up_dir, path, delete=True)
+            assert_equal(actual, (fnames[1:], ['extra.nii.gz']),
+                         "The changed upload sync is incorrect: %s" %
+                         (actual,))
+            # The download sync copies the files into an empty directory
+            # and then copies nothing.
+            down_dir = os.path.join(RESULTS, 'down')
+            actual = xnat.sync(down_dir, path, direction='down')
+            assert_equal(actual, (sorted(fnames), []),
+                         "The download sync is incorrect: %s" % (actual,))
+            actual = xnat.sync(down_dir, path, direction='down')
+            assert_equal(actual, ([], []), "The repeated download sync is"
+                                           " incorrect: %s" % (actual,))
+
+    def test_archive_upload(self):
+        os.makedirs(RESULTS)
+        in_files = []
+        for i in range(1, 4):
+            location = os.path.join(RESULTS, "volume%03d.nii.gz" % i)
+            shutil.copy(FIXTURE, location)
+            in_files.append(location)
+        with qixnat.connect() as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+            # Upload the first file separately.
+            xnat.upload(rsc, in_files[0])
+            # Upload the files as an archive, skipping the first file.
+            xnat_files = xnat.upload(rsc, *in_files, archive=True,
+                                     skip_existing=True)
+            expected = [os.path.basename(location) for location in in_files]
+            assert_equal(xnat_files, expected,
+                         "The uploaded files are incorrect: %s" % xnat_files)
+            for fname in expected:
+                file_obj = rsc.file(fname)
+                assert_true(file_obj.exists(),
+                            "The XNAT file was not extracted: %s" % fname)
+
+    def test_archive_download(self):
+        fnames = ["volume%03d.nii.gz" % i for i in range(1, 4)]
+        with qixnat.connect() as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+            for fname in fnames:
+                xnat.upload(rsc, FIXTURE, name=fname)
+            # Download the resource as an archive.
+            files = xnat.download(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                  resource=RESOURCE, dest=RESULTS,
+                                  archive=True)
+        expected = [os.path.join(RESULTS, fname) for fname in fnames]
+        assert_equal(sorted(files), expected,
+                     "The extracted files are incorrect: %s" % files)
+        fixture_size = os.path.getsize(FIXTURE)
+        for location in files:
+            assert_equal(os.path.getsize(location), fixture_size,
+                         "The extracted file size is incorrect: %s" % location)
+
+    def test_archive_download_options(self):
+        fnames = ["volume%03d.nii.gz" % i for i in range(1, 4)]
+        expected = [os.path.join(RESULTS, fname) for fname in fnames[:2]]
+        with qixnat.connect() as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+            for fname in fnames:
+                xnat.upload(rsc, FIXTURE, name=fname)
+            # The file filter and transfer options apply to the archive.
+            for _ in range(2):
+                files = xnat.download(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                      resource=RESOURCE, file='volume00[12]*',
+                                      dest=RESULTS, archive=True,
+                                      skip_existing=True)
+                assert_equal(sorted(files), expected,
+                             "The filtered extracted files are incorrect: %s" %
+                             files)
+
+    def test_verify_download(self):
+        _, fname = os.path.split(FIXTURE)
+        location = os.path.join(RESULTS, fname)
+        with qixnat.connect() as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+            xnat.upload(rsc, FIXTURE)
+            for verify in ('size', 'md5'):
+                xnat.download(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                              resource=RESOURCE, dest=RESULTS)
+                # A matching existing file is kept.
+                mtime = os.path.getmtime(location)
+                xnat.download(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                              resource=RESOURCE, dest=RESULTS, verify=verify)
+                assert_equal(os.path.getmtime(location), mtime,
+                             "The %s matching file was replaced" % verify)
+                # A changed existing file is replaced.
+                with open(location, 'r+b') as fp:
+                    fp.truncate(1)
+                xnat.download(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                              resource=RESOURCE, dest=RESULTS, verify=verify)
+                assert_equal(os.path.getsize(location),
+                             os.path.getsize(FIXTURE),
+                             "The %s changed file was not replaced" % verify)
+                shutil.rmtree(RESULTS)
+
+    def test_verify_upload(self):
+        _, fname = os.path.split(FIXTURE)
+        location = os.path.join(RESULTS, fname)
+        os.makedirs(RESULTS)
+        shutil.copy(FIXTURE, location)
+        with qixnat.connect() as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+            xnat.upload(rsc, location)
+            # A matching input file is skipped.
+            xnat.upload(rsc, location, verify='md5')
+            # A changed input file replaces the XNAT file.
+            with open(location, 'r+b') as fp:
+                fp.truncate(1)
+            xnat.upload(rsc, location, verify='md5')
+            file_obj = rsc.file(fname)
+            assert_equal(int(file_obj.size()), 1,
+                         "The changed XNAT file was not replaced")
+        shutil.rmtree(RESULTS)
+
     def test_find(self):
         with qixnat.connect() as xnat:
             # Make some experiments and resources.
@@ -157,6 +486,187 @@ class TestFacade(object):
             assert_equal(len(result), 0, "Find non-existing result is"
                                          " not empty: %s" % result)
 
+    def test_find_iter(self):
+        with qixnat.connect() as xnat:
+            for number in range(1, 4):
+                xnat.find_or_create(PROJECT, SUBJECT, SESSION, scan=number,
+                                    resource=RESOURCE, modality='MR')
+            expected = xnat.find(PROJECT, SUBJECT, SESSION, scan='*',
+                                 resource='*')
+            actual = list(xnat.find_iter(PROJECT, SUBJECT, SESSION,
+                                         scan='*', resource='*'))
+            assert_equal([obj._uri for obj in actual],
+                         [obj._uri for obj in expected],
+                         "The find_iter result is incorrect: %s" % actual)
+            # An abandoned iteration does not fetch the remaining
+            # objects.
+            matches = xnat.find_iter(PROJECT, SUBJECT, SESSION, scan='*')
+            first = next(matches)
+            matches.close()
+            assert_equal(first._uri, expected[0].parent()._uri,
+                         "The first find_iter match is incorrect: %s" % first)
+
+    def test_attributes(self):
+        date = datetime(2014, 9, 3)
+        exp_opt = (SESSION, dict(date=date))
+        with qixnat.connect() as xnat:
+            for number in range(1, 4):
+                scan_opt = (number, dict(series_description="T%d" % number))
+                xnat.find_or_create(PROJECT, SUBJECT, exp_opt, scan=scan_opt,
+                                    modality='MR')
+            exp = xnat.find_one(PROJECT, SUBJECT, SESSION)
+            actual = xnat.attributes([exp], ['date'])
+            assert_equal(actual, [dict(date='2014-09-03')],
+                         "The experiment attributes are incorrect: %s" %
+                         actual)
+            scans = xnat.find(PROJECT, SUBJECT, SESSION, scan='*')
+            actual = xnat.attributes(scans, ['series_description'])
+            expected = [dict(series_description="T%d" % number)
+                        for number in range(1, 4)]
+            assert_equal(actual, expected, "The scan attributes are"
+                                           " incorrect: %s" % actual)
+
+    def test_cache(self):
+        with qixnat.connect(shared=False, cache_size=1000) as xnat:
+            # A cached non-existing object is created.
+            rsc = xnat.find_one(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                resource=RESOURCE)
+            assert_is_none(rsc, "Non-existing resource was found: %s" % rsc)
+            xnat.find_or_create(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                resource=RESOURCE, modality='MR')
+            rsc = xnat.find_one(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                resource=RESOURCE)
+            assert_is_not_none(rsc, "Created resource was not found")
+            # A repeated find is served from the cache.
+            hits = xnat.cache.hits
+            result = xnat.find(PROJECT, SUBJECT, SESSION, scan='*')
+            assert_equal(len(result), 1, "Find result is incorrect: %s" %
+                                         result)
+            xnat.find(PROJECT, SUBJECT, SESSION, scan='*')
+            assert_true(xnat.cache.hits > hits, "The repeated find was not"
+                                                " cached")
+            # A deleted object is no longer found.
+            xnat.delete(PROJECT, SUBJECT, SESSION, scan=SCAN)
+            result = xnat.find(PROJECT, SUBJECT, SESSION, scan='*')
+            assert_equal(len(result), 0, "Deleted scan was found: %s" %
+                                         result)
+
+    def test_no_cache(self):
+        # By default, a change by another client is seen at once.
+        with qixnat.connect(shared=False) as xnat:
+            rsc = xnat.find_one(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                resource=RESOURCE)
+            assert_is_none(rsc, "Non-existing resource was found: %s" % rsc)
+            # The shared connection is another client.
+            with qixnat.connect() as other:
+                other.find_or_create(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                     resource=RESOURCE, modality='MR')
+            rsc = xnat.find_one(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                resource=RESOURCE)
+            assert_is_not_none(rsc, "The resource created by another client"
+                                    " was not found")
+            assert_equal(len(xnat.cache), 0, "The cache is not disabled by"
+                                             " default")
+
+    def test_async(self):
+        with qixnat.connect() as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+        with qixnat.connect_async(workers=4) as xnat:
+            # Submit the uploads before waiting on any of them.
+            fnames = ["volume%03d.nii.gz" % i for i in range(1, 5)]
+            pending = [xnat.upload(rsc, FIXTURE, name=fname)
+                       for fname in fnames]
+            xnat_files = [result.get() for result in pending]
+            assert_equal(xnat_files, [[fname] for fname in fnames],
+                         "The uploaded files are incorrect: %s" % xnat_files)
+            # The find and download have the facade semantics.
+            result = xnat.find(PROJECT, SUBJECT, SESSION, scan='*',
+                               resource=RESOURCE).get()
+            assert_equal(len(result), 1, "Find result is incorrect: %s" %
+                                         result)
+            files = xnat.download(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                  resource=RESOURCE, dest=RESULTS).get()
+            # The delete is also submitted to the worker pool.
+            deleted = xnat.delete_objects(result).get()
+            assert_equal(deleted, result, "The deleted objects are"
+                                          " incorrect: %s" % deleted)
+            assert_false(rsc.exists(), "%s was not deleted." % rsc)
+        expected = [os.path.join(RESULTS, fname) for fname in fnames]
+        assert_equal(sorted(files), expected,
+                     "The downloaded files are incorrect: %s" % files)
+
+    def test_find_or_create_many(self):
+        specs = [dict(project=PROJECT, subject=SUBJECT, experiment=SESSION,
+                      scan=(number, dict(series_description='T1')),
+                      resource=RESOURCE, modality='MR')
+                 for number in range(1, 5)]
+        with qixnat.connect() as xnat:
+            # Make one of the scans beforehand.
+            xnat.find_or_create(PROJECT, SUBJECT, SESSION, scan=2,
+                                modality='MR')
+            resources = xnat.find_or_create_many(specs, workers=2)
+            assert_equal(len(resources), 4, "The created resource count is"
+                                            " incorrect: %d" % len(resources))
+            result = xnat.find(PROJECT, SUBJECT, SESSION, scan='*',
+                               resource=RESOURCE)
+            assert_equal(len(result), 4, "The created resources are"
+                                         " incorrect: %s" % result)
+            scan = xnat.find_one(PROJECT, SUBJECT, SESSION, scan=3)
+            desc = scan.attrs.get('series_description')
+            assert_equal(desc, 'T1', "The created scan description is"
+                                     " incorrect: %s" % desc)
+            # A repeated call finds the existing objects.
+            resources = xnat.find_or_create_many(specs)
+            assert_true(all(rsc.exists() for rsc in resources),
+                        "The existing resources were not found")
+
+    def test_leased_create(self):
+        lock_dir = os.path.join(RESULTS, 'locks')
+        # The thread find_or_create results.
+        results = []
+
+        def create():
+            with qixnat.connect(shared=False, lock_dir=lock_dir) as xnat:
+                rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                          scan=SCAN, resource=RESOURCE,
+                                          modality='MR')
+                results.append(rsc)
+
+        threads = [threading.Thread(target=create) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert_equal(len(results), 4, "Some find_or_create calls failed")
+        with qixnat.connect() as xnat:
+            result = xnat.find(PROJECT, SUBJECT, SESSION, scan='*',
+                               resource='*')
+            assert_equal(len(result), 1, "The created resources are"
+                                         " incorrect: %s" % result)
+
+    def test_known_existing(self):
+        # Disable the cache so that only the known objects are spared
+        # an existence check.
+        with qixnat.connect(shared=False, cache_size=0) as xnat:
+            rsc = xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                      scan=SCAN, resource=RESOURCE,
+                                      modality='MR')
+            scan = rsc.parent()
+            for obj in (rsc, scan, scan.parent()):
+                assert_true(obj._uri in xnat._known,
+                            "The created object is not known: %s" % obj)
+            # A deleted object and its descendants are forgotten.
+            xnat.delete(PROJECT, SUBJECT, SESSION, scan=SCAN)
+            assert_false(scan._uri in xnat._known,
+                         "The deleted scan is still known")
+            assert_false(rsc._uri in xnat._known,
+                         "The deleted scan resource is still known")
+            rsc = xnat.find_one(PROJECT, SUBJECT, SESSION, scan=SCAN,
+                                resource=RESOURCE)
+            assert_is_none(rsc, "The deleted resource was found: %s" % rsc)
+
     def test_delete(self):
         with qixnat.connect() as xnat:
             # Make a resource.
@@ -169,6 +679,19 @@ class TestFacade(object):
             rsc = xnat.find_one(PROJECT, SUBJECT, 'Session01', scan=1,
                                 resource=RESOURCE, modality='MR')
             assert_is_none(rsc, "Deleted resource was found: %s." % rsc)
+
+    def test_concurrent_delete(self):
+        with qixnat.connect() as xnat:
+            scans = [xnat.find_or_create(PROJECT, SUBJECT, SESSION,
+                                         scan=number, resource=RESOURCE,
+                                         modality='MR').parent()
+                     for number in range(1, 5)]
+            exp = scans[0].parent()
+            # The experiment subsumes the scans.
+            deleted = xnat.delete_objects(scans + [exp], workers=3)
+            assert_equal([obj._uri for obj in deleted], [exp._uri],
+                         "The deleted objects are incorrect: %s" % deleted)
+            assert_false(exp.exists(), "%s was not deleted." % exp)
     
     def _validate_experiment_date(self, exp, date):
         actual_date_s = exp.attrs.get('date')
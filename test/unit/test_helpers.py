@@ -1,10 +1,13 @@
 import os
+import hashlib
 from nose.tools import (assert_equal, assert_true, assert_is_not_none,
                         assert_is_instance)
 import qixnat
 from qixnat.helpers import (hierarchical_label, path_hierarchy,
                             pluralize_type_designator, xnat_key, xnat_name,
-                            xnat_path, xnat_children)
+                            xnat_path, xnat_children, file_digest,
+                            key_matches, hierarchy_path, uri_hierarchy,
+                            prune_descendants, xsi_modality)
 from qixnat.constants import TYPE_DESIGNATORS
 from .. import PROJECT
 # Borrow the facade hierarchy and file fixture.
@@ -71,6 +74,13 @@ class TestHelpers(object):
         assert_equal(actual, expected, "The path hierarchy for path %s is"
                                        " incorrect: %s" % (path, actual))
 
+    def test_file_digest(self):
+        with open(FIXTURE, 'rb') as fp:
+            expected = hashlib.md5(fp.read()).hexdigest()
+        actual = file_digest(FIXTURE)
+        assert_equal(actual, expected, "The file digest is incorrect: %s" %
+                                       actual)
+
     def test_path_hierarchy_with_globs(self):
         path = '/QIN/Breast003/Session*/resources/pk*'
         expected = [('project', 'QIN'), ('subject', 'Breast003'),
@@ -94,6 +104,67 @@ class TestHelpers(object):
         assert_equal(actual, expected, "The path hierarchy for path %s is"
                                        " incorrect: %s" % (path, actual))
 
+    def test_key_matches(self):
+        for key, value, expected in [('Breast003', 'Breast003', True),
+                                     ('Breast003', 'Breast0031', False),
+                                     ('Breast*', 'Breast003', True),
+                                     ('*', 'Breast003', True),
+                                     ('Session0*', 'Breast003_Session01',
+                                      False)]:
+            actual = key_matches(key, value)
+            assert_equal(actual, expected, "The key %s match of %s is"
+                                           " incorrect: %s" %
+                                           (key, value, actual))
+
+    def test_hierarchy_path(self):
+        hierarchy = [('project', 'QIN'), ('subject', 'Breast003'),
+                     ('experiment', 'Breast003_Session01'), ('scan', '1'),
+                     ('resource', 'NIFTI'), ('file', 'volume001.nii.gz')]
+        expected = ('/QIN/Breast003/Session01/scan/1/resource/NIFTI/file/'
+                    'volume001.nii.gz')
+        actual = hierarchy_path(hierarchy)
+        assert_equal(actual, expected, "The hierarchy path is incorrect: %s" %
+                                       actual)
+
+    def test_uri_hierarchy(self):
+        uri = ('/data/projects/QIN/subjects/Breast003/experiments/'
+               'Breast003_Session01/assessors/pk/out/resources/reg%201')
+        expected = [('project', 'QIN'), ('subject', 'Breast003'),
+                    ('experiment', 'Breast003_Session01'),
+                    ('assessor', 'pk'), ('out_resource', 'reg 1')]
+        actual = uri_hierarchy(uri)
+        assert_equal(actual, expected, "The URI hierarchy is incorrect: %s" %
+                                       actual)
+        # A file path can include a subdirectory.
+        uri = '/data/projects/QIN/resources/reg/files/dce/volume%20001.nii'
+        expected = [('project', 'QIN'), ('resource', 'reg'),
+                    ('file', 'dce/volume 001.nii')]
+        actual = uri_hierarchy(uri)
+        assert_equal(actual, expected, "The file URI hierarchy is incorrect:"
+                                       " %s" % actual)
+
+    def test_prune_descendants(self):
+        class URIHolder(object):
+            def __init__(self, uri):
+                self._uri = uri
+
+        uris = ['/data/projects/QIN/subjects/Breast003/experiments/E1/scans/1',
+                '/data/projects/QIN/subjects/Breast003/experiments/E1',
+                '/data/projects/QIN/subjects/Breast003/experiments/E10',
+                '/data/projects/QIN/subjects/Breast003/experiments/E1']
+        objs = [URIHolder(uri) for uri in uris]
+        actual = [obj._uri for obj in prune_descendants(objs)]
+        assert_equal(actual, uris[1:3], "The pruned objects are incorrect:"
+                                        " %s" % actual)
+
+    def test_xsi_modality(self):
+        for xsi_type, expected in (('xnat:mrSessionData', 'MR'),
+                                   ('xnat:ctScanData', 'CT'),
+                                   ('xnat:subjectData', None)):
+            actual = xsi_modality(xsi_type)
+            assert_equal(actual, expected, "The %s modality is incorrect: %s" %
+                                           (xsi_type, actual))
+
     def test_xnat_info(self):
         # The test file name without the directory.
         _, fname = os.path.split(FIXTURE)
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+from nose.tools import assert_equal
+from qixnat.index import Index
+
+
+class TestIndex(object):
+    """The local XNAT index unit tests."""
+
+    def setUp(self):
+        self._dest = tempfile.mkdtemp()
+        self._index = Index(os.path.join(self._dest, 'index.db'))
+        # Populate the index directly rather than by a sync.
+        db = self._index
+        prj_id = db._insert(None, 'project', 'QIN')
+        for sbj in ('Breast001', 'Breast002', 'Sarcoma001'):
+            sbj_id = db._insert(prj_id, 'subject', sbj)
+            for sess in ('Session01', 'Session02'):
+                exp_id = db._insert(sbj_id, 'experiment', sbj + '_' + sess)
+                for scan in ('1', '2'):
+                    scan_id = db._insert(exp_id, 'scan', scan)
+                    rsc_id = db._insert(scan_id, 'resource', 'NIFTI')
+                    db._insert(rsc_id, 'file', 'volume001.nii.gz', size=10)
+
+    def tearDown(self):
+        self._index.close()
+        shutil.rmtree(self._dest, True)
+
+    def test_find_literal(self):
+        hierarchy = [('project', 'QIN'), ('subject', 'Breast001'),
+                     ('experiment', 'Breast001_Session02'), ('scan', '1')]
+        actual = self._index.find(hierarchy)
+        assert_equal(actual, [hierarchy], "The index find result is"
+                                          " incorrect: %s" % actual)
+
+    def test_find_wildcard(self):
+        hierarchy = [('project', 'QIN'), ('subject', 'Breast*'),
+                     ('experiment', '*'), ('scan', '2')]
+        actual = self._index.find(hierarchy)
+        assert_equal(len(actual), 4, "The index find result count is"
+                                     " incorrect: %d" % len(actual))
+        subjects = [match[1][1] for match in actual]
+        expected = ['Breast001', 'Breast001', 'Breast002', 'Breast002']
+        assert_equal(subjects, expected, "The index find result order is"
+                                         " incorrect: %s" % subjects)
+
+    def test_find_missing(self):
+        hierarchy = [('project', 'QIN'), ('subject', 'Breast003'),
+                     ('experiment', '*')]
+        actual = self._index.find(hierarchy)
+        assert_equal(actual, [], "The index found a missing subject: %s" %
+                                 actual)
+
+    def test_remove_missing(self):
+        db = self._index
+        prj_id = db._child_id(None, 'project', 'QIN')
+        removed = db._remove_missing(prj_id, 'subject', ['Breast001'])
+        assert_equal(removed, 2, "The removed subject count is incorrect:"
+                                 " %d" % removed)
+        # The subject descendants are removed as well.
+        hierarchy = [('project', 'QIN'), ('subject', '*'),
+                     ('experiment', '*'), ('scan', '*')]
+        actual = self._index.find(hierarchy)
+        assert_equal(len(actual), 4, "The index find result count after"
+                                     " removal is incorrect: %d" %
+                                     len(actual))
+        count = db._db.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+        assert_equal(count, 16, "The index object count after removal is"
+                                " incorrect: %d" % count)
+
+
+if __name__ == "__main__":
+    import nose
+
+    nose.main(defaultTest=__name__)
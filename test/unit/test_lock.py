@@ -0,0 +1,68 @@
+import shutil
+import tempfile
+import threading
+from nose.tools import (assert_equal, assert_raises)
+from qixnat.lock import (FileLock, XNATLockError)
+
+
+class TestLock(object):
+    """The XNAT lease unit tests."""
+
+    def setUp(self):
+        self._dest = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._dest, True)
+
+    def test_exclusion(self):
+        lock = FileLock(self._dest)
+        # The [(thread, event), ...] lease history.
+        history = []
+
+        def work(name):
+            with lock.lease('/data/projects/QIN/subjects/Breast003'):
+                history.append((name, 'start'))
+                history.append((name, 'end'))
+
+        threads = [threading.Thread(target=work, args=(i,))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # The leases do not overlap.
+        for i in range(0, len(history), 2):
+            assert_equal(history[i][0], history[i + 1][0],
+                         "The leases overlap: %s" % history)
+        assert_equal(len(history), 8, "The lease history is incorrect: %s" %
+                                      history)
+
+    def test_timeout(self):
+        lock = FileLock(self._dest, timeout=0.2)
+        held = threading.Event()
+        done = threading.Event()
+
+        def hold():
+            with lock.lease('Breast003'):
+                held.set()
+                done.wait()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait()
+        try:
+            with assert_raises(XNATLockError):
+                with lock.lease('Breast003'):
+                    pass
+            # A different key is not blocked.
+            with lock.lease('Breast004'):
+                pass
+        finally:
+            done.set()
+            thread.join()
+
+
+if __name__ == "__main__":
+    import nose
+
+    nose.main(defaultTest=__name__)
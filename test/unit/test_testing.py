@@ -0,0 +1,263 @@
+import os
+import io
+import time
+import hashlib
+import shutil
+import zipfile
+import threading
+from collections import Counter
+from nose.tools import (assert_equal, assert_true, assert_false,
+                        assert_is_none, assert_raises)
+from qixnat.facade import XNATError
+from qixnat.testing import (StandIn, ENTRY_POINT, RESERVED_PARAMS)
+from .. import ROOT
+
+RESULTS = os.path.join(ROOT, 'results', 'testing')
+"""The test results directory."""
+
+PROJECT = 'QIN_StandIn'
+"""The stand-in test project name."""
+
+
+class TestStandIn(object):
+    """The XNAT stand-in server unit tests."""
+
+    def setUp(self):
+        shutil.rmtree(RESULTS, True)
+
+    def tearDown(self):
+        shutil.rmtree(RESULTS, True)
+
+    def test_create_find_delete(self):
+        with StandIn(projects=[PROJECT]) as server:
+            with server.connect() as xnat:
+                for number in range(1, 3):
+                    xnat.find_or_create(PROJECT, 'Breast001', 'Session01',
+                                        scan=number, resource='NIFTI',
+                                        modality='MR')
+                scans = xnat.find(PROJECT, 'Breast*', 'Session*', scan='*')
+                assert_equal(len(scans), 2, "The scan find result is"
+                                            " incorrect: %s" % scans)
+                xnat.delete(PROJECT, 'Breast001', 'Session01', scan=1)
+                scan = xnat.find_one(PROJECT, 'Breast001', 'Session01',
+                                     scan=1)
+                assert_is_none(scan, "The deleted scan was found")
+            methods = set(method for method, _ in server.requests)
+            assert_equal(methods, set(['GET', 'PUT', 'DELETE']),
+                         "The request methods are incorrect: %s" % methods)
+
+    def test_file_round_trip(self):
+        with StandIn(projects=[PROJECT]) as server:
+            server.populate(PROJECT, subjects=1, sessions=1, scans=1,
+                            files=3, size=1000)
+            with server.connect() as xnat:
+                files = xnat.download(PROJECT, 'Subject001', 'Session01',
+                                      scan=1, resource='NIFTI', dest=RESULTS)
+                assert_equal(len(files), 3, "The downloaded files are"
+                                            " incorrect: %s" % files)
+                rsc = xnat.find_one(PROJECT, 'Subject001', 'Session01',
+                                    scan=1, resource='NIFTI')
+                server.reset_counters()
+                xnat.upload(rsc, files[0], name='copy.nii.gz')
+                assert_equal(server.bytes_received, 1000,
+                             "The upload byte count is incorrect: %d" %
+                             server.bytes_received)
+                # The archive download extracts the same files.
+                archived = xnat.download(PROJECT, 'Subject001', 'Session01',
+                                         scan=1, resource='NIFTI',
+                                         dest=os.path.join(RESULTS, 'zip'),
+                                         archive=True)
+                assert_equal(len(archived), 4, "The archive files are"
+                                               " incorrect: %s" % archived)
+
+    def test_latency(self):
+        with StandIn(projects=[PROJECT], latency=0.05) as server:
+            with server.connect() as xnat:
+                server.reset_counters()
+                start = time.time()
+                xnat.find_one(PROJECT, 'Breast001')
+                elapsed = time.time() - start
+                count = server.request_count
+            assert_true(count > 0, "No request was served")
+            assert_true(elapsed >= 0.05 * count, "The %d requests were not"
+                                                 " delayed: %f" %
+                                                 (count, elapsed))
+
+    def test_bandwidth(self):
+        with StandIn(projects=[PROJECT], bandwidth=100000) as server:
+            server.populate(PROJECT, files=1, size=20000)
+            with server.connect() as xnat:
+                server.reset_counters()
+                start = time.time()
+                xnat.download(PROJECT, 'Subject001', 'Session01', scan=1,
+                              resource='NIFTI', file='*', dest=RESULTS)
+                elapsed = time.time() - start
+            assert_true(server.bytes_sent >= 20000, "The response byte count"
+                                                    " is incorrect: %d" %
+                                                    server.bytes_sent)
+            assert_true(elapsed >= 0.2, "The download was not throttled: %f" %
+                                        elapsed)
+
+    def test_resume_download(self):
+        with StandIn(projects=[PROJECT]) as server:
+            server.populate(PROJECT, files=1, size=20000)
+            with server.connect() as xnat:
+                location = xnat.download(PROJECT, 'Subject001', 'Session01',
+                                         scan=1, resource='NIFTI',
+                                         dest=RESULTS)[0]
+                with open(location, 'rb') as fp:
+                    content = fp.read()
+                validator = '"%s"' % hashlib.md5(content).hexdigest()
+                # A validated checkpoint resumes at the partial size,
+                # whereas a stale checkpoint restarts the download.
+                for checkpoint, resumed in ((validator, True),
+                                            ('"stale"', False)):
+                    os.remove(location)
+                    with open(location + '.part', 'wb') as fp:
+                        fp.write(content[:10000])
+                    with open(location + '.part.validator', 'w') as fp:
+                        fp.write(checkpoint)
+                    server.reset_counters()
+                    xnat.download(PROJECT, 'Subject001', 'Session01',
+                                  scan=1, resource='NIFTI', dest=RESULTS)
+                    # The response byte count includes the file listing.
+                    assert_equal(server.bytes_sent < 20000, resumed,
+                                 "The %s checkpoint response byte count is"
+                                 " incorrect: %d" %
+                                 (checkpoint, server.bytes_sent))
+                    with open(location, 'rb') as fp:
+                        assert_equal(fp.read(), content,
+                                     "The %s checkpoint download content is"
+                                     " incorrect" % checkpoint)
+
+    def test_archive_traversal(self):
+        dest = os.path.join(RESULTS, 'zip')
+        with TraversalStandIn(projects=[PROJECT]) as server:
+            server.populate(PROJECT, files=1, size=1000)
+            with server.connect() as xnat:
+                with assert_raises(XNATError):
+                    xnat.download(PROJECT, 'Subject001', 'Session01', scan=1,
+                                  resource='NIFTI', dest=dest, archive=True)
+        evil = os.path.join(RESULTS, 'evil.txt')
+        assert_false(os.path.exists(evil), "The archive entry was extracted"
+                                           " outside of the target directory")
+
+    def test_leased_create(self):
+        lock_dir = os.path.join(RESULTS, 'locks')
+        with SlowSessionStandIn(projects=[PROJECT]) as server:
+            def create(number):
+                # The second job starts while the first job is creating
+                # the session, so that the jobs see different parts of
+                # the lineage already created.
+                time.sleep(0.1 * (number - 1))
+                with server.connect(shared=False, lock_dir=lock_dir) as xnat:
+                    xnat.find_or_create(PROJECT, 'Breast001', 'Session01',
+                                        scan=number, resource='NIFTI',
+                                        modality='MR')
+
+            threads = [threading.Thread(target=create, args=(number,))
+                       for number in range(1, 3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # Each object is created exactly once.
+            puts = Counter(path for method, path in server.requests
+                           if method == 'PUT')
+            assert_equal(len(puts), 6, "The created objects are incorrect:"
+                                       " %s" % puts.keys())
+            duplicates = [path for path, count in puts.iteritems()
+                          if count > 1]
+            assert_equal(duplicates, [], "Some objects were created more"
+                                         " than once: %s" % duplicates)
+
+    def test_find_request_count(self):
+        with StandIn(projects=[PROJECT]) as server:
+            self._create_find_hierarchy(server)
+            with server.connect() as xnat:
+                server.reset_counters()
+                scans = xnat.find(PROJECT, 'Breast*', 'Session*', scan='*')
+                # The session request determines the entry point on
+                # first use, and is not part of the find.
+                requests = [(method, path) for method, path in server.requests
+                            if not path.endswith('/JSESSION')]
+            assert_equal(len(scans), 4, "The scan find result is incorrect:"
+                                        " %s" % scans)
+            # The project check, one filtered listing of the project
+            # experiments and one scan listing for each of the four
+            # matching sessions.
+            assert_equal(len(requests), 6, "The find request count is"
+                                           " incorrect: %s" % requests)
+            listing = ('GET', "/data/projects/%s/experiments" % PROJECT)
+            assert_true(listing in requests, "The project experiments were"
+                                             " not listed: %s" % requests)
+
+    def test_find_ignored_filter(self):
+        # The find result on a server which applies the filters.
+        with StandIn(projects=[PROJECT]) as server:
+            self._create_find_hierarchy(server)
+            with server.connect() as xnat:
+                server.reset_counters()
+                expected = xnat.find(PROJECT, 'Breast*', 'Session*', scan='*')
+                filtered_bytes = server.bytes_sent
+        # The find result on a server which ignores the filters.
+        with FilterlessStandIn(projects=[PROJECT]) as server:
+            self._create_find_hierarchy(server)
+            with server.connect() as xnat:
+                server.reset_counters()
+                actual = xnat.find(PROJECT, 'Breast*', 'Session*', scan='*')
+                unfiltered_bytes = server.bytes_sent
+        expected_paths = sorted(scan._uri for scan in expected)
+        actual_paths = sorted(scan._uri for scan in actual)
+        assert_equal(actual_paths, expected_paths, "The client-side filter"
+                                                   " result is incorrect: %s" %
+                                                   actual_paths)
+        assert_true(unfiltered_bytes > filtered_bytes,
+                    "The server-side filter did not reduce the listing"
+                    " content: %d vs %d" % (filtered_bytes, unfiltered_bytes))
+
+    def _create_find_hierarchy(self, server):
+        """
+        Creates the subjects, sessions and scans of the find tests,
+        four of which match ``Breast*/Session*``.
+
+        :param server: the stand-in server
+        """
+        with server.connect() as xnat:
+            for sbj in ('Breast001', 'Breast002', 'Sarcoma001'):
+                for sess in ('Session01', 'Session02', 'Visit01'):
+                    xnat.find_or_create(PROJECT, sbj, sess, scan=1,
+                                        modality='MR')
+
+
+class FilterlessStandIn(StandIn):
+    """A stand-in server which ignores the listing filters."""
+
+    def _list(self, parent, collection, params):
+        params = dict((k, v) for k, v in params.iteritems()
+                      if k in RESERVED_PARAMS)
+        return super(FilterlessStandIn, self)._list(parent, collection,
+                                                    params)
+
+
+class TraversalStandIn(StandIn):
+    """A stand-in which serves an archive entry outside of the resource."""
+
+    def _zip(self, resource):
+        status, headers, content = super(TraversalStandIn, self)._zip(resource)
+        buf = io.BytesIO(content)
+        with zipfile.ZipFile(buf, 'a') as archive:
+            prefix = resource.uri()[len(ENTRY_POINT) + 1:]
+            archive.writestr(prefix + '/files/../evil.txt', 'evil')
+
+        return status, headers, buf.getvalue()
+
+
+class SlowSessionStandIn(StandIn):
+    """A stand-in server which is slow to create a session."""
+
+    def handle(self, method, path, params, headers, body):
+        if method == 'PUT' and path.endswith('Session01'):
+            time.sleep(0.3)
+        return super(SlowSessionStandIn, self).handle(method, path, params,
+                                                      headers, body)